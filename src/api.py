@@ -1,17 +1,28 @@
+import threading
 import uuid
-from typing import List
+from typing import Callable, Dict, List, Optional
 
-from steamship import Block
+from steamship import Block, SteamshipError
 from steamship.agents.schema import AgentContext, Metadata
 from steamship.agents.llms import OpenAI
 from steamship.agents.react import ReACTAgent
+from steamship.agents.utils import with_llm
 
-from steamship.agents.tools.image_generation.google_image_search import GoogleImageSearchTool
-from steamship.agents.tools.search.search import SearchTool
 from steamship.experimental.package_starters.telegram_agent import TelegramAgentService
-from steamship.invocable import post
+from steamship.invocable import InvocableResponse, get, post
+from steamship.invocable.invocable_response import Http
 from steamship.utils.repl import AgentREPL
 
+from data.podcast_episode import EpisodeFile, RssEpisode
+from data.podcast_feed import FeedFile, RssFeed
+from data.utils import BulkItemResult, run_bulk
+from tools.cache_metrics import cache_report
+from tools.cover_art_tool import CoverArtTool
+from tools.podcast_episode_premise_tool import PodcastEpisodePremiseTool
+from tools.podcast_pipeline import PodcastPipeline
+from tools.podcast_premise_tool import PodcastPremiseTool
+from tools.podcast_script_tool import PodcastTranscriptGeneratorTool
+from tools.search_tools import CachedGoogleImageSearchTool, CachedSearchTool
 from utils import print_blocks
 
 SYSTEM_PROMPT = """You are Jeff, a podcast producer who helps plan, write, and record podcasts.
@@ -55,6 +66,27 @@ Begin!
 New input: {input}
 {scratchpad}"""
 
+_podcast_pipelines: Dict[str, PodcastPipeline] = {}
+_podcast_pipelines_lock = threading.Lock()
+
+
+def get_podcast_pipeline(base_url: str) -> PodcastPipeline:
+    """Return this worker's pipeline for the base URL, so its stage memo outlives a single invocation."""
+    with _podcast_pipelines_lock:
+        pipeline = _podcast_pipelines.get(base_url)
+        if pipeline is None:
+            pipeline = PodcastPipeline(agent_instance_base_url=base_url)
+            _podcast_pipelines[base_url] = pipeline
+        return pipeline
+
+
+def _bulk_report(results: List[BulkItemResult], id_of: Callable[[BulkItemResult], str]) -> dict:
+    """Summarize a bulk operation: the ids of the items that succeeded, and the position and error of each failure."""
+    return {
+        "succeeded": [id_of(result) for result in results if result.ok],
+        "failed": [{"index": result.index, "error": str(result.error)} for result in results if not result.ok],
+    }
+
 
 class PodcastProducerJeff(TelegramAgentService):
     """Deployable Multimodal Agent that lets you talk to Google Search & Google Images.
@@ -68,8 +100,8 @@ class PodcastProducerJeff(TelegramAgentService):
         # The agent's planner is responsible for making decisions about what to do for a given input.
         self.incoming_message_agent = ReACTAgent(
             tools=[
-                SearchTool(),
-                GoogleImageSearchTool()
+                CachedSearchTool(),
+                CachedGoogleImageSearchTool()
             ],
             llm=OpenAI(self.client),
         )
@@ -92,6 +124,150 @@ class PodcastProducerJeff(TelegramAgentService):
         self.run_agent(self.incoming_message_agent, context)
         return output
 
+    @post("cache_report")
+    def cache_report(self) -> dict:
+        """Return per-tool cache hit/miss/latency counters for this worker."""
+        return cache_report()
+
+    def _cacheable_tools(self) -> list:
+        """Every tool in this package that keeps a persistent cache."""
+        base_url = self.context.invocable_url if self.context else ""
+        return [
+            CachedSearchTool(),
+            CachedGoogleImageSearchTool(),
+            CoverArtTool(),
+            PodcastPremiseTool(agent_instance_base_url=base_url),
+        ]
+
+    @post("rebuild_feed_index")
+    def rebuild_feed_index(self, feed_guid: Optional[str] = None) -> dict:
+        """Add episodes created before the feed kept an episode index (or without a feed) to the feed's index."""
+        base_url = self.context.invocable_url if self.context else ""
+        rss_feed = RssFeed(guid=feed_guid) if feed_guid else None
+        return {"added": FeedFile.get_or_create(self.client, base_url, rss_feed).rebuild_index()}
+
+    def _llm_context(self) -> AgentContext:
+        """A new AgentContext for one invocation, with this workspace's client and an OpenAI LLM."""
+        context = AgentContext()
+        # AgentContext's metadata and emit_funcs defaults are shared by every instance; with_llm writes into metadata.
+        context.metadata = {}
+        context.emit_funcs = []
+        context = with_llm(llm=OpenAI(self.client), context=context)
+        context.client = self.client
+        return context
+
+    @post("import_episodes")
+    def import_episodes(self, episodes: List[dict], feed_guid: Optional[str] = None) -> dict:
+        """Create an episode for each RssEpisode dict, adding them to the feed with `feed_guid` if one is given.
+
+        Episodes are written concurrently; one that fails is reported by its position and doesn't stop the rest.
+        """
+        feed_file_id = FeedFile.resolve_id(self.client, feed_guid) if feed_guid else None
+        if feed_guid and feed_file_id is None:
+            raise SteamshipError(message=f"No feed with guid {feed_guid}.")
+        rss_episodes = [RssEpisode.parse_obj(episode) for episode in episodes]
+        results = EpisodeFile.create_many(self.client, rss_episodes, feed_file_id=feed_file_id)
+        return _bulk_report(results, lambda result: result.result.file.id)
+
+    @post("mark_audio_complete")
+    def mark_audio_complete(self, episode_ids: List[str]) -> dict:
+        """Mark the audio of each episode complete. Failures are reported by position and don't stop the rest."""
+        results = run_bulk(lambda episode_id: EpisodeFile.get(self.client, episode_id), episode_ids)
+        loaded = [result for result in results if result.ok]
+        marked = EpisodeFile.mark_audio_complete_many([result.result for result in loaded])
+        for load_result, mark_result in zip(loaded, marked):
+            results[load_result.index] = mark_result._replace(index=load_result.index)
+        return _bulk_report(results, lambda result: episode_ids[result.index])
+
+    @post("generate_episodes")
+    def generate_episodes(self, count: int, max_concurrency: Optional[int] = None) -> dict:
+        """Generate `count` episode scripts for one podcast, `max_concurrency` at a time (default: the tool's).
+
+        Returns the scripts of the episodes that succeeded and a report of throughput, latency and failures.
+        """
+        base_url = self.context.invocable_url if self.context else ""
+        transcript_tool = PodcastTranscriptGeneratorTool(agent_instance_base_url=base_url)
+        blocks, report = transcript_tool.run_batch(count, self._llm_context(), max_concurrency=max_concurrency)
+        return {"scripts": [block.text for block in blocks], "report": report}
+
+    @post("plan_season")
+    def plan_season(self, count: int) -> dict:
+        """Plan `count` new episodes for the podcast in one completion, de-duplicated against its existing episodes."""
+        base_url = self.context.invocable_url if self.context else ""
+        episode_tool = PodcastEpisodePremiseTool(agent_instance_base_url=base_url)
+        blocks = episode_tool.run_season(count, self._llm_context())
+        return {"episodes": [episode_tool.parse_final_output(block).dict() for block in blocks]}
+
+    @post("next_episode_idea")
+    def next_episode_idea(self, warm_pool_size: int = 3) -> dict:
+        """Return a new episode idea and its cover art, served from this worker's pool of ideas generated ahead of
+        time. The pool is topped back up to `warm_pool_size` in the background."""
+        base_url = self.context.invocable_url if self.context else ""
+        episode_tool = PodcastEpisodePremiseTool(agent_instance_base_url=base_url, warm_pool_size=warm_pool_size)
+        blocks = episode_tool.run([], self._llm_context())
+        return {
+            "episode": episode_tool.parse_final_output(blocks[0]).dict(),
+            "cover_art_block_id": blocks[1].id if len(blocks) > 1 else None,
+        }
+
+    @post("generate_episode")
+    def generate_episode(self, request: str, episode_number: int = 1, force: Optional[List[str]] = None) -> dict:
+        """Generate a podcast premise, an episode for it, and the episode's script and cover art.
+
+        Stages are memoized per worker: repeating a request reuses its premise, a new `episode_number` re-runs only
+        the episode and what depends on it, and stages named in `force` are regenerated.
+        """
+        base_url = self.context.invocable_url if self.context else ""
+        context = self._llm_context()
+        result = get_podcast_pipeline(base_url).run(request, context, episode_number=episode_number, force=force or ())
+        cover_art = result.values["cover_art"]
+        return {
+            "premise": result.values["premise"].dict(),
+            "episode": result.values["episode"].dict(),
+            "script": result.values["script"],
+            "cover_art_block_id": cover_art.id if cover_art is not None else None,
+            "report": result.report(),
+        }
+
+    @post("sweep_caches")
+    def sweep_caches(self) -> dict:
+        """Evict expired and over-budget entries from every tool cache. Intended to be called on a schedule."""
+        context = AgentContext()
+        context.metadata = {}
+        context.emit_funcs = []
+        context.client = self.client
+        return {tool.name: tool.tool_cache.sweep(context) for tool in self._cacheable_tools()}
+
+    @get("rss", public=True)
+    def rss(
+        self,
+        feed_guid: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        if_modified_since: Optional[str] = None,
+        latest: Optional[int] = None,
+    ) -> InvocableResponse:
+        """Serve a podcast feed (the workspace's first feed if no `feed_guid` is given). Returns a 304 without
+        rendering when the client's validators are still current.
+
+        Invocations don't see request headers, so clients (or a proxy in front of the package) pass `If-None-Match`
+        and `If-Modified-Since` as parameters.
+        """
+        base_url = self.context.invocable_url if self.context else ""
+        feed_file = FeedFile.get(self.client, feed_guid)
+        if feed_file is None:
+            return InvocableResponse(http=Http(status=404, headers={}), string="No such feed.")
+
+        validators = feed_file.validators(base_url, latest=latest)
+        headers = {**validators.headers(), "Cache-Control": "public, max-age=300"}
+        if validators.not_modified(if_none_match, if_modified_since):
+            return InvocableResponse(http=Http(status=304, headers=headers), string="")
+
+        return InvocableResponse(
+            http=Http(status=200, headers=headers),
+            string=feed_file.to_rss(base_url, latest=latest),
+            mime_type="application/rss+xml",
+        )
+
 
 if __name__ == "__main__":
     AgentREPL(GoogleChatbot,
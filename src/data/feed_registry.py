@@ -0,0 +1,21 @@
+"""In-process caches for resolving feeds, shared by FeedFile and EpisodeFile."""
+from steamship import File
+
+from data.lru_cache import LruCache
+
+FEED_FILE_IDS = LruCache(max_entries=10_000, max_bytes=10_000, ttl_seconds=3600)
+"""Feed guid -> feed File id, per workspace. Kept in step by FeedFile.create/delete; the TTL bounds staleness from
+feeds created or deleted by other workers."""
+
+FEED_HANDLES = LruCache(max_entries=1024, max_bytes=1024, ttl_seconds=60)
+"""Feed File id -> the loaded feed File (metadata and episode index). Invalidated whenever this worker changes the
+feed; the short TTL bounds staleness from changes made by other workers."""
+
+
+def cache_feed_handle(file: File):
+    FEED_HANDLES.set(file.id, file)
+
+
+def invalidate_feed_handle(file_id: str):
+    """Forget the loaded feed File, so the next lookup re-reads it."""
+    FEED_HANDLES.delete(file_id)
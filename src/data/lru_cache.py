@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class LruCache:
+    """A thread-safe, in-process LRU cache bounded by entry count, total bytes, and per-entry TTL.
+
+    Usage:
+
+        lru = LruCache(max_entries=256, max_bytes=4 * 1024 * 1024, ttl_seconds=600)
+        lru.set("key", value, size=1024)
+        value_or_none = lru.get("key")
+
+    Sizes are supplied by the caller since only the caller knows how to cheaply estimate them.
+    """
+
+    max_entries: int
+    max_bytes: int
+    ttl_seconds: Optional[float]
+
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 4 * 1024 * 1024, ttl_seconds: Optional[float] = 600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[Any, int, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, key: str):
+        """Remove an entry. Caller must hold the lock."""
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value for `key`, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, _, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Return the value for `key` like `get`, without counting a hit or miss or refreshing its recency."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, _, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                return None
+            return value
+
+    def set(self, key: str, value: Any, size: int = 1, ttl_seconds: Optional[float] = None):
+        """Store `value` under `key`, evicting least recently used entries to stay within bounds."""
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                # Never let a single oversized entry flush the whole cache.
+                return
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        """Remove `key` from the cache, returning whether it was present."""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def clear(self):
+        """Remove every entry. Counters are preserved."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit/miss/eviction counters and current occupancy."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,6 +1,10 @@
 """Pydantic objects to describe a podcast feed."""
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 
-from typing import Optional, Union, List, Tuple, cast
+from typing import Dict, Iterable, Optional, Sequence, Union, List, Tuple, cast
 
 from steamship import File, Steamship, Block, Tag, DocTag, SteamshipError
 from steamship.data import TagKind, TagValueKey
@@ -8,7 +12,52 @@ from steamship.data import TagKind, TagValueKey
 from pydantic import Field
 from steamship.base.model import CamelModel
 
-from data.utils import xmlify
+from data.feed_registry import invalidate_feed_handle
+from data.utils import DEFAULT_MAX_CONCURRENCY, BulkItemResult, XmlSerializer, run_bulk, xml_bool
+
+RSS_ITEM_SERIALIZER = XmlSerializer(
+    [
+        ("title", None, None),
+        ("author", None, None),
+        ("itunes:author", None, None),
+        ("description", None, None),
+        ("itunes:summary", None, None),
+        ("enclosure", "url", "type=\"audio/mpeg\""),
+        ("guid", None, None),
+        ("itunes:explicit", None, None),
+        ("pubDate", None, None),
+    ],
+    wrapper="item",
+)
+"""Serializer for an RSS <item>. Values must be supplied in this order; see `RssEpisode.rss_xml`."""
+
+OLDEST_PUB_DATE = datetime.min.replace(tzinfo=timezone.utc)
+UPDATED_AT_KEY = "updated_at"
+"""Tag value key holding when a feed's metadata or an episode's audio last changed, as an RFC 2822 date."""
+
+
+def parse_pub_date(pub_date: Optional[str]) -> Optional[datetime]:
+    """Parse an RFC 2822 pubDate into an aware datetime, or None if it is missing or malformed."""
+    try:
+        published = parsedate_to_datetime(pub_date)
+    except (TypeError, ValueError):
+        return None
+    return published if published.tzinfo else published.replace(tzinfo=timezone.utc)
+
+
+def updated_at_value() -> dict:
+    """A tag value stamping the current time under UPDATED_AT_KEY."""
+    return {UPDATED_AT_KEY: format_datetime(datetime.now(timezone.utc), usegmt=True)}
+
+
+def parse_updated_at(value: Optional[dict]) -> Optional[datetime]:
+    """The time stamped in a tag value by `updated_at_value`, or None if there is none."""
+    return parse_pub_date((value or {}).get(UPDATED_AT_KEY))
+
+
+def latest_datetime(*values: Optional[datetime]) -> Optional[datetime]:
+    """The latest of the given datetimes, ignoring Nones; None if every value is None."""
+    return max((value for value in values if value is not None), default=None)
 
 
 class RssEpisode(CamelModel):
@@ -25,30 +74,94 @@ class RssEpisode(CamelModel):
 
     def rss_xml(self, base_url: str) -> str:
         """Return the RSS <item> element for this object."""
-        ret = "<item>"
+        return render_rss_item(self, base_url)
+
+
+RSS_EPISODE_FIELD_NAMES = {field.alias: name for name, field in RssEpisode.__fields__.items()}
+"""Maps RssEpisode's camelCase aliases to its field names."""
+
+
+def render_rss_item(episode: Union[RssEpisode, "EpisodeRecord"], base_url: str) -> str:
+    """Render an RssEpisode or EpisodeRecord as an RSS <item>."""
+    return RSS_ITEM_SERIALIZER.render((
+        episode.title,
+        episode.author,
+        episode.author,
+        episode.summary,
+        episode.summary,
+        episode.audio_url or f"{base_url}audio?id={episode.guid}",
+        episode.guid,
+        xml_bool(episode.is_explicit),
+        episode.pub_date,
+    ))
 
-        audio_url = self.audio_url or f"{base_url}audio?id={self.guid}"
 
-        is_explicit_value = None
-        if self.is_explicit is True:
-            is_explicit_value = "yes"
-        elif self.is_explicit is False:
-            is_explicit_value = "no"
+class EpisodeRecord:
+    """A slotted, validation-free view of an episode's stored fields, for the RSS rendering hot path.
 
-        ret += xmlify([
-            (self.title, "title", None, None),
-            (self.author, "author", None, None),
-            (self.author, "itunes:author", None, None),
-            (self.summary, "description", None, None),
-            (self.summary, "itunes:summary", None, None),
-            (audio_url, "enclosure", "url", "type=\"audio/mpeg\""),
-            (self.guid, "guid", None, None),
-            (is_explicit_value, "itunes:explicit", None, None),
-            (self.pub_date, "pubDate", None, None),
-        ])
+    Values are read straight from a stored `RssEpisode.dict()` (snake_case or camelCase keys) without pydantic
+    validation. Use RssEpisode at API boundaries.
+    """
 
-        ret += "</item>"
-        return ret
+    __slots__ = RECORD_FIELDS = ("guid", "title", "summary", "author", "web_url", "audio_url", "is_explicit", "pub_date")
+
+    def __init__(
+        self,
+        guid: Optional[str] = None,
+        title: Optional[str] = None,
+        summary: Optional[str] = None,
+        author: Optional[str] = None,
+        web_url: Optional[str] = None,
+        audio_url: Optional[str] = None,
+        is_explicit: Optional[bool] = None,
+        pub_date: Optional[str] = None,
+    ):
+        self.guid = guid
+        self.title = title
+        self.summary = summary
+        self.author = author
+        self.web_url = web_url
+        self.audio_url = audio_url
+        self.is_explicit = is_explicit
+        self.pub_date = pub_date
+
+    @classmethod
+    def from_value(cls, value: Optional[dict], guid: Optional[str] = None) -> "EpisodeRecord":
+        """Build a record from a stored tag value. `guid`, when given, overrides the stored one."""
+        value = value or {}
+        get = value.get
+        if "pub_date" not in value and "pubDate" in value:
+            # Stored with RssEpisode.dict(by_alias=True).
+            get = {RSS_EPISODE_FIELD_NAMES.get(key, key): item for key, item in value.items()}.get
+        return cls(
+            guid if guid is not None else get("guid"),
+            get("title"),
+            get("summary"),
+            get("author"),
+            get("web_url"),
+            get("audio_url"),
+            get("is_explicit"),
+            get("pub_date"),
+        )
+
+    @classmethod
+    def bulk(cls, values: Iterable[Tuple[str, Optional[dict]]]) -> "List[EpisodeRecord]":
+        """Build records from (guid, stored tag value) pairs."""
+        from_value = cls.from_value
+        return [from_value(value, guid) for guid, value in values]
+
+    def rss_xml(self, base_url: str) -> str:
+        """Return the RSS <item> element for this object."""
+        return render_rss_item(self, base_url)
+
+    def to_rss_episode(self) -> RssEpisode:
+        return RssEpisode(**{field: getattr(self, field) for field in self.RECORD_FIELDS})
+
+
+class EpisodeIndexEntry(RssEpisode):
+    """Compact record of an episode kept on its feed's File, so the feed renders without loading episode Files."""
+
+    has_audio: bool = Field(False, description="Whether the episode's audio is complete")
 
 
 class EpisodeFile:
@@ -59,18 +172,77 @@ class EpisodeFile:
     TAG_KIND = "episode"
     TAG_NAME_AUDIO = "has_audio"
     TAG_NAME_DATA = "data"
+    TAG_NAME_FEED = "feed"
+
+    INDEX_TAG_KIND = "feed-episode"
+    INDEX_AUDIO_TAG_KIND = "feed-episode-audio"
 
     def __init__(self, file: File):
         self.file = file
+        self._content_hash = None
 
-    def mark_audio_complete(self) -> Optional[Tag]:
-        """Returns the file tag that stores the episode metadata."""
-        return Tag.create(
+    def _mark_audio_complete(self) -> Tag:
+        """Tags the episode (and its feed index entry) as having audio, without invalidating the feed handle.
+
+        Both tags are stamped with the completion time, which feeds use as the episode's Last-Modified.
+        """
+        completed = updated_at_value()
+        tag = Tag.create(
             self.file.client,
             file_id=self.file.id,
             kind=EpisodeFile.TAG_KIND,
-            name=EpisodeFile.TAG_NAME_AUDIO
+            name=EpisodeFile.TAG_NAME_AUDIO,
+            value=completed,
         )
+        feed_file_id = self.feed_file_id()
+        if feed_file_id:
+            Tag.create(
+                self.file.client,
+                file_id=feed_file_id,
+                kind=EpisodeFile.INDEX_AUDIO_TAG_KIND,
+                name=self.file.id,
+                value=completed,
+            )
+        return tag
+
+    def mark_audio_complete(self) -> Optional[Tag]:
+        """Returns the file tag that stores the episode metadata."""
+        tag = self._mark_audio_complete()
+        feed_file_id = self.feed_file_id()
+        if feed_file_id:
+            invalidate_feed_handle(feed_file_id)
+        return tag
+
+    @staticmethod
+    def mark_audio_complete_many(
+        episode_files: Sequence["EpisodeFile"], max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    ) -> List[BulkItemResult]:
+        """Marks many episodes' audio complete, `max_concurrency` at a time.
+
+        Returns one BulkItemResult per episode, in order, whose `result` is the has_audio tag or whose `error` is
+        what went wrong; one failure doesn't stop the rest. Each affected feed's handle is invalidated once.
+        """
+        results = run_bulk(EpisodeFile._mark_audio_complete, episode_files, max_concurrency)
+        for feed_file_id in {episode_file.feed_file_id() for episode_file in episode_files} - {None}:
+            invalidate_feed_handle(feed_file_id)
+        return results
+
+    def feed_file_id(self) -> Optional[str]:
+        """Returns the id of the feed File whose episode index lists this episode, if any."""
+        for tag in self.file.tags or []:
+            if tag.kind == EpisodeFile.TAG_KIND and tag.name == EpisodeFile.TAG_NAME_FEED:
+                return (tag.value or {}).get(TagValueKey.STRING_VALUE)
+        return None
+
+    def audio_tag(self) -> Optional[Tag]:
+        """Returns the tag marking the episode's audio as complete, if it has been."""
+        for tag in self.file.tags or []:
+            if tag.kind == EpisodeFile.TAG_KIND and tag.name == EpisodeFile.TAG_NAME_AUDIO:
+                return tag
+        return None
+
+    def has_audio(self) -> bool:
+        return self.audio_tag() is not None
 
     def episode_tag(self) -> Optional[Tag]:
         """Returns the file tag that stores the episode metadata."""
@@ -79,6 +251,20 @@ class EpisodeFile:
                 return tag
         return None
 
+    def content_hash(self) -> str:
+        """Returns a hash of everything this episode's <item> is rendered from, computed without parsing the tag."""
+        if self._content_hash is None:
+            tag = self.episode_tag()
+            value = tag.value if tag is not None else None
+            payload = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+            self._content_hash = hashlib.md5(f"{self.file.id}\0{payload}".encode()).hexdigest()
+        return self._content_hash
+
+    def episode_record(self) -> EpisodeRecord:
+        """Returns the episode stored in this file as a lightweight, unvalidated EpisodeRecord."""
+        tag = self.episode_tag()
+        return EpisodeRecord.from_value(tag.value if tag is not None else None, guid=self.file.id)
+
     def episode_obj(self) -> RssEpisode:
         """Returns the Episode object stored in this file."""
         tag = self.episode_tag()
@@ -90,8 +276,39 @@ class EpisodeFile:
         ep.guid = self.file.id
         return ep
 
+    def pub_datetime(self) -> Optional[datetime]:
+        tag = self.episode_tag()
+        return parse_pub_date((tag.value or {}).get("pub_date")) if tag is not None else None
+
+    def last_modified(self) -> Optional[datetime]:
+        """When this episode's <item> last changed: its pub_date, or its audio completing if that was later."""
+        audio_tag = self.audio_tag()
+        return latest_datetime(self.pub_datetime(), parse_updated_at(audio_tag.value) if audio_tag else None)
+
+    @staticmethod
+    def list_tags_only(
+        client: Steamship, with_audio: Optional[bool] = None, newest_first: bool = True
+    ) -> "List[EpisodeFile]":
+        """Returns the workspace's episodes sorted by pub_date, each wrapping a File that carries only its tags.
+
+        One tag query fetches every episode's metadata tags, and no blocks are loaded. That is enough for
+        `episode_obj`, `has_audio` and rendering. The result is not paged: Steamship's tag query can neither page
+        nor sort on the server, so the whole list is held in memory.
+        """
+        tags_by_file: Dict[str, List[Tag]] = {}
+        for tag in Tag.query(client, f'kind "{EpisodeFile.TAG_KIND}"').tags or []:
+            if tag.file_id and not tag.block_id:
+                tags_by_file.setdefault(tag.file_id, []).append(tag)
+
+        episodes = [EpisodeFile(File(client=client, id=file_id, tags=tags)) for file_id, tags in tags_by_file.items()]
+        episodes = [episode for episode in episodes if episode.episode_tag() is not None]
+        if with_audio is not None:
+            episodes = [episode for episode in episodes if episode.has_audio() == with_audio]
+        episodes.sort(key=lambda episode: episode.pub_datetime() or OLDEST_PUB_DATE, reverse=newest_first)
+        return episodes
+
     @staticmethod
-    def list(client: Steamship, with_audio: Optional[bool] == None) -> "List[EpisodeFile]":
+    def list(client: Steamship, with_audio: Optional[bool] = None) -> "List[EpisodeFile]":
         if with_audio is True:
             files = File.query(client, f'filetag and kind "{EpisodeFile.TAG_KIND}" and name "{EpisodeFile.TAG_NAME_AUDIO}"')
         else:
@@ -108,6 +325,69 @@ class EpisodeFile:
         client: Steamship,
         rss_episode: Optional[RssEpisode] = None,
         content: Optional[Union[str, List[str]]] = "Episode Content",
+        feed_file_id: Optional[str] = None,
+    ) -> "EpisodeFile":
+        """Creates the episode. With `feed_file_id`, also adds it to that feed's episode index."""
+        episode_file = EpisodeFile._create_file(client, rss_episode, content, feed_file_id)
+        if feed_file_id:
+            episode_file._add_to_feed_index(feed_file_id, rss_episode)
+            invalidate_feed_handle(feed_file_id)
+        return episode_file
+
+    @staticmethod
+    def create_many(
+        client: Steamship,
+        rss_episodes: Sequence[RssEpisode],
+        contents: Optional[Sequence[Union[str, List[str]]]] = None,
+        feed_file_id: Optional[str] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ) -> List[BulkItemResult]:
+        """Creates many episodes, `max_concurrency` writes at a time.
+
+        All episode Files are created first, then (with `feed_file_id`) their feed index entries, and the feed
+        handle is invalidated once at the end. Returns one BulkItemResult per episode, in order: `result` is the
+        EpisodeFile if its File was created, and `error` is whatever failed (an item whose File exists but whose
+        index entry failed has both). One failure doesn't stop the rest.
+        """
+        contents = contents if contents is not None else ["Episode Content"] * len(rss_episodes)
+        if len(contents) != len(rss_episodes):
+            raise SteamshipError(f"Got {len(rss_episodes)} episodes but {len(contents)} contents.")
+
+        results = run_bulk(
+            lambda pair: EpisodeFile._create_file(client, pair[0], pair[1], feed_file_id),
+            list(zip(rss_episodes, contents)),
+            max_concurrency,
+        )
+        if not feed_file_id:
+            return results
+
+        created = [result for result in results if result.ok]
+        indexed = run_bulk(
+            lambda result: result.result._add_to_feed_index(feed_file_id, rss_episodes[result.index]),
+            created,
+            max_concurrency,
+        )
+        invalidate_feed_handle(feed_file_id)
+        for created_result, index_result in zip(created, indexed):
+            if not index_result.ok:
+                results[created_result.index] = created_result._replace(error=index_result.error)
+        return results
+
+    def _add_to_feed_index(self, feed_file_id: str, rss_episode: RssEpisode) -> Tag:
+        return Tag.create(
+            self.file.client,
+            file_id=feed_file_id,
+            kind=EpisodeFile.INDEX_TAG_KIND,
+            name=self.file.id,
+            value={**rss_episode.dict(), "guid": self.file.id},
+        )
+
+    @staticmethod
+    def _create_file(
+        client: Steamship,
+        rss_episode: RssEpisode,
+        content: Optional[Union[str, List[str]]],
+        feed_file_id: Optional[str],
     ) -> "EpisodeFile":
         blocks = []
 
@@ -134,10 +414,18 @@ class EpisodeFile:
                 )
             )
 
+        tags = [Tag(kind=EpisodeFile.TAG_KIND, name=EpisodeFile.TAG_NAME_DATA, value=rss_episode.dict())]
+        if feed_file_id:
+            tags.append(Tag(
+                kind=EpisodeFile.TAG_KIND,
+                name=EpisodeFile.TAG_NAME_FEED,
+                value={TagValueKey.STRING_VALUE: feed_file_id}
+            ))
+
         file = File.create(
             client,
             blocks=blocks,
-            tags=[Tag(kind=EpisodeFile.TAG_KIND, name=EpisodeFile.TAG_NAME_DATA, value=rss_episode.dict())]
+            tags=tags
         )
         return EpisodeFile(file=file)
 
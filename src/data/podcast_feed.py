@@ -1,18 +1,86 @@
 """Pydantic objects to describe a podcast feed."""
+import hashlib
+import json
+import threading
+import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 
-from typing import Optional, Union, List, Tuple
+from typing import Iterable, Iterator, NamedTuple, Optional, Union, List, Tuple
 
 from pydantic import Field
 from steamship.base.model import CamelModel
 from steamship.data import TagKind
 from steamship.data.tags.tag_constants import TagValueKey
-from data.podcast_episode import RssEpisode, EpisodeFile
-from data.utils import xmlify
+from data.podcast_episode import (
+    OLDEST_PUB_DATE, EpisodeFile, EpisodeIndexEntry, EpisodeRecord, RssEpisode, latest_datetime, parse_pub_date,
+    parse_updated_at, updated_at_value,
+)
+from data.feed_registry import FEED_FILE_IDS, FEED_HANDLES, cache_feed_handle, invalidate_feed_handle
+from data.utils import XmlSerializer, xml_bool
+from data.lru_cache import LruCache
 
 from typing import Optional, Union, List, Tuple, cast
 
 from steamship import File, Steamship, Block, Tag, DocTag, SteamshipError
 
+RSS_HEADER_XML = """<?xml version="1.0" encoding="UTF-8"?>
+            <rss xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd" version="2.0">
+            <channel>"""
+RSS_FOOTER_XML = "</channel></rss>"
+
+RSS_CHANNEL_SERIALIZER = XmlSerializer([
+    ("title", None, None),
+    ("author", None, None),
+    ("itunes:author", None, None),
+    ("description", None, None),
+    ("itunes:summary", None, None),
+    ("itunes:image", "href", None),
+    ("link", None, None),
+    ("language", None, None),
+    ("copyright", None, None),
+    ("itunes:explicit", None, None),
+    ("itunes:category", None, None),
+])
+"""Serializer for the RSS <channel> metadata. Values must be supplied in this order; see `RssFeed.rss_header_xml`."""
+
+RSS_ITEM_FRAGMENTS = LruCache(max_entries=50_000, max_bytes=64 * 1024 * 1024, ttl_seconds=None)
+"""Rendered <item> fragments keyed by base URL and episode content hash. Old episodes never change, so they stay hot."""
+
+DEFAULT_FEED_GUID = ""
+"""Directory key for the feed returned when no guid is given (the workspace's first feed)."""
+
+_feed_create_lock = threading.Lock()
+
+
+class FeedValidators(NamedTuple):
+    """HTTP cache validators for a rendered feed."""
+
+    etag: str
+    last_modified: Optional[datetime]
+
+    def headers(self) -> dict:
+        headers = {"ETag": self.etag}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+    def not_modified(self, if_none_match: Optional[str] = None, if_modified_since: Optional[str] = None) -> bool:
+        """Whether a client sending these conditional headers already has the current feed (RFC 7232)."""
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            # Weak comparison: a W/ prefix is ignored (str.removeprefix needs Python 3.9).
+            return "*" in tags or any((tag[2:] if tag.startswith("W/") else tag) == self.etag for tag in tags)
+        if if_modified_since and self.last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            return self.last_modified.replace(microsecond=0) <= since
+        return False
+
 
 class RssFeed(CamelModel):
     """Pydantic object that represents an RSS Feed."""
@@ -28,35 +96,84 @@ class RssFeed(CamelModel):
     category: Optional[str] = Field(None, description="Content category of the feed.")
     is_explicit: Optional[bool] = Field(None, description="Whether the feed is explicit")
 
-    def rss_xml(self, base_url: str, episodes: Optional[List[RssEpisode]] = None):
+    def rss_header_xml(self) -> str:
+        """Return everything in the feed that precedes the first <item>."""
+        return RSS_HEADER_XML + RSS_CHANNEL_SERIALIZER.render((
+            self.title,
+            self.author,
+            self.author,
+            self.summary,
+            self.summary,
+            self.image_url,
+            self.web_url,
+            self.language,
+            self.copyright,
+            xml_bool(self.is_explicit),
+            self.category,
+        ))
+
+    def iter_rss_xml(
+        self, base_url: str, episodes: Optional[Iterable[Union[RssEpisode, EpisodeRecord]]] = None
+    ) -> Iterator[str]:
+        """Yield the RSS feed in chunks: the header, one chunk per <item>, then the footer.
+
+        `episodes` is consumed lazily, so a generator of episodes renders with flat memory and the header can be
+        sent before any episode has been loaded.
+        """
+        yield self.rss_header_xml()
+        for episode in episodes or []:
+            yield episode.rss_xml(base_url=base_url)
+        yield RSS_FOOTER_XML
+
+    def rss_xml(self, base_url: str, episodes: Optional[Iterable[Union[RssEpisode, EpisodeRecord]]] = None):
         """Return the RSS feed."""
+        return "".join(self.iter_rss_xml(base_url, episodes))
 
-        ret = """<?xml version="1.0" encoding="UTF-8"?>
-            <rss xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd" version="2.0">
-            <channel>"""
+class FeedIndexRecord:
+    """An episode as listed in its feed's index. Renders like an EpisodeFile without loading the episode's File."""
+
+    guid: str
+    value: dict
+    has_audio: bool
+    audio_completed: Optional[datetime]
+
+    def __init__(self, guid: str, value: Optional[dict], has_audio: bool, audio_completed: Optional[datetime] = None):
+        self.guid = guid
+        self.value = value or {}
+        self.has_audio = has_audio
+        self.audio_completed = audio_completed
+        self._content_hash = None
+
+    def content_hash(self) -> str:
+        if self._content_hash is None:
+            payload = json.dumps(self.value, sort_keys=True, separators=(",", ":"), default=str)
+            self._content_hash = hashlib.md5(f"{self.guid}\0{payload}".encode()).hexdigest()
+        return self._content_hash
+
+    def pub_datetime(self) -> Optional[datetime]:
+        return parse_pub_date(self.value.get("pub_date"))
+
+    def last_modified(self) -> Optional[datetime]:
+        return latest_datetime(self.pub_datetime(), self.audio_completed)
+
+    def episode_record(self) -> EpisodeRecord:
+        return EpisodeRecord.from_value(self.value, guid=self.guid)
+
+    def episode_obj(self) -> RssEpisode:
+        episode = RssEpisode.parse_obj(self.value)
+        episode.guid = self.guid
+        return episode
+
+    def entry(self) -> EpisodeIndexEntry:
+        return EpisodeIndexEntry.parse_obj({**self.value, "guid": self.guid, "has_audio": self.has_audio})
 
-        ret += xmlify([
-            (self.title, "title", None, None),
-            (self.author, "author", None, None),
-            (self.author, "itunes:author", None, None),
-            (self.summary, "description", None, None),
-            (self.summary, "itunes:summary", None, None),
-            (self.image_url, "itunes:image", "href", None),
-            (self.web_url, "link", None, None),
-            (self.language, "language", None, None),
-            (self.copyright, "copyright", None, None),
-            (self.is_explicit, "itunes:explicit", None, None),
-            (self.category, "itunes:category", None, None),
-        ])
-
-        for episode in episodes:
-            ret += episode.rss_xml(base_url=base_url)
-
-        ret += "</channel></rss>"
-        return ret
 
 class FeedFile:
-    """Wrapper object that helps store an RSS Feed on a Steamship File."""
+    """Wrapper object that helps store an RSS Feed on a Steamship File.
+
+    The feed's File also carries an index of its episodes (one tag per episode, maintained by `EpisodeFile.create`
+    and `EpisodeFile.mark_audio_complete`), so the feed renders from a single read of this File.
+    """
 
     file: File
     TAG_KIND = "feed"
@@ -65,12 +182,137 @@ class FeedFile:
     def __init__(self, file: File):
         self.file = file
 
-    def to_rss(self, base_url: str, episode_files: List[EpisodeFile]) -> str:
+    def refresh(self) -> "FeedFile":
+        """Re-reads this feed's File (and so its episode index) in one request."""
+        self.file = File.get(self.file.client, _id=self.file.id)
+        cache_feed_handle(self.file)
+        return self
+
+    def episode_records(self, with_audio: Optional[bool] = None, latest: Optional[int] = None) -> List[FeedIndexRecord]:
+        """Returns the indexed episodes, newest first, optionally only those with audio and only the latest N."""
+        tags = self.file.tags or []
+        audio_tags = {tag.name: tag for tag in tags if tag.kind == EpisodeFile.INDEX_AUDIO_TAG_KIND}
+        records = [
+            FeedIndexRecord(
+                tag.name,
+                tag.value,
+                tag.name in audio_tags,
+                parse_updated_at(audio_tags[tag.name].value) if tag.name in audio_tags else None,
+            )
+            for tag in tags
+            if tag.kind == EpisodeFile.INDEX_TAG_KIND
+        ]
+        if with_audio is not None:
+            records = [record for record in records if record.has_audio == with_audio]
+
+        records.sort(key=lambda record: record.pub_datetime() or OLDEST_PUB_DATE, reverse=True)
+        return records[:latest] if latest is not None else records
+
+    def episode_index(self, with_audio: Optional[bool] = None, latest: Optional[int] = None) -> List[EpisodeIndexEntry]:
+        """Returns the compact index entries of this feed's episodes, newest first."""
+        return [record.entry() for record in self.episode_records(with_audio=with_audio, latest=latest)]
+
+    def rebuild_index(self) -> int:
+        """Adds this feed's episodes that are missing from its index. Returns how many were added.
+
+        Episodes tagged with another feed are skipped. Episodes with no feed (e.g. created before feeds had indexes)
+        are adopted: they are tagged with this feed and indexed here.
+        """
+        client = self.file.client
+        tags = self.file.tags or []
+        indexed = {tag.name for tag in tags if tag.kind == EpisodeFile.INDEX_TAG_KIND}
+        with_audio_ids = {tag.name for tag in tags if tag.kind == EpisodeFile.INDEX_AUDIO_TAG_KIND}
+
+        added = 0
+        for episode_file in EpisodeFile.list_tags_only(client):
+            feed_file_id = episode_file.feed_file_id()
+            if feed_file_id not in (None, self.file.id):
+                continue
+            episode_id = episode_file.file.id
+            if feed_file_id is None:
+                Tag.create(
+                    client,
+                    file_id=episode_id,
+                    kind=EpisodeFile.TAG_KIND,
+                    name=EpisodeFile.TAG_NAME_FEED,
+                    value={TagValueKey.STRING_VALUE: self.file.id},
+                )
+            if episode_id not in indexed:
+                value = episode_file.episode_obj().dict()
+                Tag.create(client, file_id=self.file.id, kind=EpisodeFile.INDEX_TAG_KIND, name=episode_id, value=value)
+                added += 1
+            audio_tag = episode_file.audio_tag()
+            if episode_id not in with_audio_ids and audio_tag is not None:
+                Tag.create(
+                    client,
+                    file_id=self.file.id,
+                    kind=EpisodeFile.INDEX_AUDIO_TAG_KIND,
+                    name=episode_id,
+                    value=audio_tag.value,
+                )
+        self.refresh()
+        return added
+
+    def _published_episodes(
+        self, episode_files: Optional[Iterable[EpisodeFile]], latest: Optional[int]
+    ) -> Iterable[Union[EpisodeFile, FeedIndexRecord]]:
+        if episode_files is None:
+            return self.episode_records(with_audio=True, latest=latest)
+        return episode_files
+
+    def iter_rss(
+        self,
+        base_url: str,
+        episode_files: Optional[Iterable[EpisodeFile]] = None,
+        latest: Optional[int] = None,
+    ) -> Iterator[str]:
+        """Yields the RSS for this feed in chunks.
+
+        Without `episode_files`, the feed lists the indexed episodes that have audio, newest first (optionally only
+        the `latest` N). Each <item> comes from the fragment cache when its episode is unchanged; only new or edited
+        episodes are parsed and rendered.
+        """
+        episode_files = self._published_episodes(episode_files, latest)
+        yield self.feed_obj().rss_header_xml()
+        for episode_file in episode_files:
+            key = f"{base_url}\0{episode_file.content_hash()}"
+            fragment = RSS_ITEM_FRAGMENTS.get(key)
+            if fragment is None:
+                fragment = episode_file.episode_record().rss_xml(base_url=base_url)
+                RSS_ITEM_FRAGMENTS.set(key, fragment, size=len(fragment))
+            yield fragment
+        yield RSS_FOOTER_XML
+
+    def to_rss(
+        self,
+        base_url: str,
+        episode_files: Optional[Iterable[EpisodeFile]] = None,
+        latest: Optional[int] = None,
+    ) -> str:
         """Returns the RSS for this feed."""
-        feed = self.feed_obj()
-        episodes = [file.episode_obj() for file in episode_files]
-        xml = feed.rss_xml(base_url, episodes)
-        return xml
+        return "".join(self.iter_rss(base_url, episode_files, latest))
+
+    def validators(
+        self,
+        base_url: str,
+        episode_files: Optional[Iterable[EpisodeFile]] = None,
+        latest: Optional[int] = None,
+    ) -> FeedValidators:
+        """Returns the feed's ETag and Last-Modified, computed from stored data without rendering anything.
+
+        Last-Modified is the latest of the feed metadata's update time and each listed episode's pub_date or audio
+        completion, so every worker reports the same value for the same feed. It is None if none of those is known.
+        """
+        episode_files = self._published_episodes(episode_files, latest)
+        tag = self.feed_tag()
+        digest = hashlib.md5(base_url.encode())
+        digest.update(json.dumps(tag.value if tag else None, sort_keys=True, default=str).encode())
+        last_modified = parse_updated_at(tag.value) if tag else None
+        for episode_file in episode_files:
+            digest.update(episode_file.content_hash().encode())
+            last_modified = latest_datetime(last_modified, episode_file.last_modified())
+        etag = f'"{digest.hexdigest()}"'
+        return FeedValidators(etag=etag, last_modified=last_modified)
 
     def feed_tag(self) -> Optional[Tag]:
         """Returns the file tag that stores the feed metadata."""
@@ -79,6 +321,18 @@ class FeedFile:
                 return tag
         return None
 
+    def update(self, rss_feed: RssFeed) -> "FeedFile":
+        """Replaces the feed's metadata (its guid is kept) and refreshes the cached handle."""
+        client = self.file.client
+        current = self.feed_tag()
+        rss_feed = rss_feed.copy(update={"guid": self.feed_obj().guid})
+        value = {**rss_feed.dict(), **updated_at_value()}
+        Tag.create(client, file_id=self.file.id, kind=FeedFile.TAG_KIND, value=value)
+        if current is not None:
+            current.delete()
+        invalidate_feed_handle(self.file.id)
+        return self.refresh()
+
     def feed_obj(self) -> RssFeed:
         """Returns the Feed object stored in this file."""
         tag = self.feed_tag()
@@ -86,26 +340,90 @@ class FeedFile:
             return RssFeed.parse_obj(tag.value)
         return RssFeed()
 
+    @staticmethod
+    def _directory_key(client: Steamship, guid: str) -> str:
+        config = client.config
+        return f"{config.workspace_id or config.workspace_handle or ''}\0{guid}"
+
+    @staticmethod
+    def resolve_id(client: Steamship, guid: Optional[str] = None) -> Optional[str]:
+        """Returns the File id of the feed with this guid (or of the default feed), without loading any File.
+
+        Lookups are served from an in-process directory; a miss is a single indexed tag query.
+        """
+        guid = guid or DEFAULT_FEED_GUID
+        key = FeedFile._directory_key(client, guid)
+        file_id = FEED_FILE_IDS.get(key)
+        if file_id is not None:
+            return file_id
+
+        if guid == DEFAULT_FEED_GUID:
+            tags = Tag.query(client, f'kind "{FeedFile.TAG_KIND}"').tags or []
+        else:
+            tags = Tag.query(client, f'kind "{FeedFile.TAG_GUID_KIND}" and name "{guid}"').tags or []
+        file_id = next((tag.file_id for tag in tags if tag.file_id), None)
+        if file_id is not None:
+            FEED_FILE_IDS.set(key, file_id)
+        return file_id
+
+    @staticmethod
+    def invalidate(client: Steamship, guid: Optional[str] = None):
+        """Drops a feed's directory entry, e.g. after it was deleted elsewhere."""
+        FEED_FILE_IDS.delete(FeedFile._directory_key(client, guid or DEFAULT_FEED_GUID))
+
+    @staticmethod
+    def get(client: Steamship, guid: Optional[str] = None, fresh: bool = False) -> Optional["FeedFile"]:
+        """Returns the feed with this guid (or the default feed), or None if there is none.
+
+        Recently loaded feeds are served from the in-process handle cache unless `fresh` is set.
+        """
+        for _ in range(2):
+            file_id = FeedFile.resolve_id(client, guid)
+            if file_id is None:
+                return None
+            file = None if fresh else FEED_HANDLES.get(file_id)
+            if file is not None:
+                return FeedFile(file)
+            try:
+                file = File.get(client, _id=file_id)
+            except SteamshipError:
+                # The cached id points at a deleted feed; look it up again.
+                FeedFile.invalidate(client, guid)
+                continue
+            cache_feed_handle(file)
+            return FeedFile(file)
+        return None
+
+    def delete(self):
+        """Deletes this feed's File and its directory entries."""
+        client = self.file.client
+        guid = self.feed_obj().guid
+        self.file.delete()
+        invalidate_feed_handle(self.file.id)
+        FeedFile.invalidate(client, guid)
+        FeedFile.invalidate(client, DEFAULT_FEED_GUID)
+
     @staticmethod
     def create(
         client: Steamship,
         base_url: str,
         rss_feed: Optional[RssFeed] = None,
     ) -> "FeedFile":
-        # Only allow one per workspace
-        files = File.query(client, f'filetag and kind "{FeedFile.TAG_KIND}"')
-        if files and files.files and len(files.files) > 0:
-            raise SteamshipError("This package is designed to host only one Podcast feed per workspace.")
+        """Creates a feed. A workspace can host any number of feeds, each addressed by its guid.
 
-        rss_feed = rss_feed or RssFeed()
+        A guid is assigned if `rss_feed` has none.
+        """
+        rss_feed = rss_feed.copy() if rss_feed else RssFeed()
+        rss_feed.guid = rss_feed.guid or uuid.uuid4().hex
 
         blocks = []
         blocks.append(Block(text="This file represents a podcast feed."))
 
-        tags = [Tag(kind=FeedFile.TAG_KIND, value=rss_feed.dict())]
-        if rss_feed and rss_feed.guid:
-            tags.append(Tag(kind=FeedFile.TAG_GUID_KIND, name=rss_feed.guid))
-        if rss_feed and rss_feed.title:
+        tags = [
+            Tag(kind=FeedFile.TAG_KIND, value={**rss_feed.dict(), **updated_at_value()}),
+            Tag(kind=FeedFile.TAG_GUID_KIND, name=rss_feed.guid),
+        ]
+        if rss_feed.title:
             tags.append(Tag(kind=TagKind.DOCUMENT, name=DocTag.TITLE, value={TagValueKey.STRING_VALUE: rss_feed.guid}))
 
         file = File.create(
@@ -114,16 +432,39 @@ class FeedFile:
             tags=tags
         )
 
+        FEED_FILE_IDS.set(FeedFile._directory_key(client, rss_feed.guid), file.id)
+        cache_feed_handle(file)
         return FeedFile(file=file)
 
+    @staticmethod
+    def ensure_id(client: Steamship, base_url: str, rss_feed: Optional[RssFeed] = None) -> str:
+        """Returns the File id of the feed with `rss_feed.guid` (or of the default feed), creating the feed if needed.
+
+        Unlike `get_or_create`, an existing feed is found through the id directory alone, so no File is loaded.
+        """
+        guid = rss_feed.guid if rss_feed else None
+        file_id = FeedFile.resolve_id(client, guid)
+        if file_id is not None:
+            return file_id
+
+        with _feed_create_lock:
+            # Another thread in this worker may have created it while we waited.
+            file_id = FeedFile.resolve_id(client, guid)
+            if file_id is None:
+                file_id = FeedFile.create(client, base_url=base_url, rss_feed=rss_feed).file.id
+        return file_id
+
     @staticmethod
     def get_or_create(client: Steamship, base_url: str, rss_feed: Optional[RssFeed] = None,) -> "FeedFile":
-        query = f'filetag and kind "{FeedFile.TAG_KIND}"'
-        if rss_feed and rss_feed.guid:
-            query = f'filetag and kind "{FeedFile.TAG_GUID_KIND}" and name "{rss_feed.guid}"'
+        """Returns the feed with `rss_feed.guid` (or the default feed when there is no guid), creating it if needed."""
+        guid = rss_feed.guid if rss_feed else None
+        feed_file = FeedFile.get(client, guid)
+        if feed_file is not None:
+            return feed_file
 
-        files = File.query(client, query)
-        if files and files.files and len(files.files) > 0:
-            return FeedFile(files.files[0])
-        else:
-            return FeedFile.create(client, base_url=base_url, rss_feed=rss_feed)
+        with _feed_create_lock:
+            # Another thread in this worker may have created it while we waited.
+            feed_file = FeedFile.get(client, guid)
+            if feed_file is None:
+                feed_file = FeedFile.create(client, base_url=base_url, rss_feed=rss_feed)
+        return feed_file
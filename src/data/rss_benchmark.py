@@ -0,0 +1,196 @@
+"""Benchmark RSS rendering throughput.
+
+Run from the `src` directory:
+
+    python -m data.rss_benchmark [--items 10000] [--records 50000] [--repeat 5]
+
+Rendering: compares the original path (per-call xmlify tuple lists and `+=` concatenation, no escaping), the same
+path with values escaped by `xml.sax.saxutils`, and the precompiled, escaping XmlSerializer path used by
+RssFeed/RssEpisode.
+
+Construction: compares building pydantic RssEpisodes from stored tag values with building slotted EpisodeRecords,
+by time and by memory retained.
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from typing import Callable, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from data.podcast_episode import EpisodeRecord, RssEpisode
+from data.podcast_feed import RssFeed
+
+
+def xmlify(values: List[Tuple[str, str, Optional[str], Optional[str]]]) -> str:
+    """The original value-to-XML helper, kept here as the benchmark's baseline. Does not escape values."""
+    parts = []
+    for value, tag_name, attribute_name, extras in values:
+        if extras is None:
+            extras = ""
+        if value is not None:
+            if attribute_name is not None:
+                parts.append(f"<{tag_name} {attribute_name}=\"{value}\" {extras} />")
+            else:
+                parts.append(f"<{tag_name} {extras}>{value}</{tag_name}>")
+    return "".join(parts)
+
+
+def _identity(value):
+    return value
+
+
+def _escape(value: Optional[str]) -> Optional[str]:
+    return None if value is None else escape(value)
+
+
+def _escape_attribute(value: Optional[str]) -> Optional[str]:
+    return None if value is None else quoteattr(value)[1:-1]
+
+
+def legacy_item_xml(episode: RssEpisode, base_url: str, esc=_identity, esc_attr=_identity) -> str:
+    """The original RssEpisode.rss_xml implementation, optionally escaping each value."""
+    ret = "<item>"
+
+    audio_url = episode.audio_url or f"{base_url}audio?id={episode.guid}"
+
+    is_explicit_value = None
+    if episode.is_explicit is True:
+        is_explicit_value = "yes"
+    elif episode.is_explicit is False:
+        is_explicit_value = "no"
+
+    ret += xmlify([
+        (esc(episode.title), "title", None, None),
+        (esc(episode.author), "author", None, None),
+        (esc(episode.author), "itunes:author", None, None),
+        (esc(episode.summary), "description", None, None),
+        (esc(episode.summary), "itunes:summary", None, None),
+        (esc_attr(audio_url), "enclosure", "url", "type=\"audio/mpeg\""),
+        (esc(episode.guid), "guid", None, None),
+        (is_explicit_value, "itunes:explicit", None, None),
+        (esc(episode.pub_date), "pubDate", None, None),
+    ])
+
+    ret += "</item>"
+    return ret
+
+
+def legacy_feed_xml(
+    feed: RssFeed, base_url: str, episodes: List[RssEpisode], esc=_identity, esc_attr=_identity
+) -> str:
+    """The original RssFeed.rss_xml implementation, optionally escaping each value."""
+    ret = """<?xml version="1.0" encoding="UTF-8"?>
+            <rss xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd" version="2.0">
+            <channel>"""
+
+    ret += xmlify([
+        (esc(feed.title), "title", None, None),
+        (esc(feed.author), "author", None, None),
+        (esc(feed.author), "itunes:author", None, None),
+        (esc(feed.summary), "description", None, None),
+        (esc(feed.summary), "itunes:summary", None, None),
+        (esc_attr(feed.image_url), "itunes:image", "href", None),
+        (esc(feed.web_url), "link", None, None),
+        (esc(feed.language), "language", None, None),
+        (esc(feed.copyright), "copyright", None, None),
+        (feed.is_explicit, "itunes:explicit", None, None),
+        (esc(feed.category), "itunes:category", None, None),
+    ])
+
+    for episode in episodes:
+        ret += legacy_item_xml(episode, base_url, esc, esc_attr)
+
+    ret += "</channel></rss>"
+    return ret
+
+
+def make_episodes(count: int) -> List[RssEpisode]:
+    return [
+        RssEpisode(
+            guid=f"episode-{i}",
+            title=f"Episode {i}: Cars & Drivers",
+            summary="A caller from Boston has a car that turns off when he makes a left-hand turn. " * 3,
+            author="The AI Podcaster",
+            is_explicit=i % 2 == 0,
+            pub_date="Mon, 01 May 2023 12:00:00 GMT",
+        )
+        for i in range(count)
+    ]
+
+
+def best_of(repeat: int, fn: Callable[[], str]) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def retained_bytes(build: Callable[[], list]) -> Tuple[int, list]:
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, result
+
+
+def benchmark_construction(count: int, repeat: int):
+    values = [(episode.guid, episode.dict()) for episode in make_episodes(count)]
+
+    def build_models() -> List[RssEpisode]:
+        return [RssEpisode.parse_obj(value) for _, value in values]
+
+    def build_records() -> List[EpisodeRecord]:
+        return EpisodeRecord.bulk(values)
+
+    print(f"Building {count} episodes from stored tag values (best of {repeat}):")
+    baseline = None
+    for name, build in (("RssEpisode", build_models), ("EpisodeRecord", build_records)):
+        seconds = best_of(repeat, build)
+        size, _ = retained_bytes(build)
+        baseline = baseline or seconds
+        print(
+            f"  {name:<16} {seconds * 1000:8.1f} ms  {count / seconds:12,.0f} episodes/s  "
+            f"{baseline / seconds:5.2f}x  {size / count:7.0f} bytes/episode retained"
+        )
+
+
+def benchmark_rendering(count: int, repeat: int):
+    base_url = "https://example.org/"
+    feed = RssFeed(title="Car Talk", summary="Automotive mysteries & laughter.", author="The AI Podcaster")
+    episodes = make_episodes(count)
+
+    results = {
+        "legacy xmlify": best_of(repeat, lambda: legacy_feed_xml(feed, base_url, episodes)),
+        "xmlify + escape": best_of(
+            repeat, lambda: legacy_feed_xml(feed, base_url, episodes, _escape, _escape_attribute)
+        ),
+        "XmlSerializer": best_of(repeat, lambda: feed.rss_xml(base_url, episodes)),
+    }
+
+    baseline = results["legacy xmlify"]
+    print(f"Rendering a {count}-item feed (best of {repeat}):")
+    for name, seconds in results.items():
+        print(
+            f"  {name:<16} {seconds * 1000:8.1f} ms  {count / seconds:12,.0f} items/s  "
+            f"{baseline / seconds:5.2f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    benchmark_rendering(args.items, args.repeat)
+    print()
+    benchmark_construction(args.records, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,101 +1,112 @@
-"""Pydantic objects to describe a podcast feed."""
+"""Helpers shared by the data models: bulk writes and XML serialization."""
 
-from typing import Optional, Union, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, NamedTuple, Optional, Sequence, TypeVar, List, Tuple
 
-from pydantic import Field
-from steamship.base.model import CamelModel
+DEFAULT_MAX_CONCURRENCY = 8
 
-def xmlify(values: List[Tuple[str, str, Optional[str], Optional[str]]]) -> str:
-    "Turn a list of values into XML elements. The tuple is: value, tagname, attname"
-    ret = ""
-    for value, tag_name, attribute_name, extras in values:
-        if extras is None:
-            extras = ""
-        if value is not None:
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class BulkItemResult(NamedTuple):
+    """The outcome of one item of a bulk write: its position in the input, its result, or the error it raised."""
+
+    index: int
+    result: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def run_bulk(fn: Callable[[T], R], items: Sequence[T], max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> List[BulkItemResult]:
+    """Apply `fn` to every item with at most `max_concurrency` in flight. One item failing never stops the others;
+    results come back in input order with each failure captured in its BulkItemResult."""
+
+    def attempt(indexed: Tuple[int, T]) -> BulkItemResult:
+        index, item = indexed
+        try:
+            return BulkItemResult(index, fn(item))
+        except Exception as error:
+            return BulkItemResult(index, error=error)
+
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(items)))) as executor:
+        return list(executor.map(attempt, enumerate(items)))
+
+
+def xml_escape_text(value: str) -> str:
+    """Escape a value for use as XML character data."""
+    if "&" in value:
+        value = value.replace("&", "&amp;")
+    if "<" in value:
+        value = value.replace("<", "&lt;")
+    if ">" in value:
+        value = value.replace(">", "&gt;")
+    return value
+
+
+def xml_escape_attribute(value: str) -> str:
+    """Escape a value for use inside a double-quoted XML attribute."""
+    value = xml_escape_text(value)
+    if "\"" in value:
+        value = value.replace("\"", "&quot;")
+    return value
+
+
+def xml_bool(value: Optional[bool]) -> Optional[str]:
+    """Render an optional boolean the way iTunes expects: yes/no, or omitted."""
+    if value is True:
+        return "yes"
+    if value is False:
+        return "no"
+    return None
+
+
+class XmlSerializer:
+    """A precompiled serializer for a fixed sequence of XML elements.
+
+    The plan is a list of (tag name, attribute name, extras) tuples, compiled once into literal prefix/suffix
+    strings and an escaping function. Rendering is then a single pass over the values, aligned with the plan, that
+    skips None values and escapes the rest.
+
+    Usage:
+
+        serializer = XmlSerializer([("title", None, None), ("enclosure", "url", 'type="audio/mpeg"')], wrapper="item")
+        serializer.render(["Tom & Jerry", "https://example.org/a.mp3"])
+
+    """
+
+    def __init__(self, plan: Sequence[Tuple[str, Optional[str], Optional[str]]], wrapper: Optional[str] = None):
+        steps = []
+        for tag_name, attribute_name, extras in plan:
+            extras = f" {extras}" if extras else ""
             if attribute_name is not None:
-                ret += f"<{tag_name} {attribute_name}=\"{value}\" {extras} />"
+                steps.append((f"<{tag_name} {attribute_name}=\"", f"\"{extras} />", xml_escape_attribute))
             else:
-                ret += f"<{tag_name} {extras}>{value}</{tag_name}>"
-    return ret
-
-
-class Episode(CamelModel):
-    """Pydantic object that represents an RSS <item> object."""
-
-    guid: Optional[str] = Field(None, description="GUID of the episode.")
-    title: Optional[str] = Field(None, description="Name of the episode.")
-    summary: Optional[str] = Field(None, description="Summary of the episode.")
-    author: Optional[str] = Field(None, description="Summary of the episode.")
-    web_url: Optional[str] = Field(None, description="Web URL of the episode audio.")
-    audio_url: Optional[str] = Field(None, description="Audio URL of the episode audio.")
-    is_explicit: Optional[bool] = Field(None, description="Whether the episode is explicit")
-    pub_date: Optional[str] = Field(None, description="When the episode was published")
-
-    def rss_xml(self, base_url: str) -> str:
-        """Return the RSS <item> element for this object."""
-        ret = "<item>"
-
-        audio_url = self.audio_url or f"{base_url}audio?id={self.guid}"
-
-        is_explicit_value = None
-        if self.is_explicit is True:
-            is_explicit_value = "yes"
-        elif self.is_explicit is False:
-            is_explicit_value = "no"
-
-        ret += xmlify([
-            (self.title, "title", None, None),
-            (self.author, "author", None, None),
-            (self.author, "itunes:author", None, None),
-            (self.summary, "description", None, None),
-            (self.summary, "itunes:summary", None, None),
-            (audio_url, "enclosure", "url", "type=\"audio/mpeg\""),
-            (self.guid, "guid", None, None),
-            (is_explicit_value, "itunes:explicit", None, None),
-            (self.pub_date, "pubDate", None, None),
-        ])
-
-        ret += "</item>"
-        return ret
-
-
-class Feed(CamelModel):
-    """Pydantic object that represents an RSS Feed."""
-
-    title: Optional[str] = Field(None, description="Name of the feed.")
-    web_url: Optional[str] = Field(None, description="Web URL of the feed.")
-    language: Optional[str] = Field(None, description="Language of the feed.")
-    copyright: Optional[str] = Field(None, description="Copyright text of the feed.")
-    author: Optional[str] = Field(None, description="Author text of the feed.")
-    summary: Optional[str] = Field(None, description="Summary text of the feed.")
-    image_url: Optional[str] = Field(None, description="Image URL of the feed art.")
-    category: Optional[str] = Field(None, description="Content category of the feed.")
-    is_explicit: Optional[bool] = Field(None, description="Whether the feed is explicit")
-
-    def rss_xml(self, base_url: str, episodes: Optional[List[Episode]] = None):
-        """Return the RSS feed."""
-
-        ret = """<?xml version="1.0" encoding="UTF-8"?>
-            <rss xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd" version="2.0">
-            <channel>"""
-
-        ret += xmlify([
-            (self.title, "title", None, None),
-            (self.author, "author", None, None),
-            (self.author, "itunes:author", None, None),
-            (self.summary, "description", None, None),
-            (self.summary, "itunes:summary", None, None),
-            (self.image_url, "itunes:image", "href", None),
-            (self.web_url, "link", None, None),
-            (self.language, "language", None, None),
-            (self.copyright, "copyright", None, None),
-            (self.is_explicit, "itunes:explicit", None, None),
-            (self.category, "itunes:category", None, None),
-        ])
-
-        for episode in episodes:
-            ret += episode.rss_xml(base_url=base_url)
-
-        ret += "</channel></rss>"
-        return ret
+                steps.append((f"<{tag_name}{extras}>", f"</{tag_name}>", xml_escape_text))
+        self._steps = tuple(steps)
+        self._open = f"<{wrapper}>" if wrapper else ""
+        self._close = f"</{wrapper}>" if wrapper else ""
+
+    def render(self, values: Sequence[Any]) -> str:
+        """Render the values, aligned with the plan, into XML."""
+        parts = [self._open]
+        append = parts.append
+        previous = previous_escape = escaped = None
+        for (prefix, suffix, escape), value in zip(self._steps, values):
+            if value is None:
+                continue
+            if value is not previous or escape is not previous_escape:
+                # Feeds repeat a value across adjacent tags (author/itunes:author, description/itunes:summary).
+                previous, previous_escape = value, escape
+                escaped = escape(value if type(value) is str else str(value))
+            append(prefix)
+            append(escaped)
+            append(suffix)
+        append(self._close)
+        return "".join(parts)
 
@@ -13,6 +13,8 @@ from steamship.data.workspace import SignedUrl, Workspace
 from steamship.invocable.dev_logging_handler import DevelopmentLoggingHandler
 from steamship.utils.signed_urls import upload_to_signed_url
 
+from tools.streaming_llm import was_streamed
+
 
 class SteamshipREPL(ABC):
     """Base class for building REPLs that facilitate running Steamship code in the IDE."""
@@ -56,12 +58,14 @@ class SteamshipREPL(ABC):
         return read_signed_url
 
     def print_blocks(self, blocks: List[Block], metadata: Dict[str, Any]):
-        """Print a list of blocks to console."""
+        """Print a list of blocks to console. Blocks already emitted while streaming are skipped."""
         output = None
         
         for block in blocks:
             if isinstance(block, dict):
                 block = Block.parse_obj(block)
+            if was_streamed(block):
+                continue
             if block.is_text():
                 output = block.text
             elif block.url:
@@ -108,6 +112,8 @@ class ToolREPL(SteamshipREPL):
         if context is None:
             context = AgentContext()
         context.client = client
+        # Show anything the tool emits while it runs (e.g. a streamed transcript). A new list: the default is shared.
+        context.emit_funcs = [*context.emit_funcs, self.print_blocks]
 
         print(f"Starting REPL for Tool {self.tool.name}...")
         print("If you make code changes, restart this REPL. Press CTRL+C to exit at any time.\n")
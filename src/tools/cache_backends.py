@@ -0,0 +1,195 @@
+"""Storage backends for ToolCache.
+
+The default backend is the workspace's Steamship KeyValueStore. For local development and edge instances, set
+`TOOL_CACHE_BACKEND=sqlite` (and optionally `TOOL_CACHE_SQLITE_PATH`) to use a persistent on-disk cache that
+survives restarts and temporary workspaces.
+"""
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from steamship import File, Steamship
+from steamship.agents.schema import AgentContext
+from steamship.utils.kv_store import KV_STORE_MARKER, KeyValueStore
+
+BACKEND_ENV_VAR = "TOOL_CACHE_BACKEND"
+SQLITE_PATH_ENV_VAR = "TOOL_CACHE_SQLITE_PATH"
+DEFAULT_SQLITE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ai-podcaster", "tool_cache.sqlite3")
+SQLITE_MAX_KEYS_PER_STATEMENT = 500
+"""Stay well under SQLite's bound-parameter limit when querying many keys at once."""
+KV_MAX_CONCURRENT_DELETES = 8
+
+
+class CacheBackend(ABC):
+    """Persistent key -> dict storage for a single tool's cache."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Return the records present for `keys`, in as few round trips as the backend allows."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any]):
+        raise NotImplementedError()
+
+    @abstractmethod
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Return every (key, record) pair in the store."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def delete_many(self, keys: List[str]) -> int:
+        """Delete the given keys, returning how many were present."""
+        raise NotImplementedError()
+
+    def delete(self, key: str) -> bool:
+        return self.delete_many([key]) > 0
+
+    def scope(self) -> str:
+        """Return a string scoping in-process cache keys, so one worker never mixes entries from different stores."""
+        return ""
+
+
+class KeyValueStoreBackend(CacheBackend):
+    """Backend on a Steamship KeyValueStore: one File per store, one Tag per entry."""
+
+    kv_store: KeyValueStore
+
+    def __init__(self, client: Steamship, store_identifier: str):
+        self.kv_store = KeyValueStore(client, store_identifier=store_identifier)
+
+    def _entry_tags(self) -> list:
+        """Return every entry tag of the backing store in one query."""
+        store_identifier = self.kv_store.store_identifier
+        files = File.query(self.kv_store.client, f'filetag and kind "{store_identifier}"').files
+        return [
+            tag
+            for file in files or []
+            for tag in file.tags or []
+            if tag.kind == store_identifier and tag.name != KV_STORE_MARKER
+        ]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.kv_store.get(key)
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        return dict(self.kv_store.items(filter_keys=keys))
+
+    def set(self, key: str, value: Dict[str, Any]):
+        self.kv_store.set(key, value)
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        return [(tag.name, tag.value or {}) for tag in self._entry_tags()]
+
+    def delete_many(self, keys: List[str]) -> int:
+        wanted = set(keys)
+        tags = [tag for tag in self._entry_tags() if tag.name in wanted]
+        if tags:
+            with ThreadPoolExecutor(max_workers=min(KV_MAX_CONCURRENT_DELETES, len(tags))) as executor:
+                list(executor.map(lambda tag: tag.delete(), tags))
+        return len(tags)
+
+    def scope(self) -> str:
+        config = self.kv_store.client.config
+        return config.workspace_id or config.workspace_handle or ""
+
+
+class SqliteBackend(CacheBackend):
+    """Backend on a local SQLite file. Lookups are sub-millisecond and entries persist across restarts.
+
+    Connections are shared per (process, path) and guarded by a lock, so many ToolCache instances can use the same
+    file concurrently.
+    """
+
+    _connections: Dict[str, Tuple[sqlite3.Connection, threading.Lock]] = {}
+    _connections_lock = threading.Lock()
+
+    path: str
+    store_identifier: str
+
+    def __init__(self, store_identifier: str, path: Optional[str] = None):
+        self.store_identifier = store_identifier
+        self.path = path or os.environ.get(SQLITE_PATH_ENV_VAR) or DEFAULT_SQLITE_PATH
+        self._connection, self._lock = self._connect(self.path)
+
+    @classmethod
+    def _connect(cls, path: str) -> Tuple[sqlite3.Connection, threading.Lock]:
+        with cls._connections_lock:
+            if path not in cls._connections:
+                if path != ":memory:":
+                    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS tool_cache ("
+                    "store TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (store, key))"
+                )
+                cls._connections[path] = (connection, threading.Lock())
+            return cls._connections[path]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM tool_cache WHERE store = ? AND key = ?", (self.store_identifier, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        for start in range(0, len(keys), SQLITE_MAX_KEYS_PER_STATEMENT):
+            chunk = keys[start:start + SQLITE_MAX_KEYS_PER_STATEMENT]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._connection.execute(
+                    f"SELECT key, value FROM tool_cache WHERE store = ? AND key IN ({placeholders})",
+                    (self.store_identifier, *chunk),
+                ).fetchall()
+            found.update((key, json.loads(value)) for key, value in rows)
+        return found
+
+    def set(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO tool_cache (store, key, value) VALUES (?, ?, ?)",
+                (self.store_identifier, key, json.dumps(value)),
+            )
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT key, value FROM tool_cache WHERE store = ?", (self.store_identifier,)
+            ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def delete_many(self, keys: List[str]) -> int:
+        deleted = 0
+        for start in range(0, len(keys), SQLITE_MAX_KEYS_PER_STATEMENT):
+            chunk = keys[start:start + SQLITE_MAX_KEYS_PER_STATEMENT]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                cursor = self._connection.execute(
+                    f"DELETE FROM tool_cache WHERE store = ? AND key IN ({placeholders})",
+                    (self.store_identifier, *chunk),
+                )
+            deleted += cursor.rowcount
+        return deleted
+
+    def scope(self) -> str:
+        return f"sqlite:{self.path}"
+
+
+def default_backend(store_identifier: str, context: AgentContext) -> CacheBackend:
+    """Return the backend selected by the `TOOL_CACHE_BACKEND` environment variable (`kv` or `sqlite`)."""
+    backend = os.environ.get(BACKEND_ENV_VAR, "kv").lower()
+    if backend == "sqlite":
+        return SqliteBackend(store_identifier)
+    return KeyValueStoreBackend(context.client, store_identifier)
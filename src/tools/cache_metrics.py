@@ -0,0 +1,81 @@
+import threading
+from typing import Dict
+
+
+class CacheMetrics:
+    """Thread-safe, process-wide counters and latencies for one tool's cache.
+
+    Lookup latency covers the cache itself (local + backend); compute latency covers the underlying tool call
+    made on a miss. Together they show whether a tool's cache is paying for itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+        self.lookup_max_seconds = 0.0
+        self.computes = 0
+        self.compute_seconds = 0.0
+        self.compute_max_seconds = 0.0
+
+    def record_hits(self, local: int = 0, backend: int = 0, misses: int = 0):
+        with self._lock:
+            self.local_hits += local
+            self.backend_hits += backend
+            self.misses += misses
+
+    def record_lookup(self, seconds: float):
+        with self._lock:
+            self.lookups += 1
+            self.lookup_seconds += seconds
+            self.lookup_max_seconds = max(self.lookup_max_seconds, seconds)
+
+    def record_compute(self, seconds: float):
+        with self._lock:
+            self.computes += 1
+            self.compute_seconds += seconds
+            self.compute_max_seconds = max(self.compute_max_seconds, seconds)
+
+    def report(self) -> Dict[str, float]:
+        """Return a summary suitable for logging or returning from an endpoint."""
+        with self._lock:
+            hits = self.local_hits + self.backend_hits
+            requests = hits + self.misses
+            avg_compute = self.compute_seconds / self.computes if self.computes else 0.0
+            return {
+                "requests": requests,
+                "hits": hits,
+                "local_hits": self.local_hits,
+                "backend_hits": self.backend_hits,
+                "misses": self.misses,
+                "hit_rate": hits / requests if requests else 0.0,
+                "avg_lookup_seconds": self.lookup_seconds / self.lookups if self.lookups else 0.0,
+                "max_lookup_seconds": self.lookup_max_seconds,
+                "avg_compute_seconds": avg_compute,
+                "max_compute_seconds": self.compute_max_seconds,
+                "estimated_seconds_saved": hits * avg_compute - self.lookup_seconds,
+            }
+
+
+_metrics: Dict[str, CacheMetrics] = {}
+_metrics_lock = threading.Lock()
+
+
+def get_cache_metrics(tool_name: str) -> CacheMetrics:
+    """Return the process-wide metrics for a tool's cache, creating them on first use."""
+    with _metrics_lock:
+        metrics = _metrics.get(tool_name)
+        if metrics is None:
+            metrics = CacheMetrics()
+            _metrics[tool_name] = metrics
+        return metrics
+
+
+def cache_report() -> Dict[str, Dict[str, float]]:
+    """Return the metrics report for every tool cache used in this process, keyed by tool name."""
+    with _metrics_lock:
+        items = list(_metrics.items())
+    return {tool_name: metrics.report() for tool_name, metrics in items}
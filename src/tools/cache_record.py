@@ -0,0 +1,49 @@
+"""Compact, optionally compressed encoding of cached Blocks."""
+import base64
+import json
+import zlib
+from typing import Any, Dict, Optional
+
+from steamship import Block
+
+RECORD_FORMAT_KEY = "format"
+RECORD_FORMAT = 2
+BLOCK_KEY = "block"
+COMPRESSED_BLOCK_KEY = "zblock"
+
+COMPRESSION_THRESHOLD_BYTES = 1024
+"""Blocks whose JSON is at least this large are zlib-compressed; smaller ones don't shrink enough to be worth it."""
+
+BLOCK_FIELDS = ("id", "file_id", "text", "mime_type", "url", "content_url", "public_data")
+"""The only Block fields needed to rebuild a cached output. Tags, upload state and the client are dropped."""
+
+
+def encode_block(block: Block, compression_threshold: int = COMPRESSION_THRESHOLD_BYTES) -> Dict[str, Any]:
+    """Return a compact record for `block`: empty fields are omitted and large payloads are compressed."""
+    compact = {}
+    for field in BLOCK_FIELDS:
+        value = getattr(block, field)
+        if value:
+            compact[field] = value
+
+    block_json = json.dumps(compact, separators=(",", ":"))
+    if len(block_json) < compression_threshold:
+        return {RECORD_FORMAT_KEY: RECORD_FORMAT, BLOCK_KEY: compact}
+
+    compressed = base64.b64encode(zlib.compress(block_json.encode())).decode("ascii")
+    return {RECORD_FORMAT_KEY: RECORD_FORMAT, COMPRESSED_BLOCK_KEY: compressed}
+
+
+def is_block_record(record: Optional[Dict[str, Any]]) -> bool:
+    """Whether `record` holds a cached block written by `encode_block`."""
+    return bool(record) and (BLOCK_KEY in record or COMPRESSED_BLOCK_KEY in record)
+
+
+def decode_block(record: Dict[str, Any]) -> Optional[Block]:
+    """Rebuild a Block from a record written by `encode_block`."""
+    if COMPRESSED_BLOCK_KEY in record:
+        compact = json.loads(zlib.decompress(base64.b64decode(record[COMPRESSED_BLOCK_KEY])))
+        return Block(**compact)
+    if BLOCK_KEY in record:
+        return Block(**record[BLOCK_KEY])
+    return None
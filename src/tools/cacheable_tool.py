@@ -0,0 +1,167 @@
+import hashlib
+import json
+from typing import Any, ClassVar, Dict, List, Optional, Union
+
+from pydantic import BaseModel, PrivateAttr
+from steamship import Block, Task
+from steamship.agents.schema import AgentContext, LLM
+from steamship.agents.utils import get_llm
+
+from tools.similarity_cache import SimilarityCache, get_similarity_cache
+from tools.tool_cache import DEFAULT_MAX_ENTRIES, ToolCache, default_cache_key
+
+CACHE_CONFIG_EXCLUDED_FIELDS = {
+    "name",
+    "human_description",
+    "agent_description",
+    "cache_enabled",
+    "cache_ttl_seconds",
+    "cache_max_entries",
+    "cache_similarity_threshold",
+}
+"""Tool fields that never affect output, so are left out of the configuration fingerprint."""
+
+
+def _canonical_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Sort row-like values (lists of lists), since generator tools shuffle their example rows in place."""
+    canonical = {}
+    for key, value in config.items():
+        if isinstance(value, list) and value and all(isinstance(row, list) for row in value):
+            value = sorted(value, key=lambda row: json.dumps(row, default=str))
+        canonical[key] = value
+    return canonical
+
+
+def llm_settings(llm: Optional[LLM]) -> Optional[Dict[str, Any]]:
+    """Return the settings of an LLM that affect its output (class, plugin, and plugin config such as model)."""
+    if llm is None:
+        return None
+    generator = getattr(llm, "generator", None)
+    return {
+        "type": type(llm).__name__,
+        "plugin": getattr(generator, "plugin_handle", None),
+        "config": getattr(generator, "config", None),
+    }
+
+
+class CacheableToolMixin(BaseModel):
+    """Mixin that adds ToolCache-backed caching to any synchronous Tool.
+
+    Place it before the tool class so its `run` wraps the tool's own:
+
+        class CachedSearchTool(CacheableToolMixin, SearchTool):
+            cache_ttl_seconds: Optional[float] = 24 * 60 * 60
+
+    Each input block is cached independently and is expected to produce at most one output block. Concurrent
+    misses on the same key are coalesced, so only one caller pays for the underlying call.
+
+    Keys combine the canonicalized input (`cache_key`) with a fingerprint of the tool's configuration and, for tools
+    that call the LLM, the context's LLM settings (`cache_fingerprint`), so editing a prompt or switching models
+    starts a fresh cache. Tools that never call the LLM set `cache_uses_llm = False` to keep their cache across
+    model changes.
+
+    Setting `cache_similarity_threshold` additionally serves exact-cache misses from the output of a near-duplicate
+    prior input (see `tools.similarity_cache`), before paying for the underlying call.
+    """
+
+    cache_enabled: bool = True
+    """Whether to consult and populate the cache. When False, `run` passes straight through to the tool."""
+
+    cache_ttl_seconds: Optional[float] = None
+    """How long a cached output stays valid. None means it never expires."""
+
+    cache_max_entries: Optional[int] = DEFAULT_MAX_ENTRIES
+    """Size budget for the persistent cache, enforced by `ToolCache.sweep`. None means unbounded."""
+
+    cache_similarity_threshold: Optional[float] = None
+    """Cosine similarity above which a near-duplicate prior input's output is reused. None disables the lookup."""
+
+    cache_uses_llm: ClassVar[bool] = True
+    """Whether the tool's output depends on the context's LLM, and so whether its settings are part of the key."""
+
+    _tool_cache: Optional[ToolCache] = PrivateAttr(None)
+
+    def cache_key(self, block: Block) -> str:
+        """Return the string that identifies this input for caching. Override to customize the key policy."""
+        return default_cache_key(block)
+
+    def cache_config(self) -> Dict[str, Any]:
+        """Return the tool configuration that determines its output. Override to exclude irrelevant fields."""
+        return self.dict(exclude=CACHE_CONFIG_EXCLUDED_FIELDS)
+
+    def cache_fingerprint(self, context: AgentContext) -> str:
+        """Return a digest of the tool configuration (and, if `cache_uses_llm`, the LLM settings) for this context.
+
+        Computed on every lookup rather than memoized: some tools (e.g. PodcastEpisodePremiseTool) set
+        configuration such as `new_row_prefix_fields` at run time.
+        """
+        fingerprint_source = {
+            "config": _canonical_config(self.cache_config()),
+            "llm": llm_settings(get_llm(context)) if self.cache_uses_llm else None,
+        }
+        fingerprint_json = json.dumps(fingerprint_source, sort_keys=True, default=str)
+        return hashlib.md5(fingerprint_json.encode()).hexdigest()
+
+    def cache_name(self) -> str:
+        """Return the name the cache is stored under. Defaults to the tool name."""
+        return self.name
+
+    @property
+    def tool_cache(self) -> ToolCache:
+        """Return the ToolCache for this tool, lazily creating it on first use."""
+        if self._tool_cache is None:
+            self._tool_cache = ToolCache(
+                self.cache_name(),
+                ttl_seconds=self.cache_ttl_seconds,
+                max_entries=self.cache_max_entries,
+                key_fn=self.cache_key,
+                fingerprint_fn=self.cache_fingerprint,
+            )
+        return self._tool_cache
+
+    def cache_scope(self, context: AgentContext) -> str:
+        """The scope (e.g. workspace) of this tool's cache in this context. In-process indexes are keyed by it, so one
+        worker serving several workspaces never shares entries between them."""
+        return self.tool_cache.scope(context)
+
+    def similarity_cache(self, context: AgentContext) -> Optional[SimilarityCache]:
+        """Return the near-duplicate index for this tool's current configuration and scope, if enabled."""
+        if self.cache_similarity_threshold is None:
+            return None
+        return get_similarity_cache(
+            f"{self.cache_scope(context)}/{self.cache_name()}:{self.cache_fingerprint(context)}",
+            threshold=self.cache_similarity_threshold,
+        )
+
+    def _compute(self, block: Block, context: AgentContext) -> Optional[Block]:
+        """Handle an exact-cache miss: reuse a near-duplicate's output if enabled, else run the tool."""
+        similarity_cache = self.similarity_cache(context)
+        input_text = self.cache_key(block)
+        if similarity_cache is not None and input_text:
+            match = similarity_cache.find_similar_input(input_text)
+            if match is not None:
+                return match[0]
+
+        output_block = self._run_uncached(block, context)
+        if similarity_cache is not None and input_text and output_block is not None:
+            similarity_cache.add(input_text, output_block)
+        return output_block
+
+    def _run_uncached(self, block: Block, context: AgentContext) -> Optional[Block]:
+        """Run the wrapped tool on a single block, returning its first output block."""
+        output_blocks = super().run([block], context)
+        if isinstance(output_blocks, Task):
+            raise NotImplementedError(f"{self.name} returned a Task; only synchronous tools can be cached.")
+        if len(output_blocks):
+            return output_blocks[0]
+        return None
+
+    def run(self, tool_input: List[Block], context: AgentContext) -> Union[List[Block], Task[Any]]:
+        """Run the tool, serving each input block from the cache when possible."""
+        if not self.cache_enabled:
+            return super().run(tool_input, context)
+
+        output_blocks = self.tool_cache.get_or_compute_many(
+            tool_input, lambda block: self._compute(block, context), context
+        )
+        return [output_block for output_block in output_blocks if output_block]
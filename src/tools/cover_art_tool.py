@@ -1,17 +1,20 @@
 """Tool for generating images."""
-from typing import List, Union, Any
+from typing import Optional
 
-from steamship import Block, Task
+from steamship import Block
 from steamship.agents.schema import AgentContext
 from steamship.agents.tools.base_tools import ImageGeneratorTool
 from steamship.agents.tools.image_generation.stable_diffusion import StableDiffusionTool
 from steamship.utils.repl import ToolREPL
 
+from tools.cacheable_tool import CacheableToolMixin
 
-class CoverArtTool(ImageGeneratorTool):
+
+class CoverArtTool(CacheableToolMixin, ImageGeneratorTool):
     """Tool to generate the Cover Art for the podcast.
 
     This example illustrates wrapping a tool (StableDiffusionTool) with a fixed prompt template that is combined with user input.
+    Generated art is cached per (canonicalized) podcast title, so repeated requests reuse the same image.
     """
 
     name: str = "CoverArtTool"
@@ -29,15 +32,24 @@ class CoverArtTool(ImageGeneratorTool):
                        "hires, high definition, award winning, no text, art only"
                        )
 
-    def run(self, tool_input: List[Block], context: AgentContext) -> Union[List[Block], Task[Any]]:
-        # Modify the tool inputs by interpolating them with stored prompt here
-        modified_inputs = [Block(text=self.prompt_template.format(subject=block.text)) for block in tool_input]
+    cache_ttl_seconds: Optional[float] = None
+    """Cover art for a title doesn't go stale."""
+
+    cache_uses_llm = False
+
+    def _run_uncached(self, block: Block, context: AgentContext) -> Optional[Block]:
+        """Generate cover art for one input; `run` (from CacheableToolMixin) calls this on cache misses."""
+        # Modify the tool input by interpolating it with stored prompt here
+        modified_input = Block(text=self.prompt_template.format(subject=block.text))
 
         # Create the Stable Diffusion tool we want to wrap
         stable_diffusion_tool = StableDiffusionTool()
 
-        # Now return the results of running Stable Diffusion on those modified prompts.
-        return stable_diffusion_tool.run(modified_inputs, context)
+        # Now return the result of running Stable Diffusion on the modified prompt.
+        output_blocks = stable_diffusion_tool.run([modified_input], context)
+        if len(output_blocks):
+            return output_blocks[0]
+        return None
 
 
 if __name__ == "__main__":
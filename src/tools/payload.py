@@ -0,0 +1,65 @@
+"""Typed payloads carried alongside Blocks between tools.
+
+The podcast tools hand each other JSON in `block.text`. Rather than having every downstream tool re-parse that text
+(and re-serialize it after adding fields), a tool attaches the parsed pydantic model to the Block it returns, and
+readers take that model directly. The text is still written, once, for the agent and the tool cache; Blocks that
+arrive without a payload (from the cache, or from outside the process) are parsed from their text as before.
+
+JSON is encoded with orjson when it is installed, and the standard library otherwise.
+"""
+import json
+from typing import Any, Optional, Type, TypeVar
+
+from pydantic import BaseModel, PrivateAttr
+from steamship import Block
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def dumps(value: Any) -> str:
+    """Encodes JSON-compatible data as a compact string."""
+    if orjson is not None:
+        return orjson.dumps(value).decode()
+    return json.dumps(value, separators=(",", ":"))
+
+
+def loads(text: str) -> Any:
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+class PayloadBlock(Block):
+    """A Block that also holds the parsed model its text was serialized from. The payload is never serialized."""
+
+    _payload: Optional[BaseModel] = PrivateAttr(None)
+
+
+def attach_payload(block: Block, payload: BaseModel, serialize: bool = True) -> PayloadBlock:
+    """Returns `block` (as a PayloadBlock) carrying `payload`.
+
+    With `serialize`, the block's text is set to the payload's JSON; otherwise the caller guarantees the text
+    already encodes it.
+    """
+    if not isinstance(block, PayloadBlock):
+        block = PayloadBlock.construct(_fields_set=block.__fields_set__, **block.__dict__)
+    if serialize:
+        block.text = dumps(payload.dict())
+    block._payload = payload
+    return block
+
+
+def payload_of(block: Block, model: Type[M]) -> M:
+    """The block's payload as `model`: the attached one if it is of that type, else parsed (once) from the text."""
+    payload = block._payload if isinstance(block, PayloadBlock) else None
+    if isinstance(payload, model):
+        return payload
+    payload = model.parse_obj(loads(block.text))
+    if isinstance(block, PayloadBlock) and block._payload is None:
+        block._payload = payload
+    return payload
@@ -0,0 +1,245 @@
+"""A small engine for running tool chains as a DAG of memoized stages.
+
+Each Stage declares the names of its inputs: other stages, or external inputs supplied to `Pipeline.run`. A run
+schedules every stage as soon as its inputs are ready (so independent stages run concurrently) and memoizes each
+stage's output by a hash of its name, version and input values. Re-running with a changed input therefore recomputes
+only the stages downstream of that change.
+
+Usage:
+
+    pipeline = Pipeline("example", [
+        Stage("upper", ["text"], lambda inputs, context: inputs["text"].upper()),
+        Stage("length", ["upper"], lambda inputs, context: len(inputs["upper"])),
+    ])
+    result = pipeline.run({"text": "hello"}, context)
+    result.values["length"]  # -> 5
+"""
+import hashlib
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+from pydantic import BaseModel
+from steamship import Block, SteamshipError
+from steamship.agents.schema import AgentContext
+
+from tools.cache_record import encode_block
+from data.lru_cache import LruCache
+
+DEFAULT_PIPELINE_CONCURRENCY = 4
+DEFAULT_MEMO_MAX_ENTRIES = 1024
+DEFAULT_MEMO_MAX_BYTES = 16 * 1024 * 1024
+
+StageFn = Callable[[Dict[str, Any], AgentContext], Any]
+
+
+def _hashable(value: Any) -> Any:
+    """JSON stand-ins for the non-JSON values stages pass around. Other types are rejected rather than hashed by
+    repr, which may embed an object's address (so the memo never hits) or leave out the fields that matter."""
+    if isinstance(value, Block):
+        return encode_block(value)
+    if isinstance(value, BaseModel):
+        return value.dict()
+    raise TypeError(f"Pipeline values must be JSON data, Blocks or pydantic models, not {type(value).__name__}.")
+
+
+def content_hash(value: Any) -> str:
+    """A stable hash of a stage value: JSON-like data by content, Blocks by their cached fields. Raises TypeError
+    for values of any other type."""
+    payload = json.dumps(value, sort_keys=True, separators=(",", ":"), default=_hashable)
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+class Stage:
+    """One step of a Pipeline. `fn` receives the values of its declared inputs, by name, and the AgentContext.
+
+    Bump `version` when the stage's behavior changes so earlier memoized outputs are not reused. Stages that should
+    produce something new on every run (rather than reuse a prior result for the same inputs) set `memoize=False`.
+    """
+
+    name: str
+    inputs: List[str]
+    fn: StageFn
+    version: str
+    memoize: bool
+
+    def __init__(self, name: str, inputs: Sequence[str], fn: StageFn, version: str = "1", memoize: bool = True):
+        self.name = name
+        self.inputs = list(inputs)
+        self.fn = fn
+        self.version = version
+        self.memoize = memoize
+
+
+class StageResult:
+    """What running one stage produced, and whether it came from the memo."""
+
+    name: str
+    value: Any
+    key: str
+    cached: bool
+    seconds: float
+
+    def __init__(self, name: str, value: Any, key: str, cached: bool, seconds: float):
+        self.name = name
+        self.value = value
+        self.key = key
+        self.cached = cached
+        self.seconds = seconds
+
+
+class PipelineRun:
+    """The outcome of `Pipeline.run`: every input and stage value by name, plus per-stage results."""
+
+    values: Dict[str, Any]
+    results: Dict[str, StageResult]
+    seconds: float
+
+    def __init__(self, values: Dict[str, Any], results: Dict[str, StageResult], seconds: float):
+        self.values = values
+        self.results = results
+        self.seconds = seconds
+
+    def report(self) -> Dict[str, Any]:
+        """Return a summary suitable for logging or returning from an endpoint."""
+        return {
+            "seconds": self.seconds,
+            "stages": {
+                name: {"cached": result.cached, "seconds": result.seconds}
+                for name, result in self.results.items()
+            },
+        }
+
+
+class Pipeline:
+    """A DAG of Stages, run with bounded concurrency and per-stage memoization."""
+
+    name: str
+    stages: Dict[str, Stage]
+    max_concurrency: int
+    memo: LruCache
+
+    def __init__(
+        self,
+        name: str,
+        stages: Sequence[Stage],
+        max_concurrency: int = DEFAULT_PIPELINE_CONCURRENCY,
+        memo: Optional[LruCache] = None,
+    ):
+        self.name = name
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise SteamshipError(message=f"Pipeline {name} has two stages named {stage.name}.")
+            self.stages[stage.name] = stage
+        self.max_concurrency = max_concurrency
+        self.memo = memo or LruCache(
+            max_entries=DEFAULT_MEMO_MAX_ENTRIES, max_bytes=DEFAULT_MEMO_MAX_BYTES, ttl_seconds=None
+        )
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        visiting: Set[str] = set()
+        done: Set[str] = set()
+
+        def visit(name: str, path: List[str]):
+            if name in done or name not in self.stages:
+                return
+            if name in visiting:
+                raise SteamshipError(message=f"Pipeline {self.name} has a cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for input_name in self.stages[name].inputs:
+                visit(input_name, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for stage_name in self.stages:
+            visit(stage_name, [])
+
+    def external_inputs(self) -> Set[str]:
+        """The input names that no stage produces, which callers must supply."""
+        return {name for stage in self.stages.values() for name in stage.inputs if name not in self.stages}
+
+    def _required_stages(self, targets: Iterable[str]) -> Set[str]:
+        required: Set[str] = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name in required:
+                continue
+            if name not in self.stages:
+                raise SteamshipError(message=f"Pipeline {self.name} has no stage named {name}.")
+            required.add(name)
+            pending.extend(input_name for input_name in self.stages[name].inputs if input_name in self.stages)
+        return required
+
+    def _stage_key(self, stage: Stage, values: Dict[str, Any]) -> str:
+        input_hashes = {name: content_hash(values[name]) for name in stage.inputs}
+        return content_hash([self.name, stage.name, stage.version, input_hashes])
+
+    def _execute(self, stage: Stage, values: Dict[str, Any], context: AgentContext, force: bool) -> StageResult:
+        started = time.perf_counter()
+        key = self._stage_key(stage, values)
+        if stage.memoize and not force:
+            memoized = self.memo.get(key)
+            if memoized is not None:
+                return StageResult(stage.name, memoized[0], key, True, time.perf_counter() - started)
+
+        value = stage.fn({name: values[name] for name in stage.inputs}, context)
+        if stage.memoize:
+            # Stored in a tuple so that a stage legitimately returning None is still memoized.
+            self.memo.set(key, (value,), size=len(json.dumps(value, default=_hashable)))
+        return StageResult(stage.name, value, key, False, time.perf_counter() - started)
+
+    def run(
+        self,
+        inputs: Dict[str, Any],
+        context: AgentContext,
+        targets: Optional[Iterable[str]] = None,
+        force: Iterable[str] = (),
+    ) -> PipelineRun:
+        """Runs the stages needed for `targets` (default: every stage).
+
+        Stages whose inputs hash the same as a previous run are served from the memo; stages named in `force` are
+        recomputed regardless. A failing stage stops the run and is re-raised once in-flight stages finish.
+        """
+        started = time.perf_counter()
+        required = self._required_stages(targets if targets is not None else self.stages)
+        missing = {
+            name for stage_name in required for name in self.stages[stage_name].inputs
+            if name not in self.stages and name not in inputs
+        }
+        if missing:
+            raise SteamshipError(message=f"Pipeline {self.name} is missing inputs: {', '.join(sorted(missing))}")
+
+        force = set(force)
+        values: Dict[str, Any] = dict(inputs)
+        results: Dict[str, StageResult] = {}
+        running: Dict[Future, str] = {}
+        remaining = set(required)
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_concurrency)) as executor:
+            while remaining or running:
+                ready = [
+                    name for name in remaining
+                    if all(input_name in values for input_name in self.stages[name].inputs)
+                ]
+                for name in ready:
+                    remaining.discard(name)
+                    future = executor.submit(self._execute, self.stages[name], values, context, name in force)
+                    running[future] = name
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception:
+                        for pending in running:
+                            pending.cancel()
+                        raise
+                    results[name] = result
+                    values[name] = result.value
+
+        return PipelineRun(values, results, time.perf_counter() - started)
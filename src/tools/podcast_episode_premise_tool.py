@@ -1,4 +1,7 @@
-from typing import List, Union, Any
+import hashlib
+import logging
+import random
+from typing import Any, Dict, List, Optional, Tuple, Union
 from steamship import Steamship, Block, Task, SteamshipError
 from repl import ToolREPL
 import json
@@ -6,10 +9,36 @@ from pydantic import Field
 from steamship.agents.schema import AgentContext, Tool
 from steamship.agents.utils import get_llm, with_llm
 from steamship.agents.llms import OpenAI
+from data.podcast_feed import FeedFile
 from tools.podcast_premise_tool import PodcastPremiseTool
 from steamship.agents.tools.text_generation import JsonObjectGeneratorTool
+from tools.cacheable_tool import CacheableToolMixin
+from tools.cover_art_tool import CoverArtTool
+from tools.payload import attach_payload, loads, payload_of
+from tools.similarity_cache import DEFAULT_SIMILARITY_THRESHOLD, SimilarityCache, get_similarity_cache
+from tools.warm_pool import get_warm_pool
 
-class PodcastEpisodePremiseTool(JsonObjectGeneratorTool):
+SEASON_PROMPT = """INSTRUCTIONS:
+Generate {count} new JSON objects describing {table_description}, one object per line.
+Always return a non-empty value for every field in each object.
+Every object must be clearly different from the others and from the existing {table_description} listed below.
+After the last object, write the line: END OF SEASON
+
+FIELDS DESIRED:
+{fields_desired}
+
+EXAMPLE OBJECTS:
+{example_objects}
+
+EXISTING {table_description}:
+{existing_objects}
+
+NEW OBJECTS:
+{new_object_prefix}"""
+
+SEASON_STOP = "END OF SEASON"
+
+class PodcastEpisodePremiseTool(CacheableToolMixin, JsonObjectGeneratorTool):
 
     class Output(PodcastPremiseTool.Output):
         episode_name: str = Field()
@@ -24,6 +53,28 @@ class PodcastEpisodePremiseTool(JsonObjectGeneratorTool):
         "Output: The name and description of a podcast episode the user could create."
     )
 
+    agent_instance_base_url: str = ""
+    """Passed to the premise step, which creates a feed for each new podcast."""
+
+    cache_enabled: bool = False
+    """Each call should produce a fresh episode idea, so caching is opt-in. The premise step is always cached."""
+
+    duplicate_threshold: Optional[float] = DEFAULT_SIMILARITY_THRESHOLD
+    """Similarity above which a new episode idea counts as a near-duplicate of an earlier one for the same podcast."""
+
+    max_duplicate_retries: int = 1
+    """How many times to regenerate an idea that is a near-duplicate before accepting it anyway."""
+
+    season_context_episodes: int = 50
+    """How many of the podcast's most recent existing episodes a season prompt lists for the model to avoid."""
+
+    max_season_top_ups: int = 1
+    """Extra calls a season may make when de-duplication leaves it short of the requested number of episodes."""
+
+    warm_pool_size: int = 0
+    """When set, `run` serves episode ideas (with cover art) from a per-feed pool of this many, generated ahead of time
+    in the background. The pool is discarded when the podcast's premise changes."""
+
     plural_object_description: str = "podcast episodes"
     object_keys: List[str] = ["podcast_name", "episode_name", "episode_description"]
     example_rows: List[List[str]] = [
@@ -36,8 +87,16 @@ class PodcastEpisodePremiseTool(JsonObjectGeneratorTool):
       "A caller from Boston has a car that turns off when me makes a left-hand turn."],
     ]
 
-    def run(self, tool_input: List[Block], context: AgentContext) -> Union[List[Block], Task[Any]]:
-        premise_tool = PodcastPremiseTool()
+    def cache_config(self) -> Dict[str, Any]:
+        """The base URL only affects feed bookkeeping, not the generated episode."""
+        config = super().cache_config()
+        config.pop("agent_instance_base_url", None)
+        config.pop("warm_pool_size", None)
+        return config
+
+    def premise(self, context: AgentContext) -> PodcastPremiseTool.Output:
+        """Runs the premise step, returning the podcast that episodes will be generated for."""
+        premise_tool = PodcastPremiseTool(agent_instance_base_url=self.agent_instance_base_url)
         premise_blocks = premise_tool.run([
             Block(text="")  # An input, even blank, required to produce output.
         ], context)
@@ -45,31 +104,246 @@ class PodcastEpisodePremiseTool(JsonObjectGeneratorTool):
         if not len(premise_blocks):
             raise SteamshipError(message="Podcast Premise tool did not return a podcast premise.")
 
-        podcast_premise: PodcastPremiseTool.Output = premise_tool.parse_final_output(premise_blocks[0])
-                
+        return premise_tool.parse_final_output(premise_blocks[0])
+
+    def run(self, tool_input: List[Block], context: AgentContext) -> Union[List[Block], Task[Any]]:
+        podcast_premise = self.premise(context)
+        if self.warm_pool_size > 0:
+            return self.run_warm(podcast_premise, context)
+        return self.run_for_premise(podcast_premise, tool_input, context)
+
+    def run_warm(self, podcast_premise: PodcastPremiseTool.Output, context: AgentContext) -> List[Block]:
+        """Serves an episode idea and its cover art from the feed's warm pool, generating one now only if the pool is
+        empty, then tops the pool back up to `warm_pool_size` in the background.
+
+        Pools are per workspace and feed. Pooled ideas are checked against the podcast's earlier ideas when they are
+        generated, but only added to its index when served, so ideas waiting in a pool never block others. Background
+        fills never touch the request's AgentContext: each gets a fresh one, sharing only the LLM, on a client owned
+        by this run.
+        """
+        premise_version = hashlib.md5(
+            f"{podcast_premise.podcast_name}\n{podcast_premise.podcast_description}".encode()
+        ).hexdigest()
+        key = f"{self.cache_scope(context)}/{podcast_premise.feed_id()}"
+        client = self._owned_client(context)
+        llm = get_llm(context)
+
+        def fill() -> List[Block]:
+            fill_context = self._fill_context(client, llm)
+            return self.generation_copy().episode_with_cover_art(podcast_premise, fill_context, reserve=False)
+
+        warm_pool = get_warm_pool(f"{self.name}-episodes")
+        episode_index = self.episode_index(podcast_premise, context) if self.duplicate_threshold is not None else None
+        while True:
+            blocks = warm_pool.take(key, premise_version, fill, self.warm_pool_size)
+            if blocks is None:
+                break
+            if episode_index is None or episode_index.add_unless_similar([self._index_entry(blocks[0])]) is None:
+                return blocks
+            # A similar idea was served since this one was generated; try the next.
+
+        blocks = self.generation_copy().episode_with_cover_art(podcast_premise, context)
+        warm_pool.replenish(key, premise_version, fill, self.warm_pool_size)
+        return blocks
+
+    def generation_copy(self) -> "PodcastEpisodePremiseTool":
+        """A shallow copy of this tool that can generate concurrently with it. Generating rebinds the prefix fields and
+        shuffles the example rows in place, so the copy gets its own list of rows."""
+        return self.copy(update={"example_rows": list(self.example_rows)})
+
+    @staticmethod
+    def _owned_client(context: AgentContext) -> Steamship:
+        """A client for the request's workspace that outlives the request. Built from its config, without a fetch."""
+        return Steamship(config=context.client.config.copy(), trust_workspace_config=True)
+
+    @staticmethod
+    def _fill_context(client: Steamship, llm) -> AgentContext:
+        """A new AgentContext for background generation, carrying only the client and the LLM."""
+        context = AgentContext()
+        context.metadata = {}
+        context.emit_funcs = []
+        context = with_llm(llm=llm, context=context)
+        context.client = client
+        return context
+
+    def episode_with_cover_art(
+        self, podcast_premise: PodcastPremiseTool.Output, context: AgentContext, reserve: bool = True
+    ) -> List[Block]:
+        """Generates an episode idea followed by its cover art. A failure to make the art only drops the art.
+
+        See `run_for_premise` for `reserve`.
+        """
+        blocks = self.run_for_premise(podcast_premise, [], context, reserve=reserve)
+        episode = self.parse_final_output(blocks[0])
+        try:
+            blocks.extend(CoverArtTool().run([Block(text=f"{episode.podcast_name}: {episode.episode_name}")], context))
+        except Exception:
+            logging.exception(f"Unable to generate cover art for episode {episode.episode_name}.")
+        return blocks
+
+    def run_for_premise(
+        self,
+        podcast_premise: PodcastPremiseTool.Output,
+        tool_input: List[Block],
+        context: AgentContext,
+        reserve: bool = True,
+    ) -> List[Block]:
+        """Generates an episode for an already-chosen podcast premise.
+
+        Near-duplicates of the podcast's earlier ideas are regenerated. With `reserve` (the default) the accepted
+        idea is added to the podcast's index as it is checked; without it, it is only checked, and the caller indexes
+        it if and when it is used.
+
+        This sets the tool's prefix fields (and the generator shuffles its example rows), so concurrent callers
+        should each use their own copy of the tool.
+        """
         # Set the prefix fields
         self.new_row_prefix_fields = [podcast_premise.podcast_name]
-        
-        # Now run the prompt
-        blocks = super().run(tool_input, context)
-
-        # To make things easier we're going to fold in the output from the PodcastPremiseTool into 
-        # every output of this as well. This makes sure that this tool output stands on its own; we don't
-        # need some downstream tool to combine the output of multiple tools.
-        for block in blocks:
-            block_dict = json.loads(block.text)
-            block_dict.update(podcast_premise.dict())
-            block.text = json.dumps(block_dict)
-        
+
+        # Now run the prompt, regenerating ideas that are near-duplicates of this podcast's earlier episodes. When
+        # reserving, each idea is checked and indexed in one step, so concurrent copies of this tool can't both
+        # accept the same idea.
+        episode_index = None
+        if self.duplicate_threshold is not None:
+            episode_index = self.episode_index(podcast_premise, context)
+        for attempt in range(self.max_duplicate_retries + 1):
+            blocks = super().run(tool_input, context)
+            episodes = [self._episode_for_premise(loads(block.text), podcast_premise) for block in blocks]
+
+            # To make things easier we're going to fold in the output from the PodcastPremiseTool into
+            # every output of this as well. This makes sure that this tool output stands on its own; we don't
+            # need some downstream tool to combine the output of multiple tools.
+            blocks = [attach_payload(block, episode) for block, episode in zip(blocks, episodes)]
+            if episode_index is None:
+                break
+            entries = [self._index_entry(block) for block in blocks]
+            if not reserve:
+                if not any(episode_index.find_similar_output(text) for text, _, _ in entries):
+                    break
+            elif episode_index.add_unless_similar(entries) is None:
+                break
+            elif attempt == self.max_duplicate_retries:
+                # Out of retries: accept the near-duplicate, and index it like any other idea.
+                for entry in entries:
+                    episode_index.add(*entry)
+
         return blocks
 
+    def _index_entry(self, block: Block) -> Tuple[str, Block, str]:
+        """The (input text, block, output text) entry that indexes an episode block for near-duplicate detection."""
+        episode_text = self._episode_text(self.parse_final_output(block))
+        return episode_text, block, episode_text
+
+    def episode_index(self, podcast_premise: PodcastPremiseTool.Output, context: AgentContext) -> SimilarityCache:
+        """The podcast's index of earlier episode ideas, used to reject near-duplicates. Scoped to the workspace."""
+        return get_similarity_cache(
+            f"{self.cache_scope(context)}/{self.name}-episodes:{podcast_premise.feed_id()}",
+            threshold=self.duplicate_threshold or DEFAULT_SIMILARITY_THRESHOLD,
+        )
+
+    @staticmethod
+    def _episode_for_premise(row: Dict[str, Any], podcast_premise: PodcastPremiseTool.Output) -> "Output":
+        return PodcastEpisodePremiseTool.Output.parse_obj({**row, **podcast_premise.dict()})
+
+    def existing_episode_texts(self, podcast_premise: PodcastPremiseTool.Output, context: AgentContext) -> List[str]:
+        """The podcast's existing episodes (from its feed's episode index), newest first, as de-duplication text."""
+        feed_file = FeedFile.get(context.client, podcast_premise.feed_id()) if context.client else None
+        if feed_file is None:
+            return []
+        return [
+            f"{entry.title or ''} {entry.summary or ''}".strip()
+            for entry in feed_file.episode_index()
+        ]
+
+    def _season_prompt(
+        self, podcast_premise: PodcastPremiseTool.Output, count: int, existing: List[str]
+    ) -> Tuple[str, str]:
+        """Returns the season prompt and the partial first object it ends with, which the completion continues."""
+        example_rows = (
+            random.sample(self.example_rows, len(self.example_rows)) if self.shuffle_example_rows else self.example_rows
+        )
+        new_object_prefix = "{" + self.kv_clause(self.object_keys[0], podcast_premise.podcast_name) + ", "
+        prompt = SEASON_PROMPT.format(
+            count=count,
+            table_description=self.plural_object_description,
+            fields_desired=", ".join(self.object_keys),
+            example_objects="\n".join(self.object_json(self.object_keys, row) for row in example_rows),
+            existing_objects="\n".join(f"- {text}" for text in existing[: self.season_context_episodes]) or "(none)",
+            new_object_prefix=new_object_prefix,
+        )
+        return prompt, new_object_prefix
+
+    def _parse_season(
+        self, podcast_premise: PodcastPremiseTool.Output, new_object_prefix: str, completion: str
+    ) -> List[dict]:
+        """Parses every valid JSON object line of a season completion, which continues `new_object_prefix`;
+        malformed lines are dropped."""
+        rows = []
+        for line in (new_object_prefix + completion).splitlines():
+            line = line.strip().rstrip(",")
+            if not line.startswith("{"):
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(row, dict) or not all(row.get(key) for key in self.object_keys[1:]):
+                continue
+            row[self.object_keys[0]] = podcast_premise.podcast_name
+            rows.append(row)
+        return rows
+
+    def run_season(
+        self, count: int, context: AgentContext, podcast_premise: Optional[PodcastPremiseTool.Output] = None
+    ) -> List[Block]:
+        """Plans `count` new episodes for one podcast in a single completion.
+
+        The prompt lists the podcast's existing episodes to steer away from them, and the generated rows are then
+        de-duplicated against those episodes, this podcast's earlier ideas, and each other. If that leaves the season
+        short, up to `max_season_top_ups` further calls ask for the remainder. Each returned block has the same shape
+        as `run`'s output.
+        """
+        podcast_premise = podcast_premise or self.premise(context)
+        llm = get_llm(context)
+
+        existing = self.existing_episode_texts(podcast_premise, context)
+        episode_index = self.episode_index(podcast_premise, context)
+        for text in existing:
+            if not episode_index.find_similar_output(text):
+                episode_index.add(text, Block(text=text), output_text=text)
+
+        blocks: List[Block] = []
+        for _ in range(self.max_season_top_ups + 1):
+            remaining = count - len(blocks)
+            if remaining <= 0:
+                break
+            prompt, new_object_prefix = self._season_prompt(podcast_premise, remaining, existing)
+            completion = "".join(block.text for block in llm.complete(prompt, stop=SEASON_STOP))
+            for row in self._parse_season(podcast_premise, new_object_prefix, completion):
+                episode = self._episode_for_premise(row, podcast_premise)
+                episode_text = self._episode_text(episode)
+                block = attach_payload(Block(), episode)
+                if self.duplicate_threshold is None:
+                    episode_index.add(episode_text, block, output_text=episode_text)
+                elif episode_index.add_unless_similar([(episode_text, block, episode_text)]) is not None:
+                    continue
+                existing.insert(0, episode_text)
+                blocks.append(block)
+                if len(blocks) == count:
+                    break
+        return blocks
+
+    @staticmethod
+    def _episode_text(episode: "PodcastEpisodePremiseTool.Output") -> str:
+        """The text that identifies an episode idea for near-duplicate detection."""
+        return f"{episode.episode_name} {episode.episode_description}"
+
     def parse_final_output(self, block: Block) -> Output:
         """Parses the final output"""
-        print(block.text)
-        return PodcastEpisodePremiseTool.Output.parse_obj(json.loads(block.text))
+        return payload_of(block, PodcastEpisodePremiseTool.Output)
 
 if __name__ == "__main__":
     with Steamship.temporary_workspace() as client:
-        ToolREPL(PodcastEpisodePremiseTool()).run_with_client(
+        ToolREPL(PodcastEpisodePremiseTool(agent_instance_base_url="https://example.org")).run_with_client(
             client=client, context=with_llm(llm=OpenAI(client=client))
         )
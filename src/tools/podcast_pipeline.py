@@ -0,0 +1,80 @@
+"""The premise -> episode -> (script, cover art) chain, as a memoized Pipeline.
+
+    request ──> premise ──> episode ──┬──> script
+                                      └──> cover_art
+
+Script and cover art only depend on the episode, so they run concurrently. Stage values are the tools' typed
+outputs (and a Block for the art) handed directly between stages, with no serialization in between. Because every stage is
+memoized by its inputs, asking again for the same request and episode number reuses every stage, a new
+episode number re-runs only episode, script and cover art, and forcing `cover_art` regenerates just the art.
+Every stage also takes the workspace as an input, so one worker's memo never serves one workspace's results to
+another.
+"""
+from typing import Any, Dict, Iterable, Optional
+
+from steamship import Block, SteamshipError
+from steamship.agents.schema import AgentContext
+
+from tools.cover_art_tool import CoverArtTool
+from tools.pipeline import DEFAULT_PIPELINE_CONCURRENCY, Pipeline, PipelineRun, Stage
+from tools.podcast_episode_premise_tool import PodcastEpisodePremiseTool
+from tools.podcast_premise_tool import PodcastPremiseTool
+from tools.podcast_script_tool import PodcastTranscriptGeneratorTool
+
+
+class PodcastPipeline:
+    """Generates a podcast premise, an episode for it, and that episode's script and cover art.
+
+    Usage:
+
+        pipeline = PodcastPipeline(agent_instance_base_url="https://example.org/")
+        result = pipeline.run("a podcast about cars", context)
+        result.values["script"], result.values["cover_art"]
+        pipeline.run("a podcast about cars", context, episode_number=2)  # reuses the premise
+    """
+
+    agent_instance_base_url: str
+    pipeline: Pipeline
+
+    def __init__(self, agent_instance_base_url: str = "", max_concurrency: int = DEFAULT_PIPELINE_CONCURRENCY):
+        self.agent_instance_base_url = agent_instance_base_url
+        self.pipeline = Pipeline("podcast", [
+            Stage("premise", ["workspace", "request"], self._premise),
+            Stage("episode", ["workspace", "premise", "episode_number"], self._episode),
+            Stage("script", ["workspace", "episode"], self._script),
+            Stage("cover_art", ["workspace", "episode"], self._cover_art),
+        ], max_concurrency=max_concurrency)
+
+    def _premise(self, inputs: Dict[str, Any], context: AgentContext) -> PodcastPremiseTool.Output:
+        premise_tool = PodcastPremiseTool(agent_instance_base_url=self.agent_instance_base_url)
+        premise_blocks = premise_tool.run([Block(text=inputs["request"])], context)
+        if not premise_blocks:
+            raise SteamshipError(message="Podcast Premise tool did not return a podcast premise.")
+        return premise_tool.parse_final_output(premise_blocks[0])
+
+    def _episode(self, inputs: Dict[str, Any], context: AgentContext) -> PodcastEpisodePremiseTool.Output:
+        episode_tool = PodcastEpisodePremiseTool(agent_instance_base_url=self.agent_instance_base_url)
+        episode_blocks = episode_tool.run_for_premise(inputs["premise"], [], context)
+        return episode_tool.parse_final_output(episode_blocks[0])
+
+    def _script(self, inputs: Dict[str, Any], context: AgentContext) -> str:
+        transcript_tool = PodcastTranscriptGeneratorTool(agent_instance_base_url=self.agent_instance_base_url)
+        return transcript_tool.script_for(inputs["episode"], context).text
+
+    def _cover_art(self, inputs: Dict[str, Any], context: AgentContext) -> Optional[Block]:
+        episode = inputs["episode"]
+        art_blocks = CoverArtTool().run([Block(text=f"{episode.podcast_name}: {episode.episode_name}")], context)
+        return art_blocks[0] if art_blocks else None
+
+    def run(
+        self,
+        request: str,
+        context: AgentContext,
+        episode_number: int = 1,
+        targets: Optional[Iterable[str]] = None,
+        force: Iterable[str] = (),
+    ) -> PipelineRun:
+        """Runs the stages needed for `targets` (default: all). See `Pipeline.run`."""
+        premise_tool = PodcastPremiseTool(agent_instance_base_url=self.agent_instance_base_url)
+        inputs = {"workspace": premise_tool.cache_scope(context), "request": request, "episode_number": episode_number}
+        return self.pipeline.run(inputs, context, targets=targets, force=force)
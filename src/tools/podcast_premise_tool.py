@@ -1,6 +1,5 @@
 import hashlib
-import json
-from typing import List, Union, Any
+from typing import Dict, List, Optional, Union, Any
 from pydantic import BaseModel, Field
 from steamship import Block, Steamship, Task
 
@@ -10,18 +9,12 @@ from steamship.agents.schema import AgentContext, Tool
 from steamship.agents.utils import get_llm, with_llm
 from steamship.agents.llms import OpenAI
 from steamship.agents.tools.text_generation import JsonObjectGeneratorTool
-from steamship.utils.kv_store import KeyValueStore
 
-from tools.tool_cache import ToolCache
+from tools.cacheable_tool import CacheableToolMixin
+from tools.payload import attach_payload, payload_of
 
 
-class PodcastPremiseTool(JsonObjectGeneratorTool):
-    cache: ToolCache = Field(None, exclude=True)
-
-    class Config:
-        """Pydantic config."""
-        arbitrary_types_allowed = True
-        """Permit the ToolCache object."""
+class PodcastPremiseTool(CacheableToolMixin, JsonObjectGeneratorTool):
 
     class Output(BaseModel):
         podcast_name: str = Field()
@@ -32,22 +25,29 @@ class PodcastPremiseTool(JsonObjectGeneratorTool):
             feed_id = hashlib.md5(self.podcast_name.encode()).hexdigest()
             return feed_id
 
-        def get_or_create_feed_file(self, base_url: str, context: AgentContext) -> FeedFile:
-            """Gets or creates the persistent Podcast Feed File associated with this premise."""
-            feed_id = self.feed_id()
-            rss_feed = RssFeed(
+        def rss_feed(self) -> RssFeed:
+            """Return the metadata of the Podcast Feed associated with this premise."""
+            return RssFeed(
+                guid=self.feed_id(),
                 title=self.podcast_name,
                 summary=self.podcast_description,
                 author="The AI Podcaster: github.com/eob/ai-podcaster"
             )
-            feed_file = FeedFile.get_or_create(context.client, base_url, rss_feed)
-            return feed_file
+
+        def get_or_create_feed_file(self, base_url: str, context: AgentContext) -> FeedFile:
+            """Gets or creates the persistent Podcast Feed File associated with this premise."""
+            return FeedFile.get_or_create(context.client, base_url, self.rss_feed())
+
+        def ensure_feed_file_id(self, base_url: str, context: AgentContext) -> str:
+            """Creates the Podcast Feed File associated with this premise if it does not exist yet; returns its id.
+
+            An existing feed is found without loading its File.
+            """
+            return FeedFile.ensure_id(context.client, base_url, self.rss_feed())
 
         @staticmethod
         def from_block(block: Block) -> "Output":
-            podcast_premise = PodcastPremiseTool.Output.parse_obj(json.loads(block.text))
-            return podcast_premise
-            return podcast_premise
+            return payload_of(block, PodcastPremiseTool.Output)
 
     name: str = "PodcastPremiseTool"
     human_description: str = "Generates a premise for a podcast."
@@ -72,41 +72,47 @@ class PodcastPremiseTool(JsonObjectGeneratorTool):
     agent_instance_base_url: str
     """The base URL of the agent instance."""
 
+    cache_similarity_threshold: Optional[float] = None
+    """When set (e.g. to `similarity_cache.DEFAULT_SIMILARITY_THRESHOLD`), serve near-duplicate requests ("a podcast
+    about cars", "car podcast idea") from an existing premise. Off by default: a near-duplicate may deserve a premise
+    of its own."""
+
+    def cache_config(self) -> Dict[str, Any]:
+        """The base URL only affects feed bookkeeping, not the generated premise."""
+        config = super().cache_config()
+        config.pop("agent_instance_base_url", None)
+        return config
+
     def parse_final_output(self, block: Block) -> Output:
         """Parses the final output"""
-        return PodcastPremiseTool.Output.parse_obj(json.loads(block.text))
+        return payload_of(block, PodcastPremiseTool.Output)
 
+    def ensure_feeds(self, output: List[Block], context: AgentContext) -> List[str]:
+        """Creates the feed for each generated premise unless it exists, returning the feeds' File ids.
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.cache = ToolCache(self.name)
+        Existing feeds are resolved through the feed id directory, so the common case loads no File.
+        """
+        return [
+            self.parse_final_output(output_block).ensure_feed_file_id(self.agent_instance_base_url, context=context)
+            for output_block in output
+        ]
 
     def run(self, tool_input: List[Block], context: AgentContext) -> Union[List[Block], Task[Any]]:
-        """Run the tool, caching output."""
-        output = []
-
-        for block in tool_input:
-            cached_output = self.cache.get(block, context)
-            if cached_output:
-                output.append(cached_output)
-            else:
-                output_blocks = super().run([block], context)
-                if len(output_blocks):
-                    output_block = output_blocks[0]
-                    self.cache.set(block, output_block, context)
-                    output.append(output_block)
-
-        for output_block in output:
-            # Test Creating a Feed File
-            podcast_premise = PodcastPremiseTool.Output.from_block(output_block)
-            feed_file = podcast_premise.get_or_create_feed_file(self.agent_instance_base_url, context=context)
-            rss = feed_file.to_rss(self.agent_instance_base_url, [])
-            print(rss)
-
+        """Run the tool, caching output, and get or create the feed for each premise before returning.
+
+        The feed exists by the time the agent moves on, so episode tools can add to it right away; a failure to
+        create it fails the run. Each returned block carries its parsed premise, so downstream tools don't re-parse it.
+        """
+        output = [
+            attach_payload(block, self.parse_final_output(block), serialize=False)
+            for block in super().run(tool_input, context)
+        ]
+        self.ensure_feeds(output, context)
         return output
 
 if __name__ == "__main__":
-    """Note that the temporary workspace will mean that a DIFFERENT cache is used each time!
+    """Note that the temporary workspace will mean that a DIFFERENT cache is used each time, unless you run with
+    TOOL_CACHE_BACKEND=sqlite, which keeps the cache in a local file across runs.
     
     To see the cache in action, provide a second (or third) input that is identical to the tool within the REPL.
     """
@@ -1,17 +1,23 @@
-from typing import List, Union, Any
-import json
-from steamship import Steamship, Block, Task
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+import math
+import re
+import time
+from steamship import Steamship, Block, Task, SteamshipError
 from pydantic import Field
-from steamship.utils.kv_store import KeyValueStore
 
+from data.utils import DEFAULT_MAX_CONCURRENCY, run_bulk
 from repl import ToolREPL
 from steamship.agents.schema import AgentContext, Tool
 from steamship.agents.utils import get_llm, with_llm
 from steamship.agents.llms import OpenAI
 from tools.podcast_episode_premise_tool import PodcastEpisodePremiseTool
+from tools.podcast_premise_tool import PodcastPremiseTool
+from tools.payload import attach_payload
+from tools.streaming_llm import mark_streamed, stream_completion
 
 DEFAULT_PROMPT = """INSTRUCTIONS:
-Generate a transcript for a two minute long podcast episode. 
+Generate a transcript for a {minutes} minute long podcast episode. 
 Complete the transcript with the capitalized phrase: THE END.
 
 PODCAST TITLE:
@@ -28,8 +34,78 @@ EPISODE DESCRIPTION:
 
 EPISODE TRANSCRIPT:"""
 
-class PodcastTranscriptGeneratorTool(Tool):    
-    kv_store: KeyValueStore
+OUTLINE_PROMPT = """INSTRUCTIONS:
+Outline a {minutes} minute long podcast episode as exactly {count} numbered segments of about {segment_minutes} minutes each.
+Write one line per segment in the form: <number>. <segment title>: <what the segment covers>
+After the last segment, write the capitalized phrase: END OF OUTLINE.
+
+PODCAST TITLE:
+{podcast_title}
+
+PODCAST DESCRIPTION:
+{podcast_description}
+
+EPISODE TITLE:
+{episode_title}
+
+EPISODE DESCRIPTION:
+{episode_description}
+
+EPISODE OUTLINE:"""
+
+OUTLINE_STOP = "END OF OUTLINE"
+
+SEGMENT_PROMPT = """INSTRUCTIONS:
+Generate the transcript for segment {number} of {count} of a {minutes} minute long podcast episode.
+The segment should be about {segment_minutes} minutes long and cover only its part of the outline below.
+{position}
+Complete the segment with the capitalized phrase: END OF SEGMENT.
+
+PODCAST TITLE:
+{podcast_title}
+
+PODCAST DESCRIPTION:
+{podcast_description}
+
+EPISODE TITLE:
+{episode_title}
+
+EPISODE DESCRIPTION:
+{episode_description}
+
+EPISODE OUTLINE:
+{outline}
+
+SEGMENT {number}: {segment_title}
+{segment_summary}
+
+SEGMENT {number} TRANSCRIPT:"""
+
+SEGMENT_STOP = "END OF SEGMENT"
+
+DEFAULT_BATCH_CONCURRENCY = 4
+DEFAULT_STREAM_CHUNK_CHARS = 80
+DEFAULT_EPISODE_MINUTES = 2
+DEFAULT_SEGMENT_MINUTES = 2
+
+OUTLINE_LINE = re.compile(r"^\s*(\d+)[.)]\s*(.+?)\s*$")
+SEGMENT_ARTIFACTS = re.compile(r"^\s*(?:SEGMENT \d+(?: TRANSCRIPT)?:|THE END\.?|END OF SEGMENT\.?)\s*$")
+"""Lines a segment echoes from its prompt or stop phrases. Matched exactly, so dialogue mentioning a segment stays."""
+
+
+class OutlineSegment(NamedTuple):
+    number: int
+    title: str
+    summary: str
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class PodcastTranscriptGeneratorTool(Tool):
 
     class Output(PodcastEpisodePremiseTool.Output):
         script: str = Field(alias="Script")
@@ -43,6 +119,210 @@ class PodcastTranscriptGeneratorTool(Tool):
         "Output: The name and description of a podcast episode the user could create."
     )
 
+    agent_instance_base_url: str = ""
+    """Passed to the premise step, which creates a feed for each new podcast."""
+
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY
+    """How many episodes `run_batch` generates at once."""
+
+    stream: bool = False
+    """Have `run` emit the transcript through `context.emit_funcs` as it is generated, a few lines at a time."""
+
+    stream_chunk_chars: int = DEFAULT_STREAM_CHUNK_CHARS
+    """When streaming, the least text (in whole lines) to gather before emitting a partial transcript block."""
+
+    episode_minutes: int = DEFAULT_EPISODE_MINUTES
+    """Target episode length. Episodes longer than `segment_minutes` are outlined, then written segment by segment."""
+
+    segment_minutes: int = DEFAULT_SEGMENT_MINUTES
+    """Target length of each segment of an outlined episode."""
+
+    max_segment_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    """How many segments of an outlined episode are written at once."""
+
+    def episode_premise_tool(self) -> PodcastEpisodePremiseTool:
+        return PodcastEpisodePremiseTool(agent_instance_base_url=self.agent_instance_base_url)
+
+    def _generate(
+        self,
+        episode_premise_tool: PodcastEpisodePremiseTool,
+        podcast_premise: PodcastPremiseTool.Output,
+        context: AgentContext,
+        stream: bool = False,
+    ) -> Tuple[Block, Dict[str, float]]:
+        """Generates one episode premise and its transcript, returning the block and how long each step took."""
+        started = time.perf_counter()
+        episode_premise_blocks = episode_premise_tool.run_for_premise(podcast_premise, [], context)
+        episode_premise: PodcastEpisodePremiseTool.Output = episode_premise_tool.parse_final_output(episode_premise_blocks[0])
+        premise_done = time.perf_counter()
+
+        block = self.script_for(episode_premise, context, stream=stream)
+        script_done = time.perf_counter()
+
+        transcript = PodcastTranscriptGeneratorTool.Output(**episode_premise.dict(), Script=block.text)
+        return attach_payload(block, transcript), {
+            "episode_premise_seconds": premise_done - started,
+            "script_seconds": script_done - premise_done,
+            "seconds": script_done - started,
+        }
+
+    def script_for(
+        self, episode_premise: PodcastEpisodePremiseTool.Output, context: AgentContext, stream: bool = False
+    ) -> Block:
+        """Generates the transcript for an episode premise. The returned block's text is the script alone.
+
+        With `stream`, partial transcript blocks are emitted through `context.emit_funcs` as the LLM produces them,
+        and the returned block is marked (see `mark_streamed`) so it is not shown again.
+        """
+        if self.episode_minutes > self.segment_minutes:
+            return self.segmented_script_for(episode_premise, context, stream=stream)
+
+        llm = get_llm(context)
+
+        prompt = DEFAULT_PROMPT.format(
+            minutes=self.episode_minutes,
+            podcast_title=episode_premise.podcast_name,
+            podcast_description=episode_premise.podcast_description,
+            episode_title=episode_premise.episode_name,
+            episode_description=episode_premise.episode_description,
+        )
+
+        if not stream:
+            blocks = llm.complete(prompt, stop="THE END")
+            return blocks[0]
+
+        script = []
+        pending = ""
+        for chunk in stream_completion(llm, prompt, stop="THE END"):
+            script.append(chunk)
+            pending += chunk
+            line_end = pending.rfind("\n")
+            if line_end >= 0 and line_end + 1 >= self.stream_chunk_chars:
+                self._emit(pending[:line_end + 1], context)
+                pending = pending[line_end + 1:]
+        if pending.strip():
+            self._emit(pending, context)
+        return mark_streamed(Block(text="".join(script)))
+
+    def outline_for(self, episode_premise: PodcastEpisodePremiseTool.Output, context: AgentContext) -> List[OutlineSegment]:
+        """Generates the segment outline of an episode of `episode_minutes`.
+
+        An outline with fewer segments than the episode needs gets one more attempt, then raises rather than
+        producing a short episode; extra segments are dropped.
+        """
+        count = math.ceil(self.episode_minutes / self.segment_minutes)
+        prompt = OUTLINE_PROMPT.format(
+            minutes=self.episode_minutes,
+            count=count,
+            segment_minutes=self.segment_minutes,
+            podcast_title=episode_premise.podcast_name,
+            podcast_description=episode_premise.podcast_description,
+            episode_title=episode_premise.episode_name,
+            episode_description=episode_premise.episode_description,
+        )
+        llm = get_llm(context)
+        segments = []
+        for _ in range(2):
+            completion = "".join(block.text or "" for block in llm.complete(prompt, stop=OUTLINE_STOP))
+            segments = []
+            for line in completion.splitlines():
+                match = OUTLINE_LINE.match(line)
+                if not match:
+                    continue
+                title, _, summary = match.group(2).partition(":")
+                segments.append(OutlineSegment(len(segments) + 1, title.strip(), summary.strip()))
+            if len(segments) >= count:
+                return segments[:count]
+        raise SteamshipError(
+            message=f"The outline for episode {episode_premise.episode_name} has {len(segments)} of {count} segments."
+        )
+
+    def _segment_script(
+        self,
+        episode_premise: PodcastEpisodePremiseTool.Output,
+        outline: List[OutlineSegment],
+        segment: OutlineSegment,
+        context: AgentContext,
+    ) -> str:
+        count = len(outline)
+        if count == 1:
+            position = "This is the whole episode: open the show and sign off at the end."
+        elif segment.number == 1:
+            position = "This is the first segment: open the show, but do not sign off."
+        elif segment.number == count:
+            position = "This is the final segment: continue from the previous segment without re-introducing the show, then sign off."
+        else:
+            position = "This is a middle segment: continue from the previous segment without re-introducing the show or signing off."
+        prompt = SEGMENT_PROMPT.format(
+            number=segment.number,
+            count=count,
+            minutes=self.episode_minutes,
+            segment_minutes=self.segment_minutes,
+            position=position,
+            podcast_title=episode_premise.podcast_name,
+            podcast_description=episode_premise.podcast_description,
+            episode_title=episode_premise.episode_name,
+            episode_description=episode_premise.episode_description,
+            outline="\n".join(f"{item.number}. {item.title}: {item.summary}" for item in outline),
+            segment_title=segment.title,
+            segment_summary=segment.summary,
+        )
+        llm = get_llm(context)
+        # An empty segment would leave a hole in the episode, so it gets one more attempt.
+        for _ in range(2):
+            text = "".join(block.text or "" for block in llm.complete(prompt, stop=SEGMENT_STOP))
+            if text.strip():
+                return text
+        raise SteamshipError(message=f"Segment {segment.number} of {episode_premise.episode_name} came back empty.")
+
+    @staticmethod
+    def _stitch_segment(previous: List[str], text: str, segment: Optional[OutlineSegment] = None) -> List[str]:
+        """Continuity checks for one segment: drops echoed headers (including `segment`'s own "SEGMENT n: title"
+        header) and stop phrases, and lines that repeat the end of the previous segment (the model often restates
+        where it is picking up from)."""
+        header = f"SEGMENT {segment.number}: {segment.title}" if segment else None
+        lines = [
+            line.rstrip() for line in text.strip().splitlines()
+            if not SEGMENT_ARTIFACTS.match(line) and line.strip() != header
+        ]
+        tail = {line.strip() for line in previous[-3:] if line.strip()}
+        while lines and (not lines[0].strip() or lines[0].strip() in tail):
+            lines.pop(0)
+        return lines
+
+    def segmented_script_for(
+        self, episode_premise: PodcastEpisodePremiseTool.Output, context: AgentContext, stream: bool = False
+    ) -> Block:
+        """Outlines the episode, writes its segments concurrently, and stitches them in order.
+
+        Every segment prompt carries the full outline and the segment's position in it, so segments can be written
+        independently; wall-clock time is then roughly the outline plus the slowest segment. With `stream`, each
+        segment is emitted as soon as it and every segment before it are done.
+        """
+        outline = self.outline_for(episode_premise, context)
+        lines: List[str] = []
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_segment_concurrency, len(outline)))) as executor:
+            texts = executor.map(
+                lambda segment: self._segment_script(episode_premise, outline, segment, context), outline
+            )
+            for segment, text in zip(outline, texts):
+                segment_lines = self._stitch_segment(lines, text, segment)
+                if stream:
+                    self._emit("\n".join(segment_lines), context)
+                if lines and segment_lines:
+                    lines.append("")
+                lines.extend(segment_lines)
+        block = Block(text="\n".join(lines))
+        return mark_streamed(block) if stream else block
+
+    @staticmethod
+    def _emit(text: str, context: AgentContext):
+        if not text.strip():
+            return
+        blocks = [Block(text=text.strip())]
+        for func in context.emit_funcs:
+            func(blocks, context.metadata)
+
     def run(self, tool_input: List[Block], context: AgentContext) -> Union[List[Block], Task[Any]]:
         """Ignore tool input and generate a new single row of a table described by the tool's configuration.
 
@@ -58,37 +338,62 @@ class PodcastTranscriptGeneratorTool(Tool):
         output: List[Blocks]
             A single block containing a new row of the table described by the tool's configuration.
         """
+        episode_premise_tool = self.episode_premise_tool()
+        block, _ = self._generate(
+            episode_premise_tool, episode_premise_tool.premise(context), context, stream=self.stream
+        )
+        return [block]
 
-        episode_premise_tool = PodcastEpisodePremiseTool(self.kv_store)
-        episode_premise_blocks = episode_premise_tool.run([], context)
-        episode_premise: PodcastEpisodePremiseTool.Output = episode_premise_tool.parse_final_output(episode_premise_blocks[0])
+    def run_batch(
+        self, count: int, context: AgentContext, max_concurrency: Optional[int] = None
+    ) -> Tuple[List[Block], Dict[str, Any]]:
+        """Generates `count` episodes (premise and transcript) for one podcast.
 
-        llm = get_llm(context)
+        The podcast premise is generated once and shared; the per-episode premise and script calls then run
+        `max_concurrency` at a time. Returns the blocks of the episodes that succeeded, in order, and a report of
+        throughput, per-episode latency and failures.
+        """
+        started = time.perf_counter()
+        episode_premise_tool = self.episode_premise_tool()
+        podcast_premise = episode_premise_tool.premise(context)
+        premise_seconds = time.perf_counter() - started
 
-        prompt = DEFAULT_PROMPT.format(
-            podcast_title=episode_premise.podcast_name,
-            podcast_description=episode_premise.podcast_description,
-            episode_title=episode_premise.episode_name,
-            episode_description=episode_premise.episode_description,
+        results = run_bulk(
+            # Each episode gets its own copy: generating mutates the tool's prefix fields and example rows.
+            lambda _: self._generate(episode_premise_tool.generation_copy(), podcast_premise, context),
+            range(count),
+            max_concurrency or self.max_concurrency,
         )
+        wall_seconds = time.perf_counter() - started
 
-        blocks = llm.complete(prompt, stop="THE END")
-        block = blocks[0]
-
-        d = episode_premise.dict()
-        d["script"] = block.text
-        print(block.text)
-
-        block.text = json.dumps(d)
-        return [block]
-        
-    def __init__(self, kv_store: KeyValueStore):
-        self.kv_store = kv_store
+        succeeded = [result.result for result in results if result.ok]
+        timings = [timing for _, timing in succeeded]
+        latencies = sorted(timing["seconds"] for timing in timings)
+        report = {
+            "episodes": count,
+            "succeeded": len(succeeded),
+            "failed": [{"index": result.index, "error": str(result.error)} for result in results if not result.ok],
+            "podcast_premise_seconds": premise_seconds,
+            "wall_seconds": wall_seconds,
+            "episodes_per_minute": 60 * len(succeeded) / wall_seconds if wall_seconds else 0.0,
+            "latency_seconds": {
+                "avg": sum(latencies) / len(latencies) if latencies else 0.0,
+                "p50": _percentile(latencies, 0.5),
+                "p95": _percentile(latencies, 0.95),
+                "max": latencies[-1] if latencies else 0.0,
+            },
+            "avg_episode_premise_seconds": (
+                sum(timing["episode_premise_seconds"] for timing in timings) / len(timings) if timings else 0.0
+            ),
+            "avg_script_seconds": sum(timing["script_seconds"] for timing in timings) / len(timings) if timings else 0.0,
+        }
+        return [block for block, _ in succeeded], report
 
 
 if __name__ == "__main__":
     with Steamship.temporary_workspace() as client:
-        kv_store = KeyValueStore()
-        ToolREPL(PodcastTranscriptGeneratorTool(kv_store)).run_with_client(
-            client=client, context=with_llm(llm=OpenAI(client=client))
+        # OpenAI can't stream a completion, but an outlined episode is still shown segment by segment as it's written.
+        transcript_tool = PodcastTranscriptGeneratorTool(
+            agent_instance_base_url="https://example.org", stream=True, episode_minutes=3 * DEFAULT_SEGMENT_MINUTES
         )
+        ToolREPL(transcript_tool).run_with_client(client=client, context=with_llm(llm=OpenAI(client=client)))
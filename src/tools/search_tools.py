@@ -0,0 +1,24 @@
+"""Cached variants of the Steamship search tools used by the agent."""
+from typing import Optional
+
+from steamship.agents.tools.image_generation.google_image_search import GoogleImageSearchTool
+from steamship.agents.tools.search.search import SearchTool
+
+from tools.cacheable_tool import CacheableToolMixin
+
+
+class CachedSearchTool(CacheableToolMixin, SearchTool):
+    """SearchTool that caches web search answers per canonicalized query."""
+
+    cache_uses_llm = False
+
+    cache_ttl_seconds: Optional[float] = 24 * 60 * 60
+    """Search results go stale, so only reuse them for a day."""
+
+
+class CachedGoogleImageSearchTool(CacheableToolMixin, GoogleImageSearchTool):
+    """GoogleImageSearchTool that caches the retrieved image block per canonicalized query."""
+
+    cache_uses_llm = False
+
+    cache_ttl_seconds: Optional[float] = 7 * 24 * 60 * 60
@@ -0,0 +1,255 @@
+"""Near-duplicate lookup for generated content.
+
+Exact-match caching misses requests like "a podcast about cars" vs. "car podcast idea". A SimilarityCache keeps a
+small in-process vector index over prior inputs (and outputs), so a sufficiently similar request can be served from
+an existing result, and a freshly generated idea can be checked against earlier ones.
+
+Vectors come from feature-hashed word and character-trigram counts, which need no model or network call. The index
+is a brute-force cosine scan (vectorized with NumPy when it is installed); `VectorIndex` is the seam for swapping in
+an ANN structure once the number of entries makes a scan too slow.
+"""
+import hashlib
+import math
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from steamship import Block
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EMBEDDING_DIMENSIONS = 1024
+DEFAULT_SIMILARITY_THRESHOLD = 0.8
+DEFAULT_MAX_SIMILARITY_ENTRIES = 2000
+
+STOP_WORDS = {
+    "a", "an", "the", "about", "on", "of", "for", "to", "and", "or", "in", "with", "me", "my", "i", "we",
+    "give", "make", "create", "new", "idea", "ideas", "some", "please", "want", "like", "would", "could", "show",
+    "podcast", "podcasts", "episode", "episodes",
+}
+"""Filler and domain words that every request to these tools contains, so they carry no signal."""
+
+SparseVector = Dict[int, float]
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def _stem(word: str) -> str:
+    """Very light stemming so plurals match their singular."""
+    if len(word) > 3 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _bucket(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=4).digest(), "little") % EMBEDDING_DIMENSIONS
+
+
+def embed_text(text: str) -> SparseVector:
+    """Return an L2-normalized, feature-hashed bag of stemmed words and their character trigrams."""
+    words = [_stem(word) for word in _WORD_PATTERN.findall(text.casefold()) if word not in STOP_WORDS]
+    vector: SparseVector = {}
+    for word in words:
+        bucket = _bucket(f"w:{word}")
+        vector[bucket] = vector.get(bucket, 0.0) + 1.0
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            bucket = _bucket(f"c:{padded[i:i + 3]}")
+            vector[bucket] = vector.get(bucket, 0.0) + 0.5
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    if norm == 0:
+        return {}
+    return {bucket: weight / norm for bucket, weight in vector.items()}
+
+
+class VectorIndex(ABC):
+    """A cosine-similarity index over normalized vectors."""
+
+    @abstractmethod
+    def add(self, vector: SparseVector) -> int:
+        """Add a vector, returning its row id."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def search(self, vector: SparseVector, k: int = 1) -> List[Tuple[int, float]]:
+        """Return up to `k` (row id, cosine similarity) pairs, most similar first."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError()
+
+
+class BruteForceIndex(VectorIndex):
+    """Exact scan over every stored vector. Uses a dense NumPy matrix when available, sparse dot products otherwise."""
+
+    def __init__(self):
+        self._sparse: List[SparseVector] = []
+        self._matrix = None
+        self._rows = 0
+
+    def add(self, vector: SparseVector) -> int:
+        row = self._rows
+        if np is not None:
+            if self._matrix is None or self._rows == self._matrix.shape[0]:
+                capacity = max(64, self._rows * 2)
+                matrix = np.zeros((capacity, EMBEDDING_DIMENSIONS), dtype=np.float32)
+                if self._matrix is not None:
+                    matrix[: self._rows] = self._matrix[: self._rows]
+                self._matrix = matrix
+            for bucket, weight in vector.items():
+                self._matrix[row, bucket] = weight
+        else:
+            self._sparse.append(vector)
+        self._rows += 1
+        return row
+
+    def search(self, vector: SparseVector, k: int = 1) -> List[Tuple[int, float]]:
+        if self._rows == 0 or not vector:
+            return []
+        if np is not None:
+            query = np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32)
+            for bucket, weight in vector.items():
+                query[bucket] = weight
+            scores = self._matrix[: self._rows] @ query
+            top = np.argsort(-scores)[:k]
+            return [(int(row), float(scores[row])) for row in top]
+        scores = [
+            (row, sum(weight * stored.get(bucket, 0.0) for bucket, weight in vector.items()))
+            for row, stored in enumerate(self._sparse)
+        ]
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores[:k]
+
+    def __len__(self) -> int:
+        return self._rows
+
+
+class SimilarityCache:
+    """In-process near-duplicate index mapping prior inputs and outputs to their output Blocks.
+
+    Usage:
+
+        similarity_cache = SimilarityCache(threshold=0.8)
+        similarity_cache.add(input_text, output_block)
+        match = similarity_cache.find_similar_input("car podcast idea")  # -> Optional[(Block, score)]
+        dupe = similarity_cache.find_similar_output(candidate_text)
+        dupe = similarity_cache.add_unless_similar([(candidate_text, candidate_block, None)])  # check-and-add
+
+    When `max_entries` is reached the index is rebuilt from the most recent half of its entries.
+    """
+
+    threshold: float
+    max_entries: int
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_SIMILARITY_ENTRIES,
+        embed_fn: Callable[[str], SparseVector] = embed_text,
+        index_factory: Callable[[], VectorIndex] = BruteForceIndex,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embed_fn = embed_fn
+        self.index_factory = index_factory
+        self._lock = threading.Lock()
+        self._entries: List[Tuple[str, str, Block]] = []
+        self._input_index = index_factory()
+        self._output_index = index_factory()
+        self.hits = 0
+        self.misses = 0
+
+    def _rebuild(self):
+        """Keep the most recent half of the entries. Caller must hold the lock."""
+        self._entries = self._entries[-(self.max_entries // 2):]
+        self._input_index = self.index_factory()
+        self._output_index = self.index_factory()
+        for input_text, output_text, _ in self._entries:
+            self._input_index.add(self.embed_fn(input_text))
+            self._output_index.add(self.embed_fn(output_text))
+
+    def _embed_entry(self, input_text: str, output_block: Block, output_text: Optional[str]):
+        output_text = output_text if output_text is not None else (output_block.text or "")
+        return input_text, output_text, output_block, self.embed_fn(input_text), self.embed_fn(output_text)
+
+    def _append(self, input_text: str, output_text: str, output_block: Block, input_vector, output_vector):
+        """Caller must hold the lock."""
+        if len(self._entries) >= self.max_entries:
+            self._rebuild()
+        self._entries.append((input_text, output_text, output_block.copy()))
+        self._input_index.add(input_vector)
+        self._output_index.add(output_vector)
+
+    def add(self, input_text: str, output_block: Block, output_text: Optional[str] = None):
+        """Index an input and its output. `output_text` defaults to the output block's text."""
+        entry = self._embed_entry(input_text, output_block, output_text)
+        with self._lock:
+            self._append(*entry)
+
+    def add_unless_similar(
+        self, entries: Sequence[Tuple[str, Block, Optional[str]]]
+    ) -> Optional[Tuple[Block, float]]:
+        """Atomically indexes every (input text, output block, output text) entry, unless one of their outputs is
+        similar to an output already indexed. Returns that match, having added nothing, or None once all are added.
+
+        Callers de-duplicating concurrently against one cache should use this rather than `find_similar_output`
+        followed by `add`, which lets two near-identical outputs both pass the check.
+        """
+        embedded = [self._embed_entry(*entry) for entry in entries]
+        with self._lock:
+            for _, _, _, _, output_vector in embedded:
+                matches = self._output_index.search(output_vector, k=1)
+                if matches and matches[0][1] >= self.threshold:
+                    row, score = matches[0]
+                    return self._entries[row][2].copy(), score
+            for entry in embedded:
+                self._append(*entry)
+        return None
+
+    def _find(self, index_name: str, text: str) -> Optional[Tuple[Block, float]]:
+        vector = self.embed_fn(text)
+        with self._lock:
+            index = self._input_index if index_name == "input" else self._output_index
+            matches = index.search(vector, k=1)
+            if not matches or matches[0][1] < self.threshold:
+                return None
+            row, score = matches[0]
+            return self._entries[row][2].copy(), score
+
+    def find_similar_input(self, input_text: str) -> Optional[Tuple[Block, float]]:
+        """Return the output of the most similar prior input, if it clears the threshold."""
+        match = self._find("input", input_text)
+        with self._lock:
+            if match is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return match
+
+    def find_similar_output(self, output_text: str) -> Optional[Tuple[Block, float]]:
+        """Return the most similar prior output, if it clears the threshold. Used to detect near-duplicate ideas."""
+        return self._find("output", output_text)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_similarity_caches: Dict[str, SimilarityCache] = {}
+_similarity_caches_lock = threading.Lock()
+
+
+def get_similarity_cache(name: str, threshold: float = DEFAULT_SIMILARITY_THRESHOLD) -> SimilarityCache:
+    """Return the process-wide similarity cache with this name, creating it on first use."""
+    with _similarity_caches_lock:
+        similarity_cache = _similarity_caches.get(name)
+        if similarity_cache is None:
+            similarity_cache = SimilarityCache(threshold=threshold)
+            _similarity_caches[name] = similarity_cache
+        return similarity_cache
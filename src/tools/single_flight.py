@@ -0,0 +1,76 @@
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+
+class Flight:
+    """A single in-flight computation that any number of callers can wait on."""
+
+    result: Any
+    error: Optional[BaseException]
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """Block until the computation finishes, then return its result or re-raise its error."""
+        if not self._done.wait(timeout):
+            raise TimeoutError("Timed out waiting for an in-flight computation.")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """Coalesces concurrent computations of the same key into one.
+
+    Usage:
+
+        flight, is_leader = single_flight.begin(key)
+        if is_leader:
+            try:
+                result = compute()
+            except BaseException as e:
+                single_flight.finish(key, error=e)
+                raise
+            single_flight.finish(key, result=result)
+        else:
+            result = flight.wait()
+
+    """
+
+    coalesced: int
+
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def begin(self, key: str) -> Tuple[Flight, bool]:
+        """Join the in-flight computation for `key`, or start one. Returns the flight and whether we lead it."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self.coalesced += 1
+                return flight, False
+            flight = Flight()
+            self._flights[key] = flight
+            return flight, True
+
+    def finish(self, key: str, result: Any = None, error: Optional[BaseException] = None):
+        """Publish the leader's result (or error) to every waiter and retire the flight."""
+        with self._lock:
+            flight = self._flights.pop(key, None)
+        if flight is None:
+            return
+        flight.result = result
+        flight.error = error
+        flight._done.set()
+
+    def in_flight(self) -> int:
+        """Return the number of keys currently being computed."""
+        with self._lock:
+            return len(self._flights)
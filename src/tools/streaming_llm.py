@@ -0,0 +1,78 @@
+"""Incremental completions, for tools that want to show output while it is still being generated.
+
+An LLM streams if it has a `stream(prompt, stop)` method yielding text chunks. Steamship's OpenAI LLM does not, so
+`stream_completion` falls back to `complete` and yields the whole completion as a single chunk: callers can always
+stream, and get the latency benefit whenever the backing LLM supports it. With OpenAI, a "streamed" single-prompt
+transcript therefore arrives as one emission once the completion is done; an outlined episode (see
+`PodcastTranscriptGeneratorTool.segmented_script_for`) still arrives segment by segment.
+
+A tool that has already emitted its output while streaming marks the Block it returns with `mark_streamed`, so
+whatever displays tool output (see `repl.SteamshipREPL.print_blocks`) can skip it instead of showing it twice.
+
+FakeStreamingLLM replays fixed text in timed chunks, for exercising streaming tools locally:
+
+    context = with_llm(llm=FakeStreamingLLM(text="HOST: Welcome back!\\nGUEST: Thanks...\\nTHE END"))
+"""
+import time
+from typing import Iterator, List, Optional
+
+from steamship import Block, Tag
+from steamship.agents.schema import LLM
+
+STREAMED_TAG_KIND = "streamed"
+"""Tag kind marking a returned Block whose text was already emitted, in chunks, while it was generated."""
+
+
+def mark_streamed(block: Block) -> Block:
+    """Marks `block` as already emitted to the user, and returns it."""
+    block.tags = [*(block.tags or []), Tag(kind=STREAMED_TAG_KIND)]
+    return block
+
+
+def was_streamed(block: Block) -> bool:
+    """Whether `block`'s text was already emitted while it was generated, so displaying it again would repeat it."""
+    return any(tag.kind == STREAMED_TAG_KIND for tag in block.tags or [])
+
+
+def stream_completion(llm: LLM, prompt: str, stop: Optional[str] = None) -> Iterator[str]:
+    """Yields the completion of `prompt` in chunks as the LLM produces them, ending before `stop`."""
+    stream = getattr(llm, "stream", None)
+    if stream is None:
+        yield "".join(block.text or "" for block in llm.complete(prompt, stop=stop))
+        return
+
+    if not stop:
+        yield from stream(prompt, stop)
+        return
+
+    # The stop sequence may arrive split across chunks, so hold back enough text to recognize it.
+    pending = ""
+    for chunk in stream(prompt, stop):
+        pending += chunk
+        stop_at = pending.find(stop)
+        if stop_at >= 0:
+            if stop_at:
+                yield pending[:stop_at]
+            return
+        ready = len(pending) - (len(stop) - 1)
+        if ready > 0:
+            yield pending[:ready]
+            pending = pending[ready:]
+    if pending:
+        yield pending
+
+
+class FakeStreamingLLM(LLM):
+    """Replays `text` as a completion, `chunk_size` characters every `delay_seconds`, ignoring the prompt."""
+
+    text: str
+    chunk_size: int = 16
+    delay_seconds: float = 0.05
+
+    def stream(self, prompt: str, stop: Optional[str] = None) -> Iterator[str]:
+        for start in range(0, len(self.text), self.chunk_size):
+            time.sleep(self.delay_seconds)
+            yield self.text[start:start + self.chunk_size]
+
+    def complete(self, prompt: str, stop: Optional[str] = None) -> List[Block]:
+        return [Block(text="".join(stream_completion(self, prompt, stop)))]
@@ -1,63 +1,409 @@
-from typing import Optional, cast
+from typing import Callable, Dict, List, Optional, Tuple
 import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from steamship import Block
 from steamship.agents.schema import AgentContext
-from steamship.utils.kv_store import KeyValueStore
-from steamship.data.tags.tag_constants import TagValueKey
+
+from tools.cache_backends import CacheBackend, default_backend
+from tools.cache_metrics import CacheMetrics, get_cache_metrics
+from tools.cache_record import decode_block, encode_block, is_block_record
+from data.lru_cache import LruCache
+from tools.single_flight import SingleFlight
+
+DEFAULT_LOCAL_MAX_ENTRIES = 256
+DEFAULT_LOCAL_MAX_BYTES = 4 * 1024 * 1024
+DEFAULT_LOCAL_TTL_SECONDS = 600
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_ENTRIES = 1000
+CACHED_AT_KEY = "cached_at"
+ACCESSED_AT_KEY = "accessed_at"
+ACCESS_TOUCH_SECONDS = 24 * 60 * 60
+"""How stale a record's `accessed_at` may get before a backend hit rewrites it. Keeps hits from costing writes."""
+
+ACCESS_TOUCH_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tool-cache-touch")
+"""Writes refreshed `accessed_at` values off the read path. Best effort: `accessed_at` only orders `sweep` evictions,
+so a touch lost with its worker just makes that entry look a little older."""
+
+CACHE_KEY_VERSION = "2"
+"""Bump to invalidate every cache entry written with the previous key scheme."""
+
+_local_caches: Dict[str, LruCache] = {}
+_single_flights: Dict[str, SingleFlight] = {}
+_local_caches_lock = threading.Lock()
+
+
+def get_local_cache(
+    tool_name: str,
+    max_entries: int = DEFAULT_LOCAL_MAX_ENTRIES,
+    max_bytes: int = DEFAULT_LOCAL_MAX_BYTES,
+    ttl_seconds: Optional[float] = DEFAULT_LOCAL_TTL_SECONDS,
+) -> LruCache:
+    """Return the process-wide LRU cache for a tool, creating it on first use.
+
+    Tools construct a new ToolCache per instance (and some tools construct other tools per run), so the in-memory
+    layer lives at module level to survive across instances within the same worker.
+    """
+    with _local_caches_lock:
+        lru = _local_caches.get(tool_name)
+        if lru is None:
+            lru = LruCache(max_entries=max_entries, max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+            _local_caches[tool_name] = lru
+        return lru
+
+
+def get_single_flight(tool_name: str) -> SingleFlight:
+    """Return the process-wide single-flight group for a tool, creating it on first use."""
+    with _local_caches_lock:
+        single_flight = _single_flights.get(tool_name)
+        if single_flight is None:
+            single_flight = SingleFlight()
+            _single_flights[tool_name] = single_flight
+        return single_flight
+
+
+def canonicalize_text(text: str) -> str:
+    """Fold case and collapse whitespace so trivially different inputs share a key."""
+    return " ".join(text.casefold().split())
+
+
+def default_cache_key(block: Block) -> str:
+    """Return the canonical string identifying a block's content. URLs are case-sensitive, so only stripped."""
+    if block.text:
+        return canonicalize_text(block.text)
+    return (block.url or block.content_url or "").strip()
+
+
+def _block_size(block: Block) -> int:
+    """Cheap estimate of the in-memory footprint of a block."""
+    return 256 + len(block.text or "") + len(block.url or "") + len(block.content_url or "")
+
 
 class ToolCache:
     """A simple cache for Tools.
 
+    Lookups are served from an in-process LRU (bounded by entry count, bytes, and TTL) before falling back to a
+    persistent backend: the workspace's KeyValueStore by default, or a local SQLite file when `TOOL_CACHE_BACKEND`
+    is `sqlite` (see `tools.cache_backends`). Writes go to both layers. Concurrent misses on the same key within a worker are
+    coalesced by `get_or_compute` so only one caller pays for the computation.
+
+    Backend records carry `cached_at`/`accessed_at` timestamps; `sweep` deletes expired records and trims the
+    store to `max_entries` by least recent access.
+
+    Keys hash the canonicalized input together with a fingerprint of whatever else determines the output (prompt,
+    examples, LLM settings), so changing a tool's configuration never serves entries produced by the old one.
+
     Usage:
 
-        cache = ToolCache(self.name)
+        cache = ToolCache(self.name, fingerprint_fn=lambda context: "prompt-v2")
         cache.set(input_block, output_block, agent_context)
         block_or_none = cache.get(input_block, agent_context)
+        blocks_or_nones = cache.get_many(input_blocks, agent_context)
+        block_or_none = cache.get_or_compute(input_block, compute_fn, agent_context)
+        print(cache.stats())
+        cache.sweep(agent_context)
 
     """
     tool_name: str
-    kv_store: Optional[KeyValueStore] = None
+    backend: Optional[CacheBackend] = None
+    backend_factory: Callable[[str, AgentContext], CacheBackend]
+    local_cache: LruCache
+    single_flight: SingleFlight
+    metrics: CacheMetrics
 
-    def __init__(self, tool_name: str):
+    max_concurrency: int
+    ttl_seconds: Optional[float]
+    max_entries: Optional[int]
+    key_fn: Callable[[Block], str]
+    fingerprint_fn: Optional[Callable[[AgentContext], str]]
+
+    def __init__(
+        self,
+        tool_name: str,
+        local_cache: Optional[LruCache] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = DEFAULT_MAX_ENTRIES,
+        key_fn: Optional[Callable[[Block], str]] = None,
+        fingerprint_fn: Optional[Callable[[AgentContext], str]] = None,
+        backend_factory: Optional[Callable[[str, AgentContext], CacheBackend]] = None,
+    ):
         self.tool_name = tool_name
-        self.kv_store = None
+        self.max_concurrency = max_concurrency
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.key_fn = key_fn or default_cache_key
+        self.fingerprint_fn = fingerprint_fn
+        self.backend = None
+        self.backend_factory = backend_factory or default_backend
+        self.local_cache = local_cache or get_local_cache(tool_name)
+        self.single_flight = get_single_flight(tool_name)
+        self.metrics = get_cache_metrics(tool_name)
+
+    def _get_backend(self, context: AgentContext) -> CacheBackend:
+        """Return the persistent store backing this cache, lazily creating it on first use."""
+        if self.backend is None:
+            self.backend = self.backend_factory(f"ToolCache-{self.tool_name}", context)
+        return self.backend
 
-    def _get_kv_store(self, context: AgentContext):
-        """Return the Key Value store backing this cache, lazily creating it on first use."""
-        if self.kv_store is None:
-            self.kv_store = KeyValueStore(context.client, store_identifier=f"ToolCache-{self.tool_name}")
-        return self.kv_store
+    def _keys_for_blocks(self, input_blocks: List[Block], context: AgentContext) -> List[str]:
+        """Return the hash key for each provided block. The fingerprint is computed once per call."""
+        fingerprint = self.fingerprint_fn(context) if self.fingerprint_fn is not None else ""
+        prefix = f"v{CACHE_KEY_VERSION}\x00{fingerprint}\x00"
+        return [hashlib.md5((prefix + self.key_fn(block)).encode()).hexdigest() for block in input_blocks]
 
     def _key_for_block(self, input_block: Block, context: AgentContext) -> str:
         """Return the hash key for a provided block."""
-        string_to_hash = input_block.text or input_block.url or input_block.content_url or ""
-        input_hash = hashlib.md5(string_to_hash.encode())
-        input_hash_string = input_hash.hexdigest()
-        return input_hash_string
+        return self._keys_for_blocks([input_block], context)[0]
+
+    def scope(self, context: AgentContext) -> str:
+        """The backend's scope (e.g. workspace). Prefix any other in-process state derived from this cache with it."""
+        return self._get_backend(context).scope()
+
+    def _local_key(self, key: str, context: AgentContext) -> str:
+        """Scope a cache key to the backend (e.g. workspace) so one worker never leaks entries across workspaces."""
+        return f"{self.scope(context)}/{key}"
+
+    def _set_key(self, key: str, output_value: Block, context: AgentContext):
+        """Write an output under an already-computed key to both layers."""
+        backend = self._get_backend(context)
+
+        now = time.time()
+        record = encode_block(output_value)
+        record[CACHED_AT_KEY] = now
+        record[ACCESSED_AT_KEY] = now
+
+        backend.set(key, record)
+        self.local_cache.set(
+            self._local_key(key, context),
+            output_value.copy(),
+            size=_block_size(output_value),
+            ttl_seconds=self.ttl_seconds,
+        )
 
     def set(self, input_block: Block, output_value: Block, context: AgentContext):
         """Cache the output for the provided input."""
-        kv_store = self._get_kv_store(context)
-        input_hash_string = self._key_for_block(input_block, context)
+        self._set_key(self._key_for_block(input_block, context), output_value, context)
 
-        block_dict = output_value.dict()
-        wrapped_dict = {TagValueKey.VALUE: block_dict}
+    def get(self, input_block: Block, context: AgentContext) -> Optional[Block]:
+        """Return the cached output for the provided input, or None."""
+        return self.get_many([input_block], context)[0]
 
-        kv_store.set(input_hash_string, wrapped_dict)
+    def _decode(
+        self, key: str, val: Optional[dict], local_key: str, context: AgentContext, touches: List[Tuple[str, dict]]
+    ) -> Optional[Block]:
+        """Turn a raw backend value into a Block, populating the local layer.
 
-    def get(self, input_block: Block, context: AgentContext) -> Optional[Block]:
-        """Cache the output for the provided input."""
-        kv_store = self._get_kv_store(context)
-        input_hash_string = self._key_for_block(input_block, context)
-        val = kv_store.get(input_hash_string)
-        if not val:
-            return None
-        if TagValueKey.VALUE not in val:
+        Records whose `accessed_at` is stale are appended to `touches` for `_touch` to rewrite.
+        """
+        if not is_block_record(val) or self._is_expired(val):
             return None
 
-        block_dict = val.get(TagValueKey.VALUE)
-        block = cast(Block, Block.parse_obj(block_dict))
+        now = time.time()
+        if now - val.get(ACCESSED_AT_KEY, val.get(CACHED_AT_KEY, 0)) > ACCESS_TOUCH_SECONDS:
+            touches.append((key, {**val, ACCESSED_AT_KEY: now}))
+
+        block = decode_block(val)
         block.client = context.client
+        self.local_cache.set(local_key, block.copy(), size=_block_size(block), ttl_seconds=self.ttl_seconds)
         return block
 
+    def _touch(self, touches: List[Tuple[str, dict]], context: AgentContext):
+        """Rewrite the touched records' `accessed_at` in the background, so a hit never waits on a backend write."""
+        if not touches:
+            return
+        backend = self._get_backend(context)
+
+        def write():
+            for key, record in touches:
+                try:
+                    backend.set(key, record)
+                except Exception:
+                    logging.exception(f"Unable to refresh the access time of a {self.tool_name} cache entry.")
+
+        ACCESS_TOUCH_EXECUTOR.submit(write)
+
+    def _is_expired(self, val: dict) -> bool:
+        """Whether a backend record is older than this cache's TTL. Records written before timestamps never expire."""
+        cached_at = val.get(CACHED_AT_KEY)
+        if self.ttl_seconds is None or cached_at is None:
+            return False
+        return time.time() - cached_at > self.ttl_seconds
+
+    def _fan_out(self, fn, items: list) -> list:
+        """Apply `fn` to each item concurrently, preserving order."""
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(items))) as executor:
+            return list(executor.map(fn, items))
+
+    def get_many(self, input_blocks: List[Block], context: AgentContext) -> List[Optional[Block]]:
+        """Return the cached output for each input (None where missing), aligned with `input_blocks`.
+
+        Local hits are served from memory; the remaining keys are resolved with a single backend call.
+        """
+        return self._get_many_keys(self._keys_for_blocks(input_blocks, context), context)
+
+    def _get_many_keys(self, keys: List[str], context: AgentContext) -> List[Optional[Block]]:
+        started = time.perf_counter()
+        local_keys = [self._local_key(key, context) for key in keys]
+        results: List[Optional[Block]] = [None] * len(keys)
+
+        missing: Dict[str, List[int]] = {}
+        for i, local_key in enumerate(local_keys):
+            local_block = self.local_cache.get(local_key)
+            if local_block is not None:
+                block = local_block.copy()
+                block.client = context.client
+                results[i] = block
+            else:
+                missing.setdefault(keys[i], []).append(i)
+        local_hits = len(keys) - sum(len(indices) for indices in missing.values())
+
+        backend_hits = 0
+        if missing:
+            missing_keys = list(missing.keys())
+            found = self._get_backend(context).get_many(missing_keys)
+            values = [found.get(key) for key in missing_keys]
+
+            touches: List[Tuple[str, dict]] = []
+            for key, val in zip(missing_keys, values):
+                indices = missing[key]
+                block = self._decode(key, val, local_keys[indices[0]], context, touches)
+                if block is None:
+                    continue
+                backend_hits += len(indices)
+                for i in indices:
+                    results[i] = block.copy()
+            self._touch(touches, context)
+
+        self.metrics.record_hits(
+            local=local_hits, backend=backend_hits, misses=len(keys) - local_hits - backend_hits
+        )
+        self.metrics.record_lookup(time.perf_counter() - started)
+        return results
+
+    def set_many(self, pairs: List[Tuple[Block, Block]], context: AgentContext):
+        """Cache many (input, output) pairs, writing to the backend concurrently."""
+        keys = self._keys_for_blocks([input_block for input_block, _ in pairs], context)
+        self._set_many_keys(list(zip(keys, [output_value for _, output_value in pairs])), context)
+
+    def _set_many_keys(self, pairs: List[Tuple[str, Block]], context: AgentContext):
+        if not pairs:
+            return
+        # The first write may create the backing file; do it alone so concurrent writers don't each create one.
+        self._set_key(pairs[0][0], pairs[0][1], context)
+        self._fan_out(lambda pair: self._set_key(pair[0], pair[1], context), pairs[1:])
+
+    def get_or_compute(
+        self, input_block: Block, compute: Callable[[Block], Optional[Block]], context: AgentContext
+    ) -> Optional[Block]:
+        """Return the cached output for the input, computing and caching it on a miss.
+
+        If another caller in this worker is already computing the same key, wait for its result instead.
+        """
+        return self.get_or_compute_many([input_block], compute, context)[0]
+
+    def get_or_compute_many(
+        self, input_blocks: List[Block], compute: Callable[[Block], Optional[Block]], context: AgentContext
+    ) -> List[Optional[Block]]:
+        """Batched `get_or_compute`: one lookup, one computation per distinct missing key, one batched write.
+
+        Keys this call leads are computed concurrently (up to `max_concurrency`), and all of them before it waits on
+        keys led by other callers, so two overlapping batches can never wait on each other.
+        """
+        keys = self._keys_for_blocks(input_blocks, context)
+        results = self._get_many_keys(keys, context)
+
+        led: Dict[str, List[int]] = {}
+        joined: Dict[str, Tuple[object, List[int]]] = {}
+        for i, key in enumerate(keys):
+            if results[i] is not None:
+                continue
+            local_key = self._local_key(key, context)
+            if local_key in led:
+                led[local_key].append(i)
+            elif local_key in joined:
+                joined[local_key][1].append(i)
+            else:
+                flight, is_leader = self.single_flight.begin(local_key)
+                if is_leader:
+                    led[local_key] = [i]
+                else:
+                    joined[local_key] = (flight, [i])
+
+        def lead(local_key: str) -> Optional[Block]:
+            # A flight that finished between our lookup and `begin` may already have filled the local layer. The
+            # lookup above already counted this miss, so peek rather than count another.
+            output_block = self.local_cache.peek(local_key)
+            if output_block is None:
+                started = time.perf_counter()
+                output_block = compute(input_blocks[led[local_key][0]])
+                self.metrics.record_compute(time.perf_counter() - started)
+            return output_block
+
+        computed: Dict[str, Optional[Block]] = {}
+        try:
+            computed = dict(zip(led, self._fan_out(lead, list(led))))
+            self._set_many_keys(
+                [(keys[led[local_key][0]], block) for local_key, block in computed.items() if block is not None],
+                context,
+            )
+        except BaseException as error:
+            for local_key in led:
+                self.single_flight.finish(local_key, error=error)
+            raise
+
+        for local_key, indices in led.items():
+            output_block = computed[local_key]
+            self.single_flight.finish(local_key, result=output_block)
+            for i in indices:
+                results[i] = output_block.copy() if output_block is not None else None
+
+        for flight, indices in joined.values():
+            output_block = flight.wait()
+            for i in indices:
+                if output_block is not None:
+                    results[i] = output_block.copy()
+                    results[i].client = context.client
+
+        return results
+
+    def invalidate(self, input_block: Block, context: AgentContext):
+        """Remove the cached output for the provided input from both layers."""
+        input_hash_string = self._key_for_block(input_block, context)
+        self.local_cache.delete(self._local_key(input_hash_string, context))
+        self._get_backend(context).delete(input_hash_string)
+
+    def sweep(self, context: AgentContext) -> Dict[str, int]:
+        """Delete expired entries, then the least recently accessed ones beyond `max_entries`, in bulk.
+
+        Entries written before timestamps were recorded count as least recently accessed.
+        """
+        backend = self._get_backend(context)
+        items = backend.items()
+
+        expired = [key for key, val in items if self._is_expired(val)]
+        live = [(key, val) for key, val in items if not self._is_expired(val)]
+
+        evicted = []
+        if self.max_entries is not None and len(live) > self.max_entries:
+            live.sort(key=lambda item: item[1].get(ACCESSED_AT_KEY, item[1].get(CACHED_AT_KEY, 0)), reverse=True)
+            evicted = [key for key, _ in live[self.max_entries:]]
+            live = live[: self.max_entries]
+
+        to_delete = expired + evicted
+        backend.delete_many(to_delete)
+        for key in to_delete:
+            self.local_cache.delete(self._local_key(key, context))
+
+        return {"scanned": len(items), "expired": len(expired), "evicted": len(evicted), "remaining": len(live)}
 
+    def stats(self) -> Dict[str, float]:
+        """Return the local layer's occupancy and eviction counters plus this tool's hit/miss/latency report."""
+        stats = {f"local_{name}": value for name, value in self.local_cache.stats().items()}
+        stats.update(self.metrics.report())
+        stats["coalesced"] = self.single_flight.coalesced
+        return stats
@@ -0,0 +1,126 @@
+"""Pools of pre-generated tool outputs, refilled in the background.
+
+A WarmPool keeps up to `size` ready items per key (e.g. per feed), each made by a caller-supplied `fill` function on a
+background executor. `take` hands out a ready item, if there is one, and tops the key's pool back up off the request
+path. On a miss the caller generates its own item and then calls `replenish`, so a cold pool doesn't start `size`
+background fills competing with the one the request is waiting for. Every key's pool is tied to a version (e.g. a
+hash of the feed's premise): taking with a different version discards the stale items, including any still being
+generated.
+"""
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+WARM_POOL_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="warm-pool")
+DEFAULT_WARM_POOL_SIZE = 3
+
+
+class _KeyPool:
+    version: str
+    items: Deque[Any]
+    filling: int
+
+    def __init__(self, version: str):
+        self.version = version
+        self.items = deque()
+        self.filling = 0
+
+
+class WarmPool:
+    """Ready-to-serve items per key, replenished on `executor`. Thread-safe."""
+
+    name: str
+    executor: ThreadPoolExecutor
+
+    def __init__(self, name: str, executor: ThreadPoolExecutor = WARM_POOL_EXECUTOR):
+        self.name = name
+        self.executor = executor
+        self._pools: Dict[str, _KeyPool] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+    def _pool(self, key: str, version: str) -> _KeyPool:
+        """The key's pool, replaced by an empty one if it was built for another version. Call with the lock held."""
+        pool = self._pools.get(key)
+        if pool is None or pool.version != version:
+            pool = _KeyPool(version)
+            self._pools[key] = pool
+        return pool
+
+    def take(self, key: str, version: str, fill: Callable[[], Any], size: int = DEFAULT_WARM_POOL_SIZE) -> Optional[Any]:
+        """Returns a ready item for `key` at `version` and starts refilling the pool to `size` in the background.
+
+        Returns None if the pool is empty, without starting any fills: the caller generates its own item, then calls
+        `replenish` once it has.
+        """
+        with self._lock:
+            pool = self._pool(key, version)
+            item = pool.items.popleft() if pool.items else None
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self.replenish(key, version, fill, size)
+        return item
+
+    def replenish(self, key: str, version: str, fill: Callable[[], Any], size: int = DEFAULT_WARM_POOL_SIZE):
+        """Starts background fills until the key's ready and in-flight items reach `size`."""
+        with self._lock:
+            pool = self._pool(key, version)
+            needed = size - len(pool.items) - pool.filling
+            pool.filling += max(0, needed)
+        for _ in range(needed):
+            self.executor.submit(self._fill, key, pool, fill)
+
+    def _fill(self, key: str, pool: _KeyPool, fill: Callable[[], Any]):
+        try:
+            item = fill()
+        except Exception:
+            logging.exception(f"Unable to pre-generate an item for warm pool {self.name} ({key}).")
+            item = None
+        with self._lock:
+            pool.filling -= 1
+            if item is None:
+                self.failures += 1
+            elif self._pools.get(key) is pool:
+                # Items finished after the pool was invalidated or re-versioned are dropped.
+                pool.items.append(item)
+
+    def invalidate(self, key: str):
+        """Discards the key's ready items; fills already running for it are discarded when they finish."""
+        with self._lock:
+            self._pools.pop(key, None)
+
+    def ready(self, key: str) -> int:
+        with self._lock:
+            pool = self._pools.get(key)
+            return len(pool.items) if pool else 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "keys": len(self._pools),
+                "ready": sum(len(pool.items) for pool in self._pools.values()),
+                "filling": sum(pool.filling for pool in self._pools.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "failures": self.failures,
+            }
+
+
+_warm_pools: Dict[str, WarmPool] = {}
+_warm_pools_lock = threading.Lock()
+
+
+def get_warm_pool(name: str) -> WarmPool:
+    """Return the process-wide warm pool with this name, creating it on first use."""
+    with _warm_pools_lock:
+        warm_pool = _warm_pools.get(name)
+        if warm_pool is None:
+            warm_pool = WarmPool(name)
+            _warm_pools[name] = warm_pool
+        return warm_pool
@@ -0,0 +1,31 @@
+import os
+import sys
+from types import SimpleNamespace
+from typing import Optional
+
+import pytest
+from steamship.agents.schema import AgentContext, LLM
+from steamship.agents.utils import with_llm
+
+# The package's modules import each other from `src` (e.g. `from tools.tool_cache import ToolCache`).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+@pytest.fixture
+def agent_context():
+    """Return a factory for AgentContexts using the given LLM and, optionally, a stand-in client for a workspace.
+
+    AgentContext's `metadata` and `emit_funcs` defaults are shared by every instance, so each context gets its own.
+    """
+
+    def make(llm: Optional[LLM] = None, workspace_id: Optional[str] = None) -> AgentContext:
+        context = AgentContext()
+        context.metadata = {}
+        context.emit_funcs = []
+        if llm is not None:
+            context = with_llm(llm=llm, context=context)
+        if workspace_id is not None:
+            context.client = SimpleNamespace(config=SimpleNamespace(workspace_id=workspace_id, workspace_handle=None))
+        return context
+
+    return make
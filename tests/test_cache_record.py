@@ -0,0 +1,24 @@
+from steamship import Block, Tag
+
+from tools.cache_record import BLOCK_KEY, COMPRESSED_BLOCK_KEY, decode_block, encode_block, is_block_record
+
+
+def test_small_blocks_are_stored_compactly():
+    block = Block(id="block-1", text="Car Talk", mime_type="text/plain", tags=[Tag(kind="k", name="n")])
+    record = encode_block(block)
+    assert record[BLOCK_KEY] == {"id": "block-1", "text": "Car Talk", "mime_type": "text/plain"}
+
+    decoded = decode_block(record)
+    assert (decoded.id, decoded.text, decoded.mime_type, decoded.tags) == ("block-1", "Car Talk", "text/plain", [])
+
+
+def test_large_blocks_are_compressed():
+    transcript = "HOST: Welcome back to the show.\nGUEST: Thanks for having me.\n" * 100
+    record = encode_block(Block(text=transcript))
+    assert COMPRESSED_BLOCK_KEY in record and BLOCK_KEY not in record
+    assert len(record[COMPRESSED_BLOCK_KEY]) < len(transcript) / 4
+    assert decode_block(record).text == transcript
+
+
+def test_records_without_a_block_are_not_decoded():
+    assert not is_block_record({}) and decode_block({}) is None
@@ -0,0 +1,72 @@
+from typing import List, Optional
+
+from steamship import Block
+from steamship.agents.schema import LLM
+
+from tools.cover_art_tool import CoverArtTool
+from tools.podcast_episode_premise_tool import PodcastEpisodePremiseTool
+from tools.podcast_premise_tool import PodcastPremiseTool
+from tools.search_tools import CachedGoogleImageSearchTool, CachedSearchTool
+from tools.similarity_cache import DEFAULT_SIMILARITY_THRESHOLD
+
+
+class FakeLLM(LLM):
+    def complete(self, prompt: str, stop: Optional[str] = None) -> List[Block]:
+        return []
+
+
+class OtherLLM(FakeLLM):
+    pass
+
+
+def test_cache_keys_are_canonical():
+    tool = CachedSearchTool()
+    assert tool.cache_key(Block(text="  What is   a CAR? ")) == tool.cache_key(Block(text="what is a car?"))
+    assert tool.cache_key(Block(url=" https://example.org/A ")) == "https://example.org/A"
+
+
+def test_fingerprint_follows_the_configuration_and_the_llm(agent_context):
+    context = agent_context(FakeLLM())
+    tool = PodcastPremiseTool(agent_instance_base_url="https://example.org/a")
+    fingerprint = tool.cache_fingerprint(context)
+
+    reordered = PodcastPremiseTool(
+        agent_instance_base_url="https://example.org/b", example_rows=list(reversed(tool.example_rows))
+    )
+    assert reordered.cache_fingerprint(context) == fingerprint
+
+    edited = PodcastPremiseTool(agent_instance_base_url="https://example.org/a", example_rows=tool.example_rows[1:])
+    assert edited.cache_fingerprint(context) != fingerprint
+    assert tool.cache_fingerprint(agent_context(OtherLLM())) != fingerprint
+
+
+def test_llm_settings_only_key_tools_that_use_the_llm(agent_context):
+    first, second = agent_context(FakeLLM()), agent_context(OtherLLM())
+    for tool in (CachedSearchTool(), CachedGoogleImageSearchTool(), CoverArtTool()):
+        assert tool.cache_fingerprint(first) == tool.cache_fingerprint(second)
+
+    premise_tool = PodcastPremiseTool(agent_instance_base_url="")
+    assert premise_tool.cache_fingerprint(first) != premise_tool.cache_fingerprint(second)
+
+
+def test_cache_uses_llm_is_not_part_of_the_configuration():
+    assert "cache_uses_llm" not in CoverArtTool().cache_config()
+
+
+def test_similarity_indexes_are_scoped_to_the_workspace(monkeypatch, agent_context):
+    # Tool instances (and so their ToolCache backends) belong to one workspace; the indexes are process-wide.
+    monkeypatch.delenv("TOOL_CACHE_BACKEND", raising=False)
+    first = agent_context(FakeLLM(), workspace_id="workspace-a")
+    second = agent_context(FakeLLM(), workspace_id="workspace-b")
+
+    def premise_tool():
+        return PodcastPremiseTool(agent_instance_base_url="", cache_similarity_threshold=DEFAULT_SIMILARITY_THRESHOLD)
+
+    premise_tool().similarity_cache(first).add("a podcast about cars", Block(text="Car Talk"))
+    assert premise_tool().similarity_cache(first).find_similar_input("a podcast about cars")
+    assert not premise_tool().similarity_cache(second).find_similar_input("a podcast about cars")
+    assert PodcastPremiseTool(agent_instance_base_url="").similarity_cache(first) is None  # Opt-in.
+
+    podcast_premise = PodcastPremiseTool.Output(podcast_name="Car Talk", podcast_description="Cars.")
+    assert PodcastEpisodePremiseTool().episode_index(podcast_premise, first) is not PodcastEpisodePremiseTool(
+    ).episode_index(podcast_premise, second)
@@ -0,0 +1,67 @@
+import uuid
+from types import SimpleNamespace
+
+from steamship import Tag
+
+from data.podcast_feed import FeedFile, RssFeed
+
+
+def _client(workspace_id: str):
+    return SimpleNamespace(config=SimpleNamespace(workspace_id=workspace_id, workspace_handle=None))
+
+
+def test_resolve_id_queries_each_guid_once_per_workspace(monkeypatch):
+    queries = []
+
+    def query(client, tag_filter_query):
+        queries.append((client.config.workspace_id, tag_filter_query))
+        if "unknown" in tag_filter_query:
+            return SimpleNamespace(tags=[])
+        return SimpleNamespace(tags=[Tag(file_id=f"{client.config.workspace_id}-feed", kind=FeedFile.TAG_GUID_KIND)])
+
+    monkeypatch.setattr(Tag, "query", staticmethod(query))
+    first, second = _client(f"workspace-{uuid.uuid4().hex}"), _client(f"workspace-{uuid.uuid4().hex}")
+
+    assert FeedFile.resolve_id(first, "cars") == f"{first.config.workspace_id}-feed"
+    assert FeedFile.resolve_id(first, "cars") == f"{first.config.workspace_id}-feed"
+    assert FeedFile.resolve_id(second, "cars") == f"{second.config.workspace_id}-feed"
+    assert len(queries) == 2
+
+    # Unknown feeds are not cached, so a feed created by another worker is found on the next lookup.
+    assert FeedFile.resolve_id(first, "unknown") is None
+    assert FeedFile.resolve_id(first, "unknown") is None
+    assert len(queries) == 4
+
+    FeedFile.invalidate(first, "cars")
+    FeedFile.resolve_id(first, "cars")
+    assert len(queries) == 5
+
+
+def test_ensure_id_resolves_existing_feeds_without_loading_a_file(monkeypatch):
+    client = _client(f"workspace-{uuid.uuid4().hex}")
+    existing = {"cars": "cars-feed"}
+    created = []
+
+    def query(client, tag_filter_query):
+        guid = tag_filter_query.split('name "')[1].rstrip('"')
+        file_id = existing.get(guid)
+        return SimpleNamespace(tags=[Tag(file_id=file_id, kind=FeedFile.TAG_GUID_KIND)] if file_id else [])
+
+    def create(client, base_url, rss_feed):
+        created.append(rss_feed.guid)
+        existing[rss_feed.guid] = f"{rss_feed.guid}-feed"
+        return SimpleNamespace(file=SimpleNamespace(id=existing[rss_feed.guid]))
+
+    def get(*args, **kwargs):
+        raise AssertionError("ensure_id must not load a File")
+
+    monkeypatch.setattr(Tag, "query", staticmethod(query))
+    monkeypatch.setattr(FeedFile, "create", staticmethod(create))
+    monkeypatch.setattr(FeedFile, "get", staticmethod(get))
+
+    assert FeedFile.ensure_id(client, "https://example.com", RssFeed(guid="cars")) == "cars-feed"
+    assert created == []
+
+    assert FeedFile.ensure_id(client, "https://example.com", RssFeed(guid="boats")) == "boats-feed"
+    assert FeedFile.ensure_id(client, "https://example.com", RssFeed(guid="boats")) == "boats-feed"
+    assert created == ["boats"]
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+from steamship import Tag
+
+from data.podcast_episode import UPDATED_AT_KEY, EpisodeFile
+from data.podcast_feed import FeedFile
+
+BASE_URL = "https://example.org/feed"
+
+
+def _feed(updated_at="Mon, 02 Jan 2023 00:00:00 GMT", audio_completed="Wed, 04 Jan 2023 12:00:00 GMT"):
+    tags = [
+        Tag(kind=FeedFile.TAG_KIND, value={"guid": "feed-guid", "title": "Feed", UPDATED_AT_KEY: updated_at}),
+        Tag(kind=EpisodeFile.INDEX_TAG_KIND, name="ep-1", value={"title": "One", "pub_date": "Tue, 03 Jan 2023 09:00:00 GMT"}),
+        Tag(kind=EpisodeFile.INDEX_AUDIO_TAG_KIND, name="ep-1", value={UPDATED_AT_KEY: audio_completed}),
+        Tag(kind=EpisodeFile.INDEX_TAG_KIND, name="ep-2", value={"title": "Draft", "pub_date": "Fri, 06 Jan 2023 09:00:00 GMT"}),
+    ]
+    return FeedFile(SimpleNamespace(id="feed-file", client=None, tags=tags))
+
+
+def test_last_modified_comes_from_the_stored_data():
+    validators = _feed().validators(BASE_URL)
+    # The unpublished ep-2 is not listed, so its later pub_date does not count.
+    assert validators.headers()["Last-Modified"] == "Wed, 04 Jan 2023 12:00:00 GMT"
+    assert _feed().validators(BASE_URL) == validators
+
+
+def test_matching_etag_is_not_modified():
+    validators = _feed().validators(BASE_URL)
+    assert validators.not_modified(if_none_match=validators.etag)
+    assert validators.not_modified(if_none_match=f'"other", W/{validators.etag}')
+    assert validators.not_modified(if_none_match="*")
+    assert not validators.not_modified(if_none_match='"other"')
+
+
+def test_weak_etag_matches_by_weak_comparison():
+    validators = _feed().validators(BASE_URL)
+    assert validators.not_modified(if_none_match=f"W/{validators.etag}")
+    assert not validators.not_modified(if_none_match='W/"other"')
+    assert not validators.not_modified(if_none_match=f"w/{validators.etag}")
+
+
+def test_etag_follows_the_feed_and_its_episodes():
+    etag = _feed().validators(BASE_URL).etag
+    assert _feed(updated_at="Thu, 05 Jan 2023 00:00:00 GMT").validators(BASE_URL).etag != etag
+    assert _feed().validators(f"{BASE_URL}/other").etag != etag
+
+
+def test_if_modified_since():
+    validators = _feed().validators(BASE_URL)
+    assert validators.not_modified(if_modified_since="Wed, 04 Jan 2023 12:00:00 GMT")
+    assert validators.not_modified(if_modified_since="Thu, 05 Jan 2023 00:00:00 GMT")
+    assert not validators.not_modified(if_modified_since="Wed, 04 Jan 2023 11:59:59 GMT")
+    assert not validators.not_modified(if_modified_since="not a date")
+    # If-None-Match takes precedence.
+    assert not validators.not_modified(if_none_match='"other"', if_modified_since="Thu, 05 Jan 2023 00:00:00 GMT")
+
+
+def test_unknown_last_modified_is_omitted():
+    feed = FeedFile(SimpleNamespace(id="feed-file", client=None, tags=[Tag(kind=FeedFile.TAG_KIND, value={})]))
+    validators = feed.validators(BASE_URL)
+    assert validators.last_modified is None
+    assert "Last-Modified" not in validators.headers()
+    assert not validators.not_modified(if_modified_since="Thu, 05 Jan 2023 00:00:00 GMT")
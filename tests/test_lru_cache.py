@@ -0,0 +1,38 @@
+import time
+
+from data.lru_cache import LruCache
+
+
+def test_evicts_least_recently_used_beyond_max_entries():
+    lru = LruCache(max_entries=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+    assert lru.stats()["evictions"] == 1
+
+
+def test_byte_budget_evicts_and_skips_oversized_entries():
+    lru = LruCache(max_bytes=10)
+    lru.set("a", "a", size=6)
+    lru.set("b", "b", size=6)
+    assert lru.get("a") is None and lru.get("b") == "b"
+
+    lru.set("huge", "huge", size=11)
+    assert lru.get("huge") is None
+    assert lru.get("b") == "b"
+
+
+def test_expired_entries_are_misses():
+    lru = LruCache(ttl_seconds=0.05)
+    lru.set("a", 1)
+    lru.set("b", 2, ttl_seconds=60)
+    time.sleep(0.1)
+
+    assert lru.get("a") is None
+    assert lru.get("b") == 2
+    stats = lru.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"], stats["entries"]) == (1, 1, 1, 1)
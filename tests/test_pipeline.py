@@ -0,0 +1,44 @@
+from collections import Counter
+
+import pytest
+
+from tools.pipeline import Pipeline, Stage, content_hash
+
+
+def _pipeline(calls: Counter) -> Pipeline:
+    def stage(name, fn):
+        def run(inputs, context):
+            calls[name] += 1
+            return fn(inputs)
+        return run
+
+    return Pipeline("test", [
+        Stage("upper", ["text"], stage("upper", lambda inputs: inputs["text"].upper())),
+        Stage("length", ["upper"], stage("length", lambda inputs: len(inputs["upper"]))),
+        Stage("suffixed", ["upper", "suffix"], stage("suffixed", lambda inputs: inputs["upper"] + inputs["suffix"])),
+    ])
+
+
+def test_reruns_only_stages_downstream_of_a_changed_input():
+    calls = Counter()
+    pipeline = _pipeline(calls)
+
+    first = pipeline.run({"text": "hello", "suffix": "!"}, None)
+    assert first.values["length"] == 5 and first.values["suffixed"] == "HELLO!"
+
+    second = pipeline.run({"text": "hello", "suffix": "?"}, None)
+    assert second.values["suffixed"] == "HELLO?"
+    assert second.results["upper"].cached and second.results["length"].cached
+    assert calls == Counter(upper=1, length=1, suffixed=2)
+
+    pipeline.run({"text": "hello", "suffix": "?"}, None, force=["length"])
+    assert calls["length"] == 2
+
+
+def test_values_without_a_stable_encoding_are_rejected():
+    with pytest.raises(TypeError):
+        content_hash({"value": object()})
+
+    pipeline = Pipeline("test", [Stage("opaque", ["text"], lambda inputs, context: object())])
+    with pytest.raises(TypeError):
+        pipeline.run({"text": "hello"}, None)
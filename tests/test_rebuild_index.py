@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+from steamship import Tag
+from steamship.data import TagValueKey
+
+from data.podcast_episode import EpisodeFile
+from data.podcast_feed import FeedFile
+
+
+def _file(file_id, tags):
+    return SimpleNamespace(id=file_id, client=None, tags=tags)
+
+
+def _episode(file_id, feed_file_id=None, has_audio=False):
+    tags = [Tag(kind=EpisodeFile.TAG_KIND, name=EpisodeFile.TAG_NAME_DATA, value={"title": file_id})]
+    if feed_file_id:
+        tags.append(Tag(
+            kind=EpisodeFile.TAG_KIND, name=EpisodeFile.TAG_NAME_FEED, value={TagValueKey.STRING_VALUE: feed_file_id}
+        ))
+    if has_audio:
+        tags.append(Tag(kind=EpisodeFile.TAG_KIND, name=EpisodeFile.TAG_NAME_AUDIO))
+    return _file(file_id, tags)
+
+
+def test_rebuild_index_keeps_each_feed_to_its_own_episodes(monkeypatch):
+    files = {
+        "feed-a": _file("feed-a", [Tag(kind=FeedFile.TAG_KIND, value={"guid": "a"})]),
+        "feed-b": _file("feed-b", [Tag(kind=FeedFile.TAG_KIND, value={"guid": "b"})]),
+        "ep-a": _episode("ep-a", feed_file_id="feed-a"),
+        "ep-b": _episode("ep-b", feed_file_id="feed-b"),
+        "ep-orphan": _episode("ep-orphan", has_audio=True),
+    }
+
+    def create_tag(client, file_id, kind, name=None, value=None):
+        tag = Tag(file_id=file_id, kind=kind, name=name, value=value)
+        files[file_id].tags.append(tag)
+        return tag
+
+    monkeypatch.setattr(Tag, "create", staticmethod(create_tag))
+    monkeypatch.setattr(EpisodeFile, "list_tags_only", staticmethod(
+        lambda client: [EpisodeFile(files[file_id]) for file_id in ("ep-a", "ep-b", "ep-orphan")]
+    ))
+    monkeypatch.setattr(FeedFile, "refresh", lambda self: self)
+
+    feed_a = FeedFile(files["feed-a"])
+    feed_b = FeedFile(files["feed-b"])
+    assert feed_a.rebuild_index() == 2
+    assert feed_b.rebuild_index() == 1
+
+    assert [record.guid for record in feed_a.episode_records()] == ["ep-a", "ep-orphan"]
+    assert [record.guid for record in feed_a.episode_records(with_audio=True)] == ["ep-orphan"]
+    assert [record.guid for record in feed_b.episode_records()] == ["ep-b"]
+    assert EpisodeFile(files["ep-orphan"]).feed_file_id() == "feed-a"
+
+    # Already-indexed episodes are not added again.
+    assert feed_a.rebuild_index() == 0
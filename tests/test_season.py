@@ -0,0 +1,35 @@
+from tools.podcast_episode_premise_tool import PodcastEpisodePremiseTool
+from tools.podcast_premise_tool import PodcastPremiseTool
+
+
+def test_parse_season_keeps_complete_rows_for_the_premise():
+    tool = PodcastEpisodePremiseTool(shuffle_example_rows=False)
+    premise = PodcastPremiseTool.Output(podcast_name="Car Talk", podcast_description="Cars.")
+    prompt, new_object_prefix = tool._season_prompt(premise, 3, ["Brakes: stopping"])
+    assert "- Brakes: stopping" in prompt
+
+    completion = (
+        '"episode_name": "Opening", "episode_description": "Where it starts."}\n'
+        '{"podcast_name": "Boat Talk", "episode_name": "Tires", "episode_description": "Grip."},\n'
+        '{"podcast_name": "Car Talk", "episode_name": "Untitled"}\n'
+        "not json\n"
+    )
+    rows = tool._parse_season(premise, new_object_prefix, completion)
+    assert [row["episode_name"] for row in rows] == ["Opening", "Tires"]
+    assert all(row["podcast_name"] == "Car Talk" for row in rows)
+
+
+def test_parse_season_continues_the_prompt_prefix_even_with_braces_in_the_name():
+    tool = PodcastEpisodePremiseTool(shuffle_example_rows=False)
+    premise = PodcastPremiseTool.Output(podcast_name="The {Curly} Show", podcast_description="Braces, mostly.")
+    prompt, new_object_prefix = tool._season_prompt(premise, 2, [])
+    assert prompt.endswith(new_object_prefix)
+
+    completion = (
+        '"episode_name": "Opening", "episode_description": "Where it starts."}\n'
+        '{"podcast_name": "The {Curly} Show", "episode_name": "Closing", "episode_description": "Where it ends."}\n'
+        "not json\n"
+    )
+    rows = tool._parse_season(premise, new_object_prefix, completion)
+    assert [row["episode_name"] for row in rows] == ["Opening", "Closing"]
+    assert all(row["podcast_name"] == "The {Curly} Show" for row in rows)
@@ -0,0 +1,111 @@
+import re
+from typing import Dict, List, Optional
+
+import pytest
+from steamship import Block, SteamshipError
+from steamship.agents.schema import LLM
+
+from tools.podcast_episode_premise_tool import PodcastEpisodePremiseTool
+from tools.podcast_script_tool import OUTLINE_STOP, OutlineSegment, PodcastTranscriptGeneratorTool
+from tools.streaming_llm import was_streamed
+
+EPISODE = PodcastEpisodePremiseTool.Output(
+    podcast_name="Car Talk", podcast_description="Cars.", episode_name="Brakes", episode_description="Stopping."
+)
+
+
+class ScriptedLLM(LLM):
+    completions: List[str]
+    prompts: List[str] = []
+
+    def complete(self, prompt: str, stop: Optional[str] = None) -> List[Block]:
+        self.prompts.append(prompt)
+        return [Block(text=self.completions.pop(0))]
+
+
+class SegmentLLM(LLM):
+    """Answers outline prompts with `outline` and segment prompts with the text for that segment's number."""
+
+    outline: str
+    segments: Dict[int, str]
+
+    def complete(self, prompt: str, stop: Optional[str] = None) -> List[Block]:
+        if stop == OUTLINE_STOP:
+            return [Block(text=self.outline)]
+        number = int(re.search(r"SEGMENT (\d+) TRANSCRIPT:$", prompt).group(1))
+        return [Block(text=self.segments[number])]
+
+
+def test_stitch_drops_echoed_headers_stop_phrases_and_repeated_lines():
+    previous = ["HOST: Welcome to Car Talk.", "GUEST: Let's talk brakes."]
+    text = (
+        "SEGMENT 2 TRANSCRIPT:\n"
+        "SEGMENT 2: Pads and rotors\n"
+        "GUEST: Let's talk brakes.\n"
+        "HOST: First, pads.\n"
+        "END OF SEGMENT\n"
+    )
+    lines = PodcastTranscriptGeneratorTool._stitch_segment(previous, text, OutlineSegment(2, "Pads and rotors", ""))
+    assert lines == ["HOST: First, pads."]
+
+
+def test_stitch_keeps_dialogue_that_mentions_segments_or_the_end():
+    text = (
+        "HOST: In segment 3: we'll cover rotors.\n"
+        "Segment 2: that was a good one, said the guest.\n"
+        "SEGMENT 3: a preview, read aloud as part of the show\n"
+        "GUEST: And that's the end of the show.\n"
+        "THE END"
+    )
+    lines = PodcastTranscriptGeneratorTool._stitch_segment([], text, OutlineSegment(2, "Pads and rotors", ""))
+    assert lines == text.splitlines()[:-1]
+
+
+def test_long_episodes_are_written_segment_by_segment_in_outline_order(agent_context):
+    llm = SegmentLLM(
+        outline="1. Intro: hello\n2. Pads: pads\n3. Rotors: rotors",
+        segments={
+            1: "HOST: Welcome to Car Talk.\nEND OF SEGMENT",
+            2: "HOST: Welcome to Car Talk.\nGUEST: Pads wear out.",
+            3: "SEGMENT 3 TRANSCRIPT:\nHOST: Rotors warp.\nTHE END",
+        },
+    )
+    tool = PodcastTranscriptGeneratorTool(episode_minutes=6, segment_minutes=2)
+    block = tool.script_for(EPISODE, agent_context(llm))
+    assert block.text == "HOST: Welcome to Car Talk.\n\nGUEST: Pads wear out.\n\nHOST: Rotors warp."
+
+
+def test_outline_retries_a_short_outline(agent_context):
+    llm = ScriptedLLM(completions=["1. Intro: hello", "1. Intro: hello\n2. Pads: pads\n3. Rotors: rotors"])
+    tool = PodcastTranscriptGeneratorTool(episode_minutes=4, segment_minutes=2)
+    outline = tool.outline_for(EPISODE, agent_context(llm))
+    assert outline == [OutlineSegment(1, "Intro", "hello"), OutlineSegment(2, "Pads", "pads")]
+
+
+def test_outline_raises_when_still_short(agent_context):
+    llm = ScriptedLLM(completions=["1. Intro: hello", "1. Intro: hello"])
+    tool = PodcastTranscriptGeneratorTool(episode_minutes=4, segment_minutes=2)
+    with pytest.raises(SteamshipError):
+        tool.outline_for(EPISODE, agent_context(llm))
+
+
+def test_single_prompt_asks_for_the_episode_length(agent_context):
+    llm = ScriptedLLM(completions=["HOST: Hi."], prompts=[])
+    tool = PodcastTranscriptGeneratorTool(episode_minutes=1, segment_minutes=2)
+    assert tool.script_for(EPISODE, agent_context(llm)).text == "HOST: Hi."
+    assert "a 1 minute long podcast episode" in llm.prompts[0]
+
+
+def test_streamed_episode_is_emitted_segment_by_segment(agent_context):
+    emitted: List[str] = []
+    context = agent_context(SegmentLLM(
+        outline="1. Intro: hello\n2. Pads: pads",
+        segments={1: "HOST: Welcome to Car Talk.", 2: "GUEST: Pads wear out.\nTHE END"},
+    ))
+    context.emit_funcs = [lambda blocks, metadata: emitted.extend(block.text for block in blocks)]
+
+    tool = PodcastTranscriptGeneratorTool(episode_minutes=4, segment_minutes=2)
+    block = tool.script_for(EPISODE, context, stream=True)
+
+    assert emitted == ["HOST: Welcome to Car Talk.", "GUEST: Pads wear out."]
+    assert was_streamed(block)
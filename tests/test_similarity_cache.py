@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from steamship import Block
+
+from tools.similarity_cache import SimilarityCache
+
+IDEA = "Wolverines: what wolverines eat in the wild"
+
+
+def test_near_duplicate_requests_share_an_output():
+    similarity_cache = SimilarityCache(threshold=0.8)
+    similarity_cache.add("a podcast about cars", Block(text="Car Talk"))
+
+    match = similarity_cache.find_similar_input("car podcast idea")
+    assert match is not None and match[0].text == "Car Talk"
+    assert similarity_cache.find_similar_input("a podcast about banking") is None
+    assert (similarity_cache.hits, similarity_cache.misses) == (1, 1)
+
+
+def test_similar_outputs_are_found_by_their_text():
+    similarity_cache = SimilarityCache(threshold=0.8)
+    similarity_cache.add("cars", Block(text="Car Talk"), "Wolverines: what wolverines eat in the wild")
+
+    assert similarity_cache.find_similar_output("Wolverines: what a wolverine eats in the wild") is not None
+    assert similarity_cache.find_similar_output("Sound lasers directed from afar") is None
+
+
+def test_full_index_keeps_the_most_recent_half():
+    similarity_cache = SimilarityCache(threshold=0.8, max_entries=4)
+    for topic in ("cars", "banking", "volcanoes", "chess"):
+        similarity_cache.add(topic, Block(text=topic))
+    similarity_cache.add("wolverines", Block(text="wolverines"))
+
+    assert len(similarity_cache) == 3
+    assert similarity_cache.find_similar_input("cars") is None
+    assert similarity_cache.find_similar_input("chess")[0].text == "chess"
+
+
+def test_add_unless_similar_reserves_an_idea_once_across_threads():
+    similarity_cache = SimilarityCache(threshold=0.8)
+    barrier = threading.Barrier(8)
+
+    def reserve(i: int):
+        barrier.wait()
+        return similarity_cache.add_unless_similar([(IDEA, Block(text=f"{IDEA} #{i}"), IDEA)])
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        matches = list(executor.map(reserve, range(8)))
+
+    assert sum(match is None for match in matches) == 1
+    assert len(similarity_cache) == 1
+
+
+def test_add_unless_similar_adds_nothing_when_any_entry_is_a_duplicate():
+    similarity_cache = SimilarityCache(threshold=0.8)
+    similarity_cache.add(IDEA, Block(text=IDEA))
+
+    match = similarity_cache.add_unless_similar([
+        ("Sound lasers", Block(text="Sound lasers"), "Sound lasers directed from afar"),
+        (IDEA, Block(text=IDEA), IDEA),
+    ])
+    assert match is not None and match[0].text == IDEA
+    assert len(similarity_cache) == 1
+    assert similarity_cache.find_similar_output("Sound lasers directed from afar") is None
@@ -0,0 +1,79 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from steamship import Block
+
+from tools.cache_backends import SqliteBackend
+from data.lru_cache import LruCache
+from tools.single_flight import SingleFlight
+from tools.tool_cache import ToolCache
+
+
+def test_concurrent_callers_share_one_computation():
+    single_flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+    results = []
+
+    def call():
+        flight, is_leader = single_flight.begin("key")
+        if is_leader:
+            started.set()
+            time.sleep(0.05)
+            calls.append(1)
+            single_flight.finish("key", result="value")
+            results.append("value")
+        else:
+            results.append(flight.wait(timeout=5))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=call) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ["value"] * 5
+    assert single_flight.coalesced == 4
+    assert single_flight.in_flight() == 0
+
+
+def test_waiters_see_the_leaders_error():
+    single_flight = SingleFlight()
+    single_flight.begin("key")
+    flight, is_leader = single_flight.begin("key")
+    assert not is_leader
+    single_flight.finish("key", error=ValueError("boom"))
+    try:
+        flight.wait(timeout=1)
+    except ValueError as error:
+        assert str(error) == "boom"
+    else:
+        raise AssertionError("expected the leader's error")
+
+
+def _tool_cache(tmp_path, name: str) -> ToolCache:
+    backend = SqliteBackend(name, path=str(tmp_path / "cache.sqlite3"))
+    return ToolCache(name, local_cache=LruCache(), backend_factory=lambda _, __: backend)
+
+
+def test_leader_computes_its_keys_concurrently_and_counts_one_miss_each(tmp_path):
+    cache = _tool_cache(tmp_path, "single-flight-batch")
+    context = SimpleNamespace(client=None)
+
+    def compute(block: Block) -> Block:
+        time.sleep(0.2)
+        return Block(text=block.text.upper())
+
+    started = time.perf_counter()
+    outputs = cache.get_or_compute_many([Block(text=f"input {i}") for i in range(4)], compute, context)
+    elapsed = time.perf_counter() - started
+
+    assert [block.text for block in outputs] == [f"INPUT {i}" for i in range(4)]
+    assert elapsed < 0.6
+    assert cache.metrics.misses == 4
+    assert cache.local_cache.misses == 4
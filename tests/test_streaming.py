@@ -0,0 +1,65 @@
+from typing import List, Optional
+
+from steamship import Block
+from steamship.agents.schema import LLM
+
+from tools.podcast_episode_premise_tool import PodcastEpisodePremiseTool
+from tools.podcast_script_tool import PodcastTranscriptGeneratorTool
+from tools.streaming_llm import FakeStreamingLLM, stream_completion, was_streamed
+
+TRANSCRIPT = "HOST: Welcome back!\nGUEST: Thanks for having me.\nHOST: Let's begin.\n"
+
+
+class CompleteOnlyLLM(LLM):
+    text: str
+
+    def complete(self, prompt: str, stop: Optional[str] = None) -> List[Block]:
+        return [Block(text=self.text)]
+
+
+def _stream(text: str, chunk_size: int, stop: Optional[str] = None) -> List[str]:
+    return list(stream_completion(FakeStreamingLLM(text=text, chunk_size=chunk_size, delay_seconds=0), "", stop))
+
+
+def test_chunks_concatenate_to_the_completion_at_every_chunk_size():
+    for chunk_size in (1, 2, 3, 7, 64):
+        chunks = _stream(TRANSCRIPT, chunk_size)
+        assert "".join(chunks) == TRANSCRIPT
+        assert all(chunks)
+        assert len(chunks) == -(-len(TRANSCRIPT) // chunk_size)
+
+
+def test_stop_sequence_split_across_chunks_is_held_back_and_dropped():
+    text = TRANSCRIPT + "THE END and then some"
+    for chunk_size in (1, 2, 3, 5, 8):
+        chunks = _stream(text, chunk_size, stop="THE END")
+        assert "".join(chunks) == TRANSCRIPT
+        # Not even a prefix of the stop sequence was yielded before it was recognized.
+        assert not any("TH" in chunk for chunk in chunks)
+
+
+def test_stop_sequence_at_the_start_yields_nothing():
+    assert _stream("THE END", 2, stop="THE END") == []
+
+
+def test_llm_without_stream_yields_one_chunk():
+    assert list(stream_completion(CompleteOnlyLLM(text=TRANSCRIPT), "", stop="THE END")) == [TRANSCRIPT]
+
+
+
+def test_streamed_script_is_emitted_once_and_marked(agent_context):
+    emitted: List[str] = []
+    context = agent_context(FakeStreamingLLM(text=TRANSCRIPT + "THE END", chunk_size=5, delay_seconds=0))
+    context.emit_funcs = [lambda blocks, metadata: emitted.extend(block.text for block in blocks)]
+
+    tool = PodcastTranscriptGeneratorTool(stream_chunk_chars=20)
+    episode = PodcastEpisodePremiseTool.Output(
+        podcast_name="Car Talk", podcast_description="Cars.", episode_name="Brakes", episode_description="Stopping."
+    )
+    block = tool.script_for(episode, context, stream=True)
+
+    assert block.text == TRANSCRIPT
+    assert was_streamed(block)
+    assert len(emitted) > 1
+    assert "\n".join(emitted) == TRANSCRIPT.strip()
+    assert not was_streamed(tool.script_for(episode, context, stream=False))
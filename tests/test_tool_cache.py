@@ -0,0 +1,102 @@
+import time
+from types import SimpleNamespace
+
+from steamship import Block
+
+from tools.cache_backends import SqliteBackend
+from tools.cache_record import encode_block
+from data.lru_cache import LruCache
+from tools.tool_cache import ACCESS_TOUCH_EXECUTOR, ACCESS_TOUCH_SECONDS, ACCESSED_AT_KEY, CACHED_AT_KEY, ToolCache
+
+CONTEXT = SimpleNamespace(client=None)
+
+
+class SlowWriteBackend(SqliteBackend):
+    def set(self, key, value):
+        time.sleep(0.3)
+        super().set(key, value)
+
+
+class CountingBackend(SqliteBackend):
+    reads = 0
+
+    def get_many(self, keys):
+        self.reads += 1
+        return super().get_many(keys)
+
+
+def _cache(tmp_path, name="test-tool", backend_class=SqliteBackend, **kwargs) -> ToolCache:
+    backend = backend_class(name, path=str(tmp_path / "cache.sqlite3"))
+    return ToolCache(name, local_cache=LruCache(), backend_factory=lambda _, __: backend, **kwargs)
+
+
+def _store(cache: ToolCache, input_text: str, output_text: str, cached_at: float, accessed_at: float):
+    key = cache._key_for_block(Block(text=input_text), CONTEXT)
+    record = encode_block(Block(text=output_text))
+    record[CACHED_AT_KEY] = cached_at
+    record[ACCESSED_AT_KEY] = accessed_at
+    cache._get_backend(CONTEXT).set(key, record)
+
+
+def test_miss_then_local_and_backend_hits(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.get(Block(text="Cars"), CONTEXT) is None
+
+    cache.set(Block(text="Cars"), Block(text="Car Talk"), CONTEXT)
+    # Keys are canonicalized, so case and whitespace differences still hit.
+    assert cache.get(Block(text="  cars "), CONTEXT).text == "Car Talk"
+
+    cache.local_cache.clear()
+    assert cache.get(Block(text="Cars"), CONTEXT).text == "Car Talk"
+
+    report = cache.metrics.report()
+    assert (report["misses"], report["local_hits"], report["backend_hits"]) == (1, 1, 1)
+
+
+def test_get_many_reads_the_backend_once_for_every_local_miss(tmp_path):
+    cache = _cache(tmp_path, name="test-get-many", backend_class=CountingBackend)
+    cache.set_many([(Block(text="Cars"), Block(text="Car Talk")), (Block(text="Boats"), Block(text="Boat Talk"))], CONTEXT)
+    cache.local_cache.delete(cache._local_key(cache._key_for_block(Block(text="Boats"), CONTEXT), CONTEXT))
+
+    outputs = cache.get_many([Block(text="Cars"), Block(text="Boats"), Block(text="Boats"), Block(text="Planes")], CONTEXT)
+    assert [block.text if block else None for block in outputs] == ["Car Talk", "Boat Talk", "Boat Talk", None]
+    assert cache._get_backend(CONTEXT).reads == 1
+    assert cache.stats()["backend_hits"] == 2  # Hits are counted per lookup, not per backend key.
+
+
+def test_expired_records_are_not_served(tmp_path):
+    cache = _cache(tmp_path, ttl_seconds=60)
+    now = time.time()
+    _store(cache, "old", "stale", cached_at=now - 120, accessed_at=now - 120)
+    _store(cache, "new", "fresh", cached_at=now, accessed_at=now)
+
+    assert cache.get(Block(text="old"), CONTEXT) is None
+    assert cache.get(Block(text="new"), CONTEXT).text == "fresh"
+
+
+def test_sweep_deletes_expired_then_least_recently_accessed(tmp_path):
+    cache = _cache(tmp_path, ttl_seconds=3600, max_entries=2)
+    now = time.time()
+    _store(cache, "expired", "x", cached_at=now - 7200, accessed_at=now)
+    _store(cache, "oldest", "x", cached_at=now, accessed_at=now - 30)
+    _store(cache, "older", "x", cached_at=now, accessed_at=now - 20)
+    _store(cache, "newest", "x", cached_at=now, accessed_at=now - 10)
+
+    assert cache.sweep(CONTEXT) == {"scanned": 4, "expired": 1, "evicted": 1, "remaining": 2}
+    assert cache.get(Block(text="oldest"), CONTEXT) is None
+    assert cache.get(Block(text="older"), CONTEXT).text == "x"
+    assert cache.get(Block(text="newest"), CONTEXT).text == "x"
+
+
+def test_stale_access_time_is_refreshed_off_the_read_path(tmp_path):
+    cache = _cache(tmp_path, backend_class=SlowWriteBackend)
+    long_ago = time.time() - 2 * ACCESS_TOUCH_SECONDS
+    _store(cache, "hot", "value", cached_at=long_ago, accessed_at=long_ago)
+
+    started = time.perf_counter()
+    assert cache.get(Block(text="hot"), CONTEXT).text == "value"
+    assert time.perf_counter() - started < 0.2
+
+    ACCESS_TOUCH_EXECUTOR.submit(lambda: None).result()
+    key = cache._key_for_block(Block(text="hot"), CONTEXT)
+    assert cache._get_backend(CONTEXT).get(key)[ACCESSED_AT_KEY] > long_ago
@@ -0,0 +1,135 @@
+import itertools
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from steamship import Block
+
+from tools.payload import attach_payload
+from tools.podcast_episode_premise_tool import PodcastEpisodePremiseTool
+from tools.podcast_premise_tool import PodcastPremiseTool
+from tools.streaming_llm import FakeStreamingLLM
+from tools.warm_pool import WarmPool, get_warm_pool
+
+IDEAS = [
+    ("Wolverines", "What wolverines eat in the wild."),
+    ("Sound Lasers", "Directing sound from afar, straight into your head."),
+    ("Bank Runs", "Why depositors panic, and what stops them."),
+    ("Left Turns", "A sedan that stalls on every left-hand turn."),
+    ("Volcano Weather", "How eruptions change rainfall a continent away."),
+    ("Chess Clocks", "The history of timing a game of kings."),
+]
+
+
+def _drain(pool: WarmPool):
+    deadline = time.monotonic() + 5
+    while pool.stats()["filling"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pool.stats()["filling"] == 0
+
+
+def _counter():
+    counter = itertools.count(1)
+    return lambda: next(counter)
+
+
+def test_miss_starts_no_fills_until_the_caller_replenishes():
+    pool = WarmPool("test-miss", executor=ThreadPoolExecutor(max_workers=1))
+    fill = _counter()
+
+    assert pool.take("feed", "v1", fill, size=3) is None
+    assert pool.stats()["filling"] == 0
+
+    pool.replenish("feed", "v1", fill, size=3)
+    _drain(pool)
+    assert pool.ready("feed") == 3
+    assert pool.stats()["misses"] == 1
+
+
+def test_hit_serves_in_order_and_tops_the_pool_up():
+    pool = WarmPool("test-hit", executor=ThreadPoolExecutor(max_workers=1))
+    fill = _counter()
+    pool.replenish("feed", "v1", fill, size=2)
+    _drain(pool)
+
+    assert pool.take("feed", "v1", fill, size=2) == 1
+    _drain(pool)
+    assert pool.ready("feed") == 2
+    assert pool.take("feed", "v1", fill, size=2) == 2
+    assert pool.stats()["hits"] == 2
+
+
+def test_new_version_discards_ready_and_in_flight_items():
+    pool = WarmPool("test-version", executor=ThreadPoolExecutor(max_workers=1))
+    pool.replenish("feed", "v1", lambda: "old", size=2)
+    _drain(pool)
+
+    release = threading.Event()
+    pool.take("feed", "v1", lambda: release.wait() and "old, late", size=2)  # starts one blocked fill
+
+    assert pool.take("feed", "v2", lambda: "new", size=2) is None
+    assert pool.ready("feed") == 0
+    release.set()
+    _drain(pool)
+    assert pool.ready("feed") == 0
+
+    pool.replenish("feed", "v2", lambda: "new", size=2)
+    _drain(pool)
+    assert pool.take("feed", "v2", lambda: "new", size=2) == "new"
+
+
+def test_failed_fills_are_counted_and_skipped():
+    pool = WarmPool("test-failure", executor=ThreadPoolExecutor(max_workers=1))
+
+    def fill():
+        raise ValueError("boom")
+
+    pool.replenish("feed", "v1", fill, size=2)
+    _drain(pool)
+    assert pool.ready("feed") == 0
+    assert pool.stats()["failures"] == 2
+
+
+def test_run_warm_indexes_ideas_when_served_and_fills_off_the_request_context(monkeypatch, agent_context):
+    monkeypatch.delenv("TOOL_CACHE_BACKEND", raising=False)
+    ideas = iter(IDEAS)
+    calls = []
+
+    def episode_with_cover_art(self, podcast_premise, context, reserve=True):
+        name, description = next(ideas)
+        calls.append((context, reserve))
+        episode = PodcastEpisodePremiseTool.Output(
+            **podcast_premise.dict(), episode_name=name, episode_description=description
+        )
+        return [attach_payload(Block(), episode)]
+
+    monkeypatch.setattr(PodcastEpisodePremiseTool, "episode_with_cover_art", episode_with_cover_art)
+    monkeypatch.setattr(PodcastEpisodePremiseTool, "_owned_client", staticmethod(lambda context: context.client))
+
+    podcast_premise = PodcastPremiseTool.Output(podcast_name=f"Show {uuid.uuid4().hex}", podcast_description="Ideas.")
+    request = agent_context(FakeStreamingLLM(text=""), workspace_id=f"workspace-{uuid.uuid4().hex}")
+    tool = PodcastEpisodePremiseTool(warm_pool_size=2)
+    pool = get_warm_pool(f"{tool.name}-episodes")
+    episode_index = tool.episode_index(podcast_premise, request)
+
+    # Cold: generated inline on the request's context, then two background fills.
+    first = tool.run_warm(podcast_premise, request)
+    _drain(pool)
+    assert tool.parse_final_output(first[0]).episode_name == "Wolverines"
+    assert calls[0] == (request, True)
+    assert len(calls) == 3
+    assert all(context is not request and not reserve for context, reserve in calls[1:])
+    assert len(episode_index) == 0  # The fake skips indexing; pooled ideas are only indexed when served.
+
+    # Warm: served from the pool and indexed as it is handed out; one fill replaces it.
+    second = tool.run_warm(podcast_premise, request)
+    _drain(pool)
+    assert tool.parse_final_output(second[0]).episode_name == "Sound Lasers"
+    assert len(episode_index) == 1
+    assert len(calls) == 4
+
+    # Pools are per workspace, so the same feed in another workspace starts cold.
+    other = agent_context(FakeStreamingLLM(text=""), workspace_id=f"workspace-{uuid.uuid4().hex}")
+    PodcastEpisodePremiseTool(warm_pool_size=2).run_warm(podcast_premise, other)
+    assert calls[4] == (other, True)
@@ -0,0 +1,39 @@
+from data.podcast_episode import RssEpisode
+from data.podcast_feed import RssFeed
+from data.utils import XmlSerializer, xml_bool, xml_escape_attribute, xml_escape_text
+
+
+def test_text_and_attribute_escaping():
+    assert xml_escape_text('Tom & Jerry <live> "quoted"') == 'Tom &amp; Jerry &lt;live&gt; "quoted"'
+    assert xml_escape_attribute('a "b" & <c>') == "a &quot;b&quot; &amp; &lt;c&gt;"
+    assert xml_escape_text("&amp;") == "&amp;amp;"
+
+
+def test_serializer_renders_escaped_values_and_skips_none():
+    serializer = XmlSerializer(
+        [("title", None, None), ("itunes:author", None, None), ("enclosure", "url", 'type="audio/mpeg"')],
+        wrapper="item",
+    )
+    xml = serializer.render(["Cars & <Trucks>", None, 'https://example.org/a.mp3?x=1&y="2"'])
+    assert xml == (
+        "<item><title>Cars &amp; &lt;Trucks&gt;</title>"
+        '<enclosure url="https://example.org/a.mp3?x=1&amp;y=&quot;2&quot;" type="audio/mpeg" /></item>'
+    )
+
+
+def test_repeated_values_are_escaped_per_context():
+    serializer = XmlSerializer([("description", None, None), ("itunes:image", "href", None)])
+    assert serializer.render(['"x" & y', '"x" & y']) == (
+        '<description>"x" &amp; y</description><itunes:image href="&quot;x&quot; &amp; y" />'
+    )
+
+
+def test_feed_and_episode_xml_are_escaped():
+    feed = RssFeed(title="Law & Order", author="<The AI Podcaster>", is_explicit=False)
+    episode = RssEpisode(guid="ep-1", title="Ep 1 & 2", is_explicit=True)
+    xml = feed.rss_xml("https://example.org/", [episode])
+    assert "<title>Law &amp; Order</title>" in xml
+    assert "<itunes:author>&lt;The AI Podcaster&gt;</itunes:author>" in xml
+    assert "<title>Ep 1 &amp; 2</title>" in xml
+    assert '<enclosure url="https://example.org/audio?id=ep-1" type="audio/mpeg" />' in xml
+    assert xml_bool(True) == "yes" and xml_bool(None) is None